@@ -3,12 +3,12 @@ from __future__ import annotations
 import asyncio
 import json
 from typing import Any, Optional
-from urllib import request, error
 
 from fastapi import HTTPException
 
 from action_engine.logging.logger import get_logger, get_request_id
 from action_engine.auth import token_manager
+from action_engine.adapters.http_client import get_http_client
 
 
 class BaseAdapter:
@@ -36,34 +36,34 @@ class BaseAdapter:
         data: Optional[Any] = None,
         timeout: float = 10.0,
     ) -> Any:
-        """Send an HTTP request asynchronously using urllib."""
+        """Send an HTTP request through the shared pooled client."""
 
-        async def _do_request() -> Any:
-            _headers = dict(headers or {})
-            body = None
-            if data is not None:
-                if isinstance(data, (dict, list)):
-                    body = json.dumps(data).encode()
-                    _headers.setdefault("Content-Type", "application/json")
-                elif isinstance(data, str):
-                    body = data.encode()
-                else:
-                    body = data
-            req = request.Request(url, data=body, headers=_headers, method=method)
-            try:
-                with request.urlopen(req, timeout=timeout) as resp:
-                    resp_body = resp.read()
-                    try:
-                        return json.loads(resp_body)
-                    except Exception:  # pragma: no cover - non JSON response
-                        return resp_body.decode()
-            except error.HTTPError as exc:
-                raise HTTPException(status_code=exc.code, detail=exc.reason)
-            except Exception as exc:  # pragma: no cover - network failure
-                raise HTTPException(status_code=500, detail=str(exc))
+        _headers = dict(headers or {})
+        body = None
+        if data is not None:
+            if isinstance(data, (dict, list)):
+                body = json.dumps(data).encode()
+                _headers.setdefault("Content-Type", "application/json")
+            elif isinstance(data, str):
+                body = data.encode()
+            else:
+                body = data
 
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, _do_request)
+        try:
+            resp = await get_http_client().request(
+                method, url, headers=_headers, body=body, timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Upstream request timed out")
+        except Exception as exc:  # pragma: no cover - network failure
+            raise HTTPException(status_code=500, detail=str(exc))
+
+        if resp.status >= 400:
+            raise HTTPException(status_code=resp.status, detail=resp.reason)
+        try:
+            return json.loads(resp.body)
+        except Exception:  # pragma: no cover - non JSON response
+            return resp.body.decode()
 
     async def post(
         self,
@@ -0,0 +1,441 @@
+"""Pooled asyncio HTTP/1.1 client shared by all adapters.
+
+Connections are kept alive and reused per ``scheme://host:port``.  Each host
+pool caps the number of concurrent connections and the number of idle
+connections it keeps around, and TLS sessions are resumed when a new
+connection to a known host has to be opened.
+
+Like the ``urllib`` transport it replaced, the client follows redirects of
+``GET``/``HEAD`` requests and turns a ``POST`` redirected with 301, 302 or 303
+into a ``GET``, and it sends requests through the proxies named by the
+``http_proxy``/``https_proxy``/``no_proxy`` environment variables. ``https``
+requests are tunnelled through the proxy with ``CONNECT``.
+
+A request that fails on a reused keep-alive connection (the server may have
+closed it while it sat idle) is retried once on a fresh connection, but only
+for idempotent methods: a ``POST`` may already have reached the upstream.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import ssl
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional, Tuple
+from urllib.parse import unquote, urljoin, urlsplit
+from urllib.request import getproxies, proxy_bypass_environment
+
+from action_engine import config
+
+# Methods that can be sent again after a connection failure without risking
+# a second side effect upstream (RFC 9110, section 9.2.2).
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"})
+_REDIRECT_STATUSES = frozenset({301, 302, 303, 307, 308})
+_CONTENT_HEADERS = frozenset({"content-length", "content-type"})
+
+
+@dataclass
+class HTTPResponse:
+    """Minimal response object returned by :class:`AsyncHTTPClient`."""
+
+    status: int
+    reason: str
+    headers: Dict[str, str]
+    body: bytes
+
+
+class _SessionReusingContext(ssl.SSLContext):
+    """SSL context that resumes the last TLS session seen for a hostname."""
+
+    def __new__(cls, protocol: int = ssl.PROTOCOL_TLS_CLIENT):
+        return super().__new__(cls, protocol)
+
+    def __init__(self, protocol: int = ssl.PROTOCOL_TLS_CLIENT) -> None:
+        self._sessions: Dict[str, ssl.SSLSession] = {}
+
+    def wrap_bio(self, incoming, outgoing, server_side=False, server_hostname=None, session=None):
+        if session is None and server_hostname:
+            session = self._sessions.get(server_hostname)
+        return super().wrap_bio(
+            incoming,
+            outgoing,
+            server_side=server_side,
+            server_hostname=server_hostname,
+            session=session,
+        )
+
+    def remember_session(self, hostname: str, session: Optional[ssl.SSLSession]) -> None:
+        if session is not None:
+            self._sessions[hostname] = session
+
+
+def _default_ssl_context() -> _SessionReusingContext:
+    ctx = _SessionReusingContext()
+    ctx.load_default_certs()
+    return ctx
+
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.monotonic()
+        self.reused = False
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+@dataclass
+class _Proxy:
+    """Forward proxy a host pool connects through."""
+
+    host: str
+    port: int
+    authorization: Optional[str] = None
+
+    @classmethod
+    def from_url(cls, url: str) -> "_Proxy":
+        parts = urlsplit(url if "://" in url else f"http://{url}")
+        if parts.scheme.lower() != "http" or not parts.hostname:
+            raise ValueError(f"Unsupported proxy: {url}")
+        authorization = None
+        if parts.username is not None:
+            credentials = f"{unquote(parts.username)}:{unquote(parts.password or '')}"
+            authorization = "Basic " + base64.b64encode(credentials.encode()).decode()
+        return cls(parts.hostname, parts.port or 80, authorization)
+
+
+class _HostPool:
+    """Keep-alive connections to a single upstream host."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        ssl_context: Optional[_SessionReusingContext],
+        max_connections: int,
+        max_keepalive: int,
+        keepalive_expiry: float,
+        proxy: Optional[_Proxy] = None,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.proxy = proxy
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self._idle: Deque[_Connection] = deque()
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def acquire(self) -> _Connection:
+        await self._slots.acquire()
+        try:
+            now = time.monotonic()
+            while self._idle:
+                conn = self._idle.pop()
+                if now - conn.last_used < self.keepalive_expiry and not conn.reader.at_eof():
+                    conn.reused = True
+                    return conn
+                conn.close()
+            return await self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    @property
+    def forwards(self) -> bool:
+        """Whether requests go to the proxy in absolute form rather than a tunnel."""
+        return self.proxy is not None and self.ssl_context is None
+
+    async def _connect(self) -> _Connection:
+        if self.proxy is not None:
+            reader, writer = await asyncio.open_connection(self.proxy.host, self.proxy.port)
+            if self.ssl_context is not None:
+                try:
+                    await self._tunnel(reader, writer)
+                    await writer.start_tls(self.ssl_context, server_hostname=self.host)
+                except BaseException:
+                    writer.close()
+                    raise
+        elif self.ssl_context is not None:
+            reader, writer = await asyncio.open_connection(
+                self.host, self.port, ssl=self.ssl_context, server_hostname=self.host
+            )
+        else:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        return _Connection(reader, writer)
+
+    async def _tunnel(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        authority = f"{self.host}:{self.port}"
+        lines = [f"CONNECT {authority} HTTP/1.1", f"Host: {authority}"]
+        if self.proxy.authorization:
+            lines.append(f"Proxy-Authorization: {self.proxy.authorization}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+        status_line = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = status_line.split(None, 2)
+        if len(parts) < 2 or parts[1] != b"200":
+            raise ConnectionRefusedError(f"Proxy refused tunnel: {status_line.decode('latin-1').strip()}")
+
+    def release(self, conn: _Connection, reusable: bool) -> None:
+        try:
+            if self.ssl_context is not None:
+                ssl_object = conn.writer.get_extra_info("ssl_object")
+                if ssl_object is not None:
+                    self.ssl_context.remember_session(self.host, ssl_object.session)
+            if reusable and len(self._idle) < self.max_keepalive:
+                conn.last_used = time.monotonic()
+                conn.reused = False
+                self._idle.append(conn)
+            else:
+                conn.close()
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        while self._idle:
+            self._idle.pop().close()
+
+
+async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+    chunks = []
+    while True:
+        size_line = await reader.readline()
+        size = int(size_line.split(b";", 1)[0].strip(), 16)
+        if size == 0:
+            # Skip optional trailers up to the terminating blank line.
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            return b"".join(chunks)
+        chunks.append(await reader.readexactly(size))
+        await reader.readexactly(2)
+
+
+class AsyncHTTPClient:
+    """Asyncio-native HTTP/1.1 client with per-host keep-alive pools."""
+
+    def __init__(
+        self,
+        max_connections_per_host: int = config.HTTP_MAX_CONNECTIONS_PER_HOST,
+        max_keepalive_per_host: int = config.HTTP_MAX_KEEPALIVE_PER_HOST,
+        keepalive_expiry: float = config.HTTP_KEEPALIVE_EXPIRY,
+        timeout: float = config.HTTP_TIMEOUT,
+        ssl_context: Optional[_SessionReusingContext] = None,
+        max_redirects: int = config.HTTP_MAX_REDIRECTS,
+        proxies: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.max_connections_per_host = max_connections_per_host
+        self.max_keepalive_per_host = max_keepalive_per_host
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        # Same lookup as urllib: ``<scheme>_proxy`` and ``no_proxy`` variables.
+        self.proxies = getproxies() if proxies is None else proxies
+        self._ssl_context = ssl_context
+        self._pools: Dict[Tuple[str, str, int], _HostPool] = {}
+
+    def _proxy_for(self, scheme: str, host: str) -> Optional[_Proxy]:
+        url = self.proxies.get(scheme)
+        if not url or proxy_bypass_environment(host, self.proxies):
+            return None
+        return _Proxy.from_url(url)
+
+    def _pool_for(self, scheme: str, host: str, port: int) -> _HostPool:
+        key = (scheme, host, port)
+        pool = self._pools.get(key)
+        if pool is None:
+            ssl_context = None
+            if scheme == "https":
+                if self._ssl_context is None:
+                    self._ssl_context = _default_ssl_context()
+                ssl_context = self._ssl_context
+            pool = _HostPool(
+                host,
+                port,
+                ssl_context,
+                self.max_connections_per_host,
+                self.max_keepalive_per_host,
+                self.keepalive_expiry,
+                self._proxy_for(scheme, host),
+            )
+            self._pools[key] = pool
+        return pool
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: Optional[bytes] = None,
+        timeout: Optional[float] = None,
+    ) -> HTTPResponse:
+        """Send a request and return the full response.
+
+        ``timeout`` bounds the whole exchange, including waiting for a free
+        connection slot and following redirects, and raises
+        :class:`asyncio.TimeoutError` when hit.
+        """
+
+        return await asyncio.wait_for(
+            self._follow(method.upper(), url, dict(headers or {}), body),
+            self.timeout if timeout is None else timeout,
+        )
+
+    async def _follow(
+        self, method: str, url: str, headers: Dict[str, str], body: Optional[bytes]
+    ) -> HTTPResponse:
+        redirects = 0
+        while True:
+            parts = urlsplit(url)
+            scheme = parts.scheme.lower()
+            if scheme not in ("http", "https") or not parts.hostname:
+                raise ValueError(f"Unsupported URL: {url}")
+            default_port = 443 if scheme == "https" else 80
+            port = parts.port or default_port
+            host_header = parts.hostname if port == default_port else f"{parts.hostname}:{port}"
+            target = parts.path or "/"
+            if parts.query:
+                target += "?" + parts.query
+
+            pool = self._pool_for(scheme, parts.hostname, port)
+            send_headers = headers
+            if pool.forwards:
+                target = f"http://{host_header}{target}"
+                if pool.proxy.authorization:
+                    send_headers = dict(headers, **{"Proxy-Authorization": pool.proxy.authorization})
+            response = await self._send(pool, method, host_header, target, send_headers, body)
+
+            location = response.headers.get("location")
+            # The redirects urllib followed: GET/HEAD on any redirect status,
+            # POST on 301/302/303 (resent as GET without its body).
+            if (
+                response.status not in _REDIRECT_STATUSES
+                or not location
+                or not (method in ("GET", "HEAD") or (method == "POST" and response.status < 307))
+            ):
+                return response
+            redirects += 1
+            if redirects > self.max_redirects:
+                raise ValueError(f"More than {self.max_redirects} redirects from {url}")
+            next_url = urljoin(url, location)
+            next_parts = urlsplit(next_url)
+            if next_parts.scheme.lower() not in ("http", "https"):
+                return response
+            if method == "POST":
+                method, body = "GET", None
+                headers = {k: v for k, v in headers.items() if k.lower() not in _CONTENT_HEADERS}
+            if (next_parts.scheme.lower(), next_parts.netloc) != (scheme, parts.netloc):
+                # Never hand the caller's credentials to another origin.
+                headers = {k: v for k, v in headers.items() if k.lower() != "authorization"}
+            url = next_url
+
+    async def _send(
+        self,
+        pool: _HostPool,
+        method: str,
+        host_header: str,
+        target: str,
+        headers: Dict[str, str],
+        body: Optional[bytes],
+    ) -> HTTPResponse:
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {host_header}"]
+        names = {k.lower() for k in headers}
+        for key, value in headers.items():
+            lines.append(f"{key}: {value}")
+        if "content-length" not in names and (body is not None or method in ("POST", "PUT", "PATCH")):
+            lines.append(f"Content-Length: {len(body or b'')}")
+        if "accept-encoding" not in names:
+            lines.append("Accept-Encoding: identity")
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+        while True:
+            conn = await pool.acquire()
+            reusable = False
+            try:
+                conn.writer.write(head + (body or b""))
+                await conn.writer.drain()
+                status_line = await conn.reader.readline()
+                if not status_line:
+                    raise ConnectionResetError("Connection closed by upstream")
+                response, reusable = await self._read_response(conn.reader, method, status_line)
+                return response
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # A kept-alive connection may have been closed by the server
+                # while idle; retry on a fresh connection. Other methods may
+                # already have taken effect upstream, so they are not resent.
+                if not conn.reused or method not in _IDEMPOTENT_METHODS:
+                    raise
+            finally:
+                pool.release(conn, reusable)
+
+    async def _read_response(
+        self, reader: asyncio.StreamReader, method: str, status_line: bytes
+    ) -> Tuple[HTTPResponse, bool]:
+        version, _, rest = status_line.decode("latin-1").strip().partition(" ")
+        code, _, reason = rest.partition(" ")
+        status = int(code)
+
+        resp_headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            value = value.strip()
+            resp_headers[name] = f"{resp_headers[name]}, {value}" if name in resp_headers else value
+
+        connection = resp_headers.get("connection", "").lower()
+        reusable = "close" not in connection and (version != "HTTP/1.0" or "keep-alive" in connection)
+
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            body = b""
+        elif "chunked" in resp_headers.get("transfer-encoding", "").lower():
+            body = await _read_chunked(reader)
+        elif "content-length" in resp_headers:
+            body = await reader.readexactly(int(resp_headers["content-length"]))
+        else:
+            body = await reader.read()
+            reusable = False
+        return HTTPResponse(status, reason, resp_headers, body), reusable
+
+    async def aclose(self) -> None:
+        """Close all idle connections."""
+
+        for pool in self._pools.values():
+            pool.close()
+        self._pools.clear()
+
+
+_client: Optional[AsyncHTTPClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_client() -> AsyncHTTPClient:
+    """Return the client shared by every adapter on the running event loop."""
+
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = AsyncHTTPClient()
+        _client_loop = loop
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client (used on application shutdown)."""
+
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+__all__ = ["AsyncHTTPClient", "HTTPResponse", "get_http_client", "close_http_client"]
@@ -0,0 +1,118 @@
+"""Local permission checks using capability tokens from Engine Control.
+
+:class:`CapabilityClient` fetches a signed capability token for this engine
+from Engine Control's ``/capabilities/issue`` and keeps it fresh from a
+background task. It asks for a new token once ``CAPABILITY_REFRESH_FRACTION``
+of the current token's lifetime has passed, and retries every
+``CAPABILITY_RETRY_SECONDS`` on failure. :meth:`CapabilityClient.check` then
+decides in memory, without a network hop.
+
+Policy changes in Engine Control reach this process with the next token, so
+decisions are at most one token lifetime old. When no valid token is held,
+for example because Engine Control has been unreachable for longer than a
+token lifetime, every check is denied.
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from action_engine import config
+from action_engine.adapters.http_client import get_http_client
+from action_engine.logging.logger import get_logger
+from shared.capability import Capability, verify
+
+logger = get_logger(__name__)
+
+Fetcher = Callable[[], Awaitable[str]]
+
+
+async def _fetch_from_engine_control() -> str:
+    response = await get_http_client().request(
+        "POST",
+        f"{config.ENGINE_CONTROL_URL.rstrip('/')}/capabilities/issue",
+        headers={
+            "X-Engine-ID": config.ENGINE_ID,
+            "X-Engine-Key": config.ENGINE_KEY,
+            "Content-Type": "application/json",
+        },
+        body=b"{}",
+    )
+    if response.status != 200:
+        raise RuntimeError(f"Capability request failed with status {response.status}")
+    return json.loads(response.body)["token"]
+
+
+class CapabilityClient:
+    """Hold the current capability token and refresh it before it expires."""
+
+    def __init__(
+        self,
+        secret: str,
+        refresh_fraction: float = 0.5,
+        retry_seconds: float = 2.0,
+        fetch: Fetcher = _fetch_from_engine_control,
+    ) -> None:
+        self.secret = secret
+        self.refresh_fraction = refresh_fraction
+        self.retry_seconds = retry_seconds
+        self._fetch = fetch
+        self.current: Optional[Capability] = None
+        self.metrics = {"refreshes": 0, "failures": 0}
+        self._task: Optional["asyncio.Task"] = None
+
+    async def refresh(self) -> Capability:
+        """Fetch and verify a new token; raises ``RuntimeError`` if it is invalid."""
+        capability = verify(await self._fetch(), self.secret)
+        if capability is None:
+            raise RuntimeError("Invalid capability token")
+        self.current = capability
+        self.metrics["refreshes"] += 1
+        return capability
+
+    def _next_refresh_in(self) -> float:
+        current = self.current
+        if current is None:
+            return 0.0
+        lifetime = current.expires_at - current.issued_at
+        return max(0.0, current.issued_at + lifetime * self.refresh_fraction - time.time())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+                delay = self._next_refresh_in()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.metrics["failures"] += 1
+                logger.info("Capability refresh failed", extra={"error": str(exc)})
+                delay = self.retry_seconds
+            await asyncio.sleep(delay)
+
+    def start(self) -> None:
+        """Start the background refresh task."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background refresh task."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def check(self, platform: str, action_type: str) -> Dict[str, Any]:
+        """Return ``{allowed, required_scopes, platform_status}`` for an action."""
+        current = self.current
+        if current is None or current.expired():
+            return {"allowed": False, "required_scopes": [], "platform_status": "unknown"}
+        return current.check(platform, action_type)
+
+
+client = CapabilityClient(
+    config.CAPABILITY_SECRET,
+    config.CAPABILITY_REFRESH_FRACTION,
+    config.CAPABILITY_RETRY_SECONDS,
+)
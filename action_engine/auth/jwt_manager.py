@@ -1,31 +1,97 @@
+"""Creation and verification of signed bearer tokens.
+
+A token is ``urlsafe_b64(payload_json + b"." + hmac_sha256(payload_json))``.
+The HMAC key schedule is computed once at import and copied per signature.
+Verified tokens are cached by the SHA-256 digest of the token, so a client
+reusing its bearer token skips the decode, HMAC and JSON parse; an entry
+never outlives the token's ``exp``. Revocation is checked separately by
+``auth.revocation`` so cached payloads are still subject to it.
+"""
+
 import time
 import json
 import base64
 import hmac
 import hashlib
-from typing import Optional
-from action_engine.config import SECRET_KEY, ACCESS_TOKEN_EXPIRE_SECONDS
+import secrets
+from typing import Any, Dict, Optional
+from action_engine.config import (
+    SECRET_KEY,
+    ACCESS_TOKEN_EXPIRE_SECONDS,
+    JWT_CACHE_MAX_ENTRIES,
+    JWT_CACHE_TTL_SECONDS,
+)
+from action_engine.utils.cache import TTLCache
+
+_SIGNATURE_SIZE = hashlib.sha256().digest_size
+# Keyed HMAC state with the inner/outer pads already absorbed
+_HMAC_BASE = hmac.new(SECRET_KEY.encode(), digestmod=hashlib.sha256)
+
+# Verified payloads keyed by the SHA-256 digest of the token
+_verified = TTLCache(JWT_CACHE_MAX_ENTRIES, JWT_CACHE_TTL_SECONDS)
+
+
+def _sign(payload_bytes: bytes) -> bytes:
+    mac = _HMAC_BASE.copy()
+    mac.update(payload_bytes)
+    return mac.digest()
 
 
 def create_token(user_id: str) -> str:
-    """Return a signed token for ``user_id``."""
-    payload = {"user_id": user_id, "exp": int(time.time()) + ACCESS_TOKEN_EXPIRE_SECONDS}
+    """Return a signed token for ``user_id`` with a unique ``jti``."""
+    payload = {
+        "user_id": user_id,
+        "exp": int(time.time()) + ACCESS_TOKEN_EXPIRE_SECONDS,
+        "jti": secrets.token_urlsafe(12),
+    }
     payload_bytes = json.dumps(payload, separators=(",", ":")).encode()
-    signature = hmac.new(SECRET_KEY.encode(), payload_bytes, hashlib.sha256).digest()
-    return base64.urlsafe_b64encode(payload_bytes + b"." + signature).decode()
+    return base64.urlsafe_b64encode(payload_bytes + b"." + _sign(payload_bytes)).decode()
 
 
-def verify_token(token: str) -> Optional[str]:
-    """Return the ``user_id`` if the token is valid and not expired."""
+def _decode_uncached(token: str) -> Optional[Dict[str, Any]]:
     try:
         decoded = base64.urlsafe_b64decode(token.encode())
-        payload_bytes, signature = decoded.rsplit(b".", 1)
-        expected = hmac.new(SECRET_KEY.encode(), payload_bytes, hashlib.sha256).digest()
-        if not hmac.compare_digest(signature, expected):
+        # The signature is raw bytes and may itself contain ".", so split
+        # at its fixed size instead of searching for the separator.
+        payload_bytes = decoded[: -_SIGNATURE_SIZE - 1]
+        separator = decoded[-_SIGNATURE_SIZE - 1 : -_SIGNATURE_SIZE]
+        signature = decoded[-_SIGNATURE_SIZE:]
+        if separator != b"." or not hmac.compare_digest(signature, _sign(payload_bytes)):
             return None
         payload = json.loads(payload_bytes.decode())
-        if payload.get("exp", 0) < time.time():
+        if not isinstance(payload, dict):
             return None
-        return payload.get("user_id")
+        return payload
     except Exception:
         return None
+
+
+def decode_token(token: str) -> Optional[Dict[str, Any]]:
+    """Return the payload of a valid, unexpired token or ``None``.
+
+    The returned dictionary is shared with the cache and must not be
+    modified.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = _verified.get(key)
+    if payload is not None:
+        return payload
+    payload = _decode_uncached(token)
+    if payload is None:
+        return None
+    exp = payload.get("exp", 0)
+    if not isinstance(exp, (int, float)) or exp < time.time():
+        return None
+    _verified.set(key, payload, expires_at=exp)
+    return payload
+
+
+def verify_token(token: str) -> Optional[str]:
+    """Return the ``user_id`` if the token is valid and not expired."""
+    payload = decode_token(token)
+    return payload.get("user_id") if payload else None
+
+
+def cache_stats() -> Dict[str, int]:
+    """Return hit/miss/eviction counters of the verified-token cache."""
+    return _verified.stats()
@@ -0,0 +1,148 @@
+"""In-memory replica of Engine Control's permission policy.
+
+:class:`PolicyReplica` keeps every engine's compiled rules and the platform
+statuses in memory, synced from Engine Control's ``/policy/snapshot``. The
+first request returns a full snapshot; afterwards a background task
+long-polls with the version it holds and applies only the changes. Checks
+are then in-memory trie lookups with the same result ``/actions/check``
+gives.
+
+Long polls return at least every ``POLICY_POLL_WAIT_SECONDS`` even when
+nothing changed. If the replica has not synced for longer than
+``POLICY_MAX_STALENESS_SECONDS``, every check is denied until it has.
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import urlencode
+
+from action_engine import config
+from action_engine.adapters.http_client import get_http_client
+from action_engine.logging.logger import get_logger
+from shared.capability import evaluate
+from shared.permission_trie import PermissionTrie
+
+logger = get_logger(__name__)
+
+Fetcher = Callable[[Optional[int], Optional[str], float], Awaitable[Dict[str, Any]]]
+
+_EMPTY = PermissionTrie(())
+
+
+async def _fetch_from_engine_control(
+    since: Optional[int], epoch: Optional[str], wait: float
+) -> Dict[str, Any]:
+    query = {"wait": wait}
+    if since is not None and epoch is not None:
+        query.update(since=since, epoch=epoch)
+    response = await get_http_client().request(
+        "GET",
+        f"{config.ENGINE_CONTROL_URL.rstrip('/')}/policy/snapshot?{urlencode(query)}",
+        headers={"X-Engine-ID": config.ENGINE_ID, "X-Engine-Key": config.ENGINE_KEY},
+        timeout=wait + config.HTTP_TIMEOUT,
+    )
+    if response.status != 200:
+        raise RuntimeError(f"Policy sync failed with status {response.status}")
+    return json.loads(response.body)
+
+
+class PolicyReplica:
+    """Local copy of engine rules and platform statuses."""
+
+    def __init__(
+        self,
+        wait_seconds: float = 25.0,
+        max_staleness: float = 60.0,
+        retry_seconds: float = 2.0,
+        fetch: Fetcher = _fetch_from_engine_control,
+    ) -> None:
+        self.wait_seconds = wait_seconds
+        self.max_staleness = max_staleness
+        self.retry_seconds = retry_seconds
+        self._fetch = fetch
+        self.epoch: Optional[str] = None
+        self.version: Optional[int] = None
+        self.engines: Dict[str, PermissionTrie] = {}
+        self.statuses: Dict[str, str] = {}
+        self.last_synced: Optional[float] = None
+        self.metrics = {"full_syncs": 0, "delta_syncs": 0, "changes": 0, "failures": 0}
+        self._task: Optional["asyncio.Task"] = None
+
+    def apply(self, data: Dict[str, Any]) -> None:
+        """Apply a full snapshot or a list of changes from Engine Control."""
+        if data["full"]:
+            self.engines = {
+                engine_id: PermissionTrie.from_json(rules)
+                for engine_id, rules in data["engines"].items()
+            }
+            self.statuses = dict(data["platforms"])
+            self.metrics["full_syncs"] += 1
+        else:
+            engines, statuses = dict(self.engines), dict(self.statuses)
+            for change in data["changes"]:
+                if self.version is not None and change["version"] <= self.version:
+                    continue
+                target = engines if change["type"] == "engine" else statuses
+                value = change["value"]
+                if value is None or value == "active":
+                    target.pop(change["id"], None)
+                elif change["type"] == "engine":
+                    engines[change["id"]] = PermissionTrie.from_json(value)
+                else:
+                    statuses[change["id"]] = value
+                self.metrics["changes"] += 1
+            # Swapped in whole so readers never see a half-applied batch.
+            self.engines, self.statuses = engines, statuses
+            self.metrics["delta_syncs"] += 1
+        self.epoch = data["epoch"]
+        self.version = data["version"]
+
+    async def sync_once(self, wait: float = 0.0) -> None:
+        """Fetch and apply what changed since the held version."""
+        data = await self._fetch(self.version, self.epoch, wait)
+        self.apply(data)
+        self.last_synced = time.monotonic()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sync_once(self.wait_seconds if self.version is not None else 0.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.metrics["failures"] += 1
+                logger.info("Policy sync failed", extra={"error": str(exc)})
+                await asyncio.sleep(self.retry_seconds)
+
+    def start(self) -> None:
+        """Start the background sync task."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background sync task."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def stale(self) -> bool:
+        return (
+            self.last_synced is None
+            or time.monotonic() - self.last_synced > self.max_staleness
+        )
+
+    def check(self, engine_id: str, platform: str, action_type: str) -> Dict[str, Any]:
+        """Return ``{allowed, required_scopes, platform_status}`` for an action."""
+        if self.stale():
+            return {"allowed": False, "required_scopes": [], "platform_status": "unknown"}
+        return evaluate(self.engines.get(engine_id, _EMPTY), self.statuses, platform, action_type)
+
+
+replica = PolicyReplica(
+    config.POLICY_POLL_WAIT_SECONDS,
+    config.POLICY_MAX_STALENESS_SECONDS,
+    config.POLICY_RETRY_SECONDS,
+)
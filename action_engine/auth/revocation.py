@@ -0,0 +1,243 @@
+"""Revocation of bearer tokens before they expire.
+
+Revoked token ids (``jti``) are stored in Redis as ``revoked:{jti}`` with a
+TTL ending at the token's ``exp``, and announced on the ``revocations``
+pub/sub channel. Every worker keeps a :class:`BloomFilter` of revoked ids,
+filled by a full rebuild from Redis and kept current by the channel, so a
+token that was never revoked is cleared in memory. Only a filter hit (a
+revoked token or a false positive) costs an exact Redis lookup.
+
+The filter is rebuilt every ``REVOCATION_REBUILD_SECONDS``, which drops
+expired ids and repairs any message missed while the subscription was down.
+Until the first rebuild has finished, and whenever the subscription is lost,
+the filter cannot be trusted to hold every revoked id. Every check then goes
+to Redis, and a token that cannot be checked there is treated as revoked.
+Its size follows from ``REVOCATION_BLOOM_CAPACITY`` and
+``REVOCATION_BLOOM_FP_RATE``.
+"""
+
+import asyncio
+import hashlib
+import math
+import time
+from typing import Dict, Iterable, List, Optional
+
+from action_engine import metrics
+from action_engine.auth import token_manager
+from action_engine.config import (
+    REVOCATION_BLOOM_CAPACITY,
+    REVOCATION_BLOOM_FP_RATE,
+    REVOCATION_REBUILD_SECONDS,
+)
+from action_engine.logging.logger import get_logger, get_request_id
+
+logger = get_logger(__name__)
+
+KEY_PREFIX = "revoked:"
+CHANNEL = "revocations"
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing."""
+
+    def __init__(self, capacity: int, fp_rate: float) -> None:
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.size = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return ((h1 + i * h2) % size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        bits = self.bits
+        for pos in self._positions(item):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def estimated_fp_rate(self) -> float:
+        """False-positive rate expected with the current number of items."""
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+_filter = BloomFilter(REVOCATION_BLOOM_CAPACITY, REVOCATION_BLOOM_FP_RATE)
+# True while _filter holds every revoked id: rebuilt and subscribed since
+_loaded = False
+# Ids received while a rebuild is scanning Redis, re-added to the new filter
+_during_rebuild: Optional[List[str]] = None
+_last_rebuild = 0.0
+_listener_task: Optional["asyncio.Task"] = None
+
+_checks = metrics.REGISTRY.counter(
+    "action_revocation_checks_total",
+    "Revocation checks of bearer tokens by outcome",
+    ("result",),
+)
+_clear = _checks.labels("clear")
+_false_positive = _checks.labels("false_positive")
+_revoked = _checks.labels("revoked")
+_unfiltered = _checks.labels("unfiltered")
+metrics.REGISTRY.gauge(
+    "action_revocation_filter_entries",
+    "Revoked token ids in the local Bloom filter",
+    function=lambda: _filter.count,
+)
+
+
+def _key(jti: str) -> str:
+    return f"{KEY_PREFIX}{jti}"
+
+
+def _add_local(jti: str) -> None:
+    _filter.add(jti)
+    if _during_rebuild is not None:
+        _during_rebuild.append(jti)
+
+
+async def revoke(jti: str, exp: float) -> None:
+    """Revoke the token ``jti`` until its expiry time ``exp``.
+
+    Raises ``RuntimeError`` when Redis is unavailable.
+    """
+    ttl = math.ceil(exp - time.time())
+    if ttl <= 0:
+        return
+    client = await token_manager._get_redis()
+    try:
+        await client.set(_key(jti), "1", ex=ttl)
+        _add_local(jti)
+        await client.publish(CHANNEL, jti)
+    except Exception as exc:
+        # Connection and timeout errors of a client that was already open.
+        raise RuntimeError("Redis server unavailable") from exc
+    logger.info("Token revoked", extra={"jti": jti, "request_id": get_request_id()})
+
+
+async def is_revoked(jti: str) -> bool:
+    """Return ``True`` if the token ``jti`` was revoked."""
+    if not _loaded:
+        _unfiltered.inc()
+    elif jti not in _filter:
+        _clear.inc()
+        return False
+    try:
+        client = await token_manager._get_redis()
+        revoked = await client.get(_key(jti)) is not None
+    except Exception as exc:
+        # A token that cannot be checked is treated as revoked.
+        logger.info(
+            "Revocation check failed",
+            extra={"error": str(exc), "request_id": get_request_id()},
+        )
+        revoked = True
+    (_revoked if revoked else _false_positive).inc()
+    return revoked
+
+
+async def rebuild() -> int:
+    """Replace the local filter with one built from Redis; return its size."""
+    global _filter, _during_rebuild, _last_rebuild, _loaded
+    client = await token_manager._get_redis()
+    _during_rebuild = []
+    try:
+        ids = [key[len(KEY_PREFIX):] async for key in client.scan_iter(match=f"{KEY_PREFIX}*")]
+        ids.extend(_during_rebuild)
+    finally:
+        _during_rebuild = None
+    # Grow past the configured capacity rather than exceed the target rate.
+    fresh = BloomFilter(max(REVOCATION_BLOOM_CAPACITY, 2 * len(ids)), REVOCATION_BLOOM_FP_RATE)
+    for jti in ids:
+        fresh.add(jti)
+    _filter = fresh
+    _loaded = True
+    _last_rebuild = time.monotonic()
+    return fresh.count
+
+
+async def _close(pubsub) -> None:
+    try:
+        await pubsub.unsubscribe(CHANNEL)
+        close = getattr(pubsub, "aclose", None) or pubsub.close
+        await close()
+    except Exception:  # pragma: no cover - connection already gone
+        pass
+
+
+def _unload() -> None:
+    global _loaded
+    _loaded = False
+
+
+async def _listen() -> None:
+    while True:
+        try:
+            client = await token_manager._get_redis()
+            pubsub = client.pubsub()
+            await pubsub.subscribe(CHANNEL)
+            try:
+                # Subscribed first so nothing published during the scan is lost.
+                await rebuild()
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=1.0
+                    )
+                    if message and message.get("type") == "message":
+                        data = message["data"]
+                        _add_local(data.decode() if isinstance(data, bytes) else data)
+                    if time.monotonic() - _last_rebuild >= REVOCATION_REBUILD_SECONDS:
+                        await rebuild()
+            finally:
+                # Messages may be missed until the next subscription and rebuild.
+                _unload()
+                await _close(pubsub)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.info("Revocation listener error", extra={"error": str(exc)})
+            await asyncio.sleep(1.0)
+
+
+def start() -> None:
+    """Start the task keeping the local filter in sync with Redis."""
+    global _listener_task
+    if _listener_task is None:
+        _listener_task = asyncio.get_running_loop().create_task(_listen())
+
+
+async def stop() -> None:
+    """Stop the listener task."""
+    global _listener_task
+    task, _listener_task = _listener_task, None
+    if task is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+def stats() -> Dict[str, float]:
+    """Return the size, memory use and expected false-positive rate of the filter."""
+    return {
+        "loaded": _loaded,
+        "entries": _filter.count,
+        "bits": _filter.size,
+        "hashes": _filter.hashes,
+        "memory_bytes": len(_filter.bits),
+        "estimated_fp_rate": _filter.estimated_fp_rate(),
+    }
+
+
+def reset() -> None:
+    """Empty the local filter until the next rebuild (used in tests)."""
+    global _filter
+    _filter = BloomFilter(REVOCATION_BLOOM_CAPACITY, REVOCATION_BLOOM_FP_RATE)
+    _unload()
@@ -1,11 +1,24 @@
 """Asynchronous token storage utilities requiring Redis."""
 
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, Set
+import asyncio
 import json
+import secrets
 import time
 import base64
 
-from action_engine.config import REDIS_URL, ENCRYPTION_KEY
+from action_engine.config import (
+    REDIS_URL,
+    ENCRYPTION_KEY,
+    TOKEN_CACHE_MAX_ENTRIES,
+    TOKEN_CACHE_TTL_SECONDS,
+    TOKEN_REFRESH_AHEAD_SECONDS,
+    TOKEN_REFRESH_LOCK_TTL_SECONDS,
+    TOKEN_REFRESH_LOCK_POLL_SECONDS,
+)
+from action_engine import metrics
+from action_engine.logging.logger import get_logger
+from action_engine.utils.cache import TTLCache
 
 try:
     import redis.asyncio as redis  # type: ignore
@@ -14,6 +27,39 @@ except Exception:  # pragma: no cover - optional dependency
 
 _redis_client: Optional["redis.Redis"] = None
 
+# Lua scripts acting on KEYS[1] only while it still holds ARGV[1], so a worker
+# never deletes or extends a key another worker has since taken over.
+_DELETE_IF_EQUAL = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+_PEXPIRE_IF_EQUAL = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+logger = get_logger(__name__)
+
+# Decrypted token dictionaries keyed by ``user_id:platform``
+_token_cache = TTLCache(TOKEN_CACHE_MAX_ENTRIES, TOKEN_CACHE_TTL_SECONDS)
+# Refreshes in flight in this process, keyed by ``user_id:platform``
+_inflight: Dict[str, "asyncio.Future"] = {}
+# Strong references to refresh-ahead tasks
+_background_tasks: Set["asyncio.Task"] = set()
+# Bumped by every ``set_token`` in this process. A cache fill whose read
+# started before a bump may hold a token that has been replaced since.
+_token_generation = 0
+
+_token_cache_hits = metrics.cache_requests_total.labels("token", "hit")
+_token_cache_misses = metrics.cache_requests_total.labels("token", "miss")
+metrics.REGISTRY.gauge(
+    "action_token_cache_entries", "Decrypted tokens held in memory", function=lambda: len(_token_cache)
+)
+
 
 def _xor(data: bytes, key: bytes) -> bytes:
     return bytes(b ^ key[i % len(key)] for i, b in enumerate(data))
@@ -35,6 +81,7 @@ async def init_redis(client: "redis.Redis") -> None:
     """Inject a Redis client instance (used in tests)."""
     global _redis_client
     _redis_client = client
+    _token_cache.clear()
 
 
 async def _get_redis() -> Optional["redis.Redis"]:
@@ -53,6 +100,16 @@ async def _get_redis() -> Optional["redis.Redis"]:
         raise RuntimeError("Redis server unavailable") from exc
 
 
+async def delete_if_equal(client: "redis.Redis", key: str, value: str) -> bool:
+    """Atomically delete ``key`` if it still holds ``value``."""
+    return bool(await client.eval(_DELETE_IF_EQUAL, 1, key, value))
+
+
+async def pexpire_if_equal(client: "redis.Redis", key: str, value: str, ttl_ms: int) -> bool:
+    """Atomically reset the TTL of ``key`` if it still holds ``value``."""
+    return bool(await client.eval(_PEXPIRE_IF_EQUAL, 1, key, value, ttl_ms))
+
+
 async def get_token(user_id: str, platform: str) -> Optional[Dict[str, Any]]:
     """Retrieve a stored token dictionary for ``user_id``/``platform``."""
     client = await _get_redis()
@@ -68,9 +125,12 @@ async def get_token(user_id: str, platform: str) -> Optional[Dict[str, Any]]:
 
 async def set_token(user_id: str, platform: str, token_data: Dict[str, Any]) -> None:
     """Store token information for ``user_id``/``platform``."""
+    global _token_generation
     client = await _get_redis()
     encoded = _encrypt(json.dumps(token_data))
     await client.set(f"{user_id}:{platform}", encoded)
+    _token_generation += 1
+    _token_cache.pop(f"{user_id}:{platform}")
 
 
 def is_expired(token_data: Dict[str, Any]) -> bool:
@@ -81,31 +141,165 @@ def is_expired(token_data: Dict[str, Any]) -> bool:
     return time.time() >= float(expires_at)
 
 
+async def _exchange_refresh_token(platform: str, refresh_token_value: str) -> Dict[str, Any]:
+    """Exchange ``refresh_token_value`` with the provider for a new token."""
+    # Simulate token refresh. Real implementation would call provider API.
+    return {
+        "access_token": f"refreshed-{refresh_token_value}",
+        "refresh_token": refresh_token_value,
+        "expires_at": time.time() + 3600,
+    }
+
+
+async def _release_lock(client: "redis.Redis", lock_key: str, lock_value: str) -> None:
+    # Only delete the lock if we still own it; the check and the delete run
+    # as one script, so a lock another worker took over is never removed.
+    await delete_if_equal(client, lock_key, lock_value)
+
+
+async def _refresh_locked(
+    user_id: str, platform: str, needs_refresh: Callable[[Dict[str, Any]], bool]
+) -> Optional[Dict[str, Any]]:
+    """Refresh under a short-lived Redis lock shared by all workers."""
+    client = await _get_redis()
+    lock_key = f"lock:refresh:{user_id}:{platform}"
+    lock_value = secrets.token_hex(8)
+    while True:
+        acquired = await client.set(
+            lock_key, lock_value, nx=True, px=int(TOKEN_REFRESH_LOCK_TTL_SECONDS * 1000)
+        )
+        if acquired:
+            try:
+                # Another worker may have refreshed while we waited for the lock.
+                token_data = await get_token(user_id, platform)
+                if (
+                    not token_data
+                    or not token_data.get("refresh_token")
+                    or not needs_refresh(token_data)
+                ):
+                    return token_data
+                new_data = await _exchange_refresh_token(platform, token_data["refresh_token"])
+                await set_token(user_id, platform, new_data)
+                return new_data
+            finally:
+                await _release_lock(client, lock_key, lock_value)
+
+        # Another worker is refreshing; wait for its result or for the lock
+        # to be released (or to expire if that worker died).
+        await asyncio.sleep(TOKEN_REFRESH_LOCK_POLL_SECONDS)
+        token_data = await get_token(user_id, platform)
+        if token_data and not needs_refresh(token_data):
+            return token_data
+
+
+async def _single_flight_refresh(
+    user_id: str, platform: str, needs_refresh: Callable[[Dict[str, Any]], bool]
+) -> Optional[Dict[str, Any]]:
+    """Run at most one refresh per ``user_id:platform``; others await it."""
+    key = f"{user_id}:{platform}"
+    future = _inflight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(_refresh_locked(user_id, platform, needs_refresh))
+        _inflight[key] = future
+
+        def _done(fut: "asyncio.Future") -> None:
+            if _inflight.get(key) is fut:
+                del _inflight[key]
+
+        future.add_done_callback(_done)
+    # Shield so a cancelled caller does not cancel the shared refresh.
+    return await asyncio.shield(future)
+
+
 async def refresh_if_needed(user_id: str, platform: str) -> Optional[Dict[str, Any]]:
-    """Refresh the stored token using its ``refresh_token`` if expired."""
+    """Refresh the stored token using its ``refresh_token`` if expired.
+
+    Concurrent callers share a single refresh, both within this process and
+    across workers using the same Redis.
+    """
     token_data = await get_token(user_id, platform)
     if not token_data:
         return None
     if not is_expired(token_data):
         return token_data
 
-    refresh_token_value = token_data.get("refresh_token")
-    if not refresh_token_value:
+    if not token_data.get("refresh_token"):
         return token_data
 
-    # Simulate token refresh. Real implementation would call provider API.
-    new_data = {
-        "access_token": f"refreshed-{refresh_token_value}",
-        "refresh_token": refresh_token_value,
-        "expires_at": time.time() + 3600,
-    }
-    await set_token(user_id, platform, new_data)
-    return new_data
+    return await _single_flight_refresh(user_id, platform, is_expired)
+
+
+def _expiry(token_data: Dict[str, Any]) -> float:
+    expires_at = token_data.get("expires_at")
+    return float("inf") if expires_at is None else float(expires_at)
+
+
+def _cache_token(key: str, token_data: Dict[str, Any], generation: int) -> None:
+    """Cache ``token_data`` read at ``generation`` unless it may be stale.
+
+    A token stored while the read was in flight, or a later-expiring token
+    cached by a concurrent caller, is never overwritten.
+    """
+    if generation != _token_generation:
+        return
+    cached = _token_cache.peek(key)
+    if cached is not None and _expiry(cached) > _expiry(token_data):
+        return
+    _token_cache.set(key, token_data, expires_at=token_data.get("expires_at"))
+
+
+def _expires_soon(token_data: Dict[str, Any]) -> bool:
+    expires_at = token_data.get("expires_at")
+    if expires_at is None or not token_data.get("refresh_token"):
+        return False
+    return float(expires_at) - time.time() <= TOKEN_REFRESH_AHEAD_SECONDS
+
+
+async def _refresh_ahead(user_id: str, platform: str) -> None:
+    try:
+        await _single_flight_refresh(user_id, platform, _expires_soon)
+    except Exception as exc:  # pragma: no cover - retried on the next request
+        logger.info(
+            "Background token refresh failed",
+            extra={"user_id": user_id, "platform": platform, "error": str(exc)},
+        )
+
+
+def _schedule_refresh_ahead(user_id: str, platform: str) -> None:
+    if f"{user_id}:{platform}" in _inflight:
+        return
+    task = asyncio.get_running_loop().create_task(_refresh_ahead(user_id, platform))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
 
 
 async def get_access_token(user_id: str, platform: str) -> Optional[str]:
-    """Return a valid access token, refreshing if necessary."""
-    token_data = await refresh_if_needed(user_id, platform)
-    if not token_data:
-        return None
-    return token_data.get("access_token")
+    """Return a valid access token, refreshing if necessary.
+
+    Decrypted tokens are served from an in-process cache. Tokens that are
+    about to expire are refreshed in the background so the request path
+    keeps using the still-valid cached token.
+    """
+    start = time.perf_counter()
+    try:
+        key = f"{user_id}:{platform}"
+        token_data = _token_cache.get(key)
+        if token_data is None:
+            _token_cache_misses.inc()
+            generation = _token_generation
+            token_data = await refresh_if_needed(user_id, platform)
+            if not token_data:
+                return None
+            _cache_token(key, token_data, generation)
+        else:
+            _token_cache_hits.inc()
+        if _expires_soon(token_data):
+            _schedule_refresh_ahead(user_id, platform)
+        return token_data.get("access_token")
+    finally:
+        metrics.add_stage_time("token_fetch", time.perf_counter() - start)
+
+
+def cache_stats() -> Dict[str, int]:
+    """Return hit/miss/eviction counters of the decrypted token cache."""
+    return _token_cache.stats()
@@ -0,0 +1,119 @@
+"""Compare the pooled HTTP client with the previous executor + urllib path.
+
+A keep-alive HTTP/1.1 stand-in server is started in a separate process and
+both transports send the same number of requests at the same concurrency.
+
+Run with::
+
+    python -m action_engine.benchmarks.bench_http_client --requests 2000 --concurrency 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import statistics
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import request
+
+from action_engine.adapters.http_client import AsyncHTTPClient
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):  # noqa: N802 - http.server naming
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        body = b'{"id": "1"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 1024
+
+
+def _serve(port_queue) -> None:
+    server = _Server(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def _urllib_post(url: str, body: bytes) -> bytes:
+    req = request.Request(
+        url, data=body, headers={"Content-Type": "application/json"}, method="POST"
+    )
+    with request.urlopen(req, timeout=10) as resp:
+        return resp.read()
+
+
+async def _run(label: str, send, total: int, concurrency: int) -> None:
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with sem:
+            start = time.perf_counter()
+            await send()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(
+        f"{label:<10} {total / elapsed:>10.0f} req/s   "
+        f"p50 {statistics.median(latencies) * 1000:7.2f} ms   "
+        f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:7.2f} ms"
+    )
+
+
+async def main(total: int, concurrency: int) -> None:
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_serve, args=(port_queue,), daemon=True)
+    server.start()
+    url = f"http://127.0.0.1:{port_queue.get()}/send"
+    body = json.dumps({"to": "x@example.com"}).encode()
+
+    try:
+        loop = asyncio.get_running_loop()
+
+        async def executor_send():
+            return await loop.run_in_executor(None, _urllib_post, url, body)
+
+        client = AsyncHTTPClient()
+
+        async def pooled_send():
+            return await client.request(
+                "POST", url, headers={"Content-Type": "application/json"}, body=body
+            )
+
+        # Warm up both paths before measuring.
+        await _run("warmup", executor_send, min(total, 100), concurrency)
+        await _run("warmup", pooled_send, min(total, 100), concurrency)
+        print("-" * 60)
+        await _run("executor", executor_send, total, concurrency)
+        await _run("pooled", pooled_send, total, concurrency)
+        await client.aclose()
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
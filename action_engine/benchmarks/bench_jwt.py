@@ -0,0 +1,60 @@
+"""Measure bearer token verification cost per request.
+
+Compares the previous verification (base64 decode, HMAC rebuilt from the
+secret, JSON parse on every call) with the precomputed HMAC state on a
+cache miss and with a cache hit for a reused token.
+
+Run with::
+
+    python -m action_engine.benchmarks.bench_jwt --number 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import time
+import timeit
+
+from action_engine.auth import jwt_manager
+from action_engine.config import SECRET_KEY
+
+
+def previous_verify(token: str):
+    decoded = base64.urlsafe_b64decode(token.encode())
+    payload_bytes, signature = decoded.rsplit(b".", 1)
+    expected = hmac.new(SECRET_KEY.encode(), payload_bytes, hashlib.sha256).digest()
+    if not hmac.compare_digest(signature, expected):
+        return None
+    payload = json.loads(payload_bytes.decode())
+    if payload.get("exp", 0) < time.time():
+        return None
+    return payload.get("user_id")
+
+
+def main(number: int) -> None:
+    # Pick a token the previous parser accepts.
+    while True:
+        token = jwt_manager.create_token("bench-user")
+        if previous_verify(token):
+            break
+        time.sleep(1)
+    cases = {
+        "previous": lambda: previous_verify(token),
+        "precomputed HMAC, miss": lambda: jwt_manager._decode_uncached(token),
+        "cached hit": lambda: jwt_manager.verify_token(token),
+    }
+    jwt_manager.verify_token(token)
+    for label, func in cases.items():
+        seconds = min(timeit.repeat(func, number=number, repeat=5))
+        print(f"{label:<24} {seconds / number * 1e6:7.2f} us/verification")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=200000)
+    args = parser.parse_args()
+    main(args.number)
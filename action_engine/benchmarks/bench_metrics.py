@@ -0,0 +1,95 @@
+"""Measure the cost of recording router metrics on the hot path.
+
+Reports the time per recording primitive and the per-action overhead of the
+instrumentation in :func:`action_engine.router.process_action`, by running
+the same actions with the real metrics and with no-op stand-ins.
+
+Run with::
+
+    python -m action_engine.benchmarks.bench_metrics --actions 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+import timeit
+
+from action_engine import metrics, router
+
+
+class _NoopChild:
+    def inc(self, amount: float = 1.0) -> None:
+        pass
+
+    def dec(self, amount: float = 1.0) -> None:
+        pass
+
+    def observe(self, value: float) -> None:
+        pass
+
+
+class _NoopMetric:
+    _child = _NoopChild()
+
+    def labels(self, *values: str) -> _NoopChild:
+        return self._child
+
+
+def _primitives(number: int) -> None:
+    registry = metrics.Registry()
+    counter = registry.counter("c_total", "c", ("a", "b"))
+    hist = registry.histogram("h_seconds", "h", ("a", "b", "c", "d"))
+    child = counter.labels("x", "y")
+    cases = {
+        "counter child inc": lambda: child.inc(),
+        "counter labels().inc": lambda: counter.labels("x", "y").inc(),
+        "histogram labels().observe": lambda: hist.labels("a", "b", "c", "d").observe(0.003),
+        "perf_counter pair": lambda: time.perf_counter() - time.perf_counter(),
+    }
+    for label, func in cases.items():
+        seconds = min(timeit.repeat(func, number=number, repeat=5))
+        print(f"{label:<28} {seconds / number * 1e9:8.0f} ns/op")
+
+
+async def _run_actions(count: int) -> float:
+    action = {"platform": "test", "action_type": "ping", "user_id": "u1", "payload": {}}
+    start = time.perf_counter()
+    for _ in range(count):
+        await router.process_action(action)
+    return time.perf_counter() - start
+
+
+async def main(actions: int) -> None:
+    _primitives(actions * 10)
+
+    names = ("stage_seconds", "actions_total", "action_errors_total", "actions_in_flight")
+    real = {name: getattr(router, name) for name in names}
+    await _run_actions(1000)  # warm up
+    instrumented = min([await _run_actions(actions) for _ in range(3)])
+    for name in names:
+        setattr(router, name, _NoopMetric())
+    try:
+        bare = min([await _run_actions(actions) for _ in range(3)])
+    finally:
+        for name, metric in real.items():
+            setattr(router, name, metric)
+
+    per_action = (instrumented - bare) / actions
+    print(
+        f"process_action: {bare / actions * 1e6:.2f} us without metrics, "
+        f"{instrumented / actions * 1e6:.2f} us with metrics "
+        f"(+{per_action * 1e6:.2f} us, {per_action / (bare / actions) * 100:.1f}%)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--actions", type=int, default=20000)
+    args = parser.parse_args()
+    # The router logs every action; keep the measurement about metrics.
+    import logging
+
+    logging.disable(logging.CRITICAL)
+    asyncio.run(main(args.actions))
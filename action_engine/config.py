@@ -15,6 +15,69 @@ ACCESS_TOKEN_EXPIRE_SECONDS = int(os.getenv('ACCESS_TOKEN_EXPIRE_SECONDS', '3600
 ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY', 'enc_key')
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379')
 
+# Cache of verified bearer tokens used by ``jwt_manager``
+JWT_CACHE_MAX_ENTRIES = int(os.getenv('JWT_CACHE_MAX_ENTRIES', '10000'))
+JWT_CACHE_TTL_SECONDS = float(os.getenv('JWT_CACHE_TTL_SECONDS', '300'))
+
+# Local Bloom filter of revoked bearer tokens (see ``auth.revocation``)
+REVOCATION_BLOOM_CAPACITY = int(os.getenv('REVOCATION_BLOOM_CAPACITY', '100000'))
+REVOCATION_BLOOM_FP_RATE = float(os.getenv('REVOCATION_BLOOM_FP_RATE', '0.001'))
+REVOCATION_REBUILD_SECONDS = float(os.getenv('REVOCATION_REBUILD_SECONDS', '300'))
+
+# Outbound HTTP connection pooling shared by all adapters
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv('HTTP_MAX_CONNECTIONS_PER_HOST', '100'))
+HTTP_MAX_KEEPALIVE_PER_HOST = int(os.getenv('HTTP_MAX_KEEPALIVE_PER_HOST', '20'))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '30'))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '10'))
+HTTP_MAX_REDIRECTS = int(os.getenv('HTTP_MAX_REDIRECTS', '10'))
+
+# In-process cache of decrypted tokens used by ``token_manager``
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv('TOKEN_CACHE_MAX_ENTRIES', '10000'))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv('TOKEN_CACHE_TTL_SECONDS', '60'))
+TOKEN_REFRESH_AHEAD_SECONDS = float(os.getenv('TOKEN_REFRESH_AHEAD_SECONDS', '300'))
+# Cross-worker lock that lets a single worker refresh a given token
+TOKEN_REFRESH_LOCK_TTL_SECONDS = float(os.getenv('TOKEN_REFRESH_LOCK_TTL_SECONDS', '10'))
+TOKEN_REFRESH_LOCK_POLL_SECONDS = float(os.getenv('TOKEN_REFRESH_LOCK_POLL_SECONDS', '0.05'))
+
+# Batch execution through ``/perform_actions``
+BATCH_MAX_ACTIONS = int(os.getenv('BATCH_MAX_ACTIONS', '500'))
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '20'))
+
+# Replay of ``/perform_action`` results for a repeated ``Idempotency-Key``
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', '86400'))
+IDEMPOTENCY_PENDING_TTL_SECONDS = float(os.getenv('IDEMPOTENCY_PENDING_TTL_SECONDS', '60'))
+IDEMPOTENCY_POLL_SECONDS = float(os.getenv('IDEMPOTENCY_POLL_SECONDS', '0.05'))
+IDEMPOTENCY_LOCAL_MAX_ENTRIES = int(os.getenv('IDEMPOTENCY_LOCAL_MAX_ENTRIES', '10000'))
+
+# Sampling of hot-path log lines (see ``action_engine.logging.logger``)
+LOG_SAMPLE_SUCCESS_EVERY = int(os.getenv('LOG_SAMPLE_SUCCESS_EVERY', '10'))
+LOG_SAMPLE_ERROR_RATE = float(os.getenv('LOG_SAMPLE_ERROR_RATE', '1'))
+LOG_SAMPLE_ERROR_BURST = float(os.getenv('LOG_SAMPLE_ERROR_BURST', '5'))
+LOG_SAMPLE_SUMMARY_SECONDS = float(os.getenv('LOG_SAMPLE_SUMMARY_SECONDS', '60'))
+
+# Asynchronous ``/perform_action?mode=async`` jobs
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+JOB_RESULT_TTL_SECONDS = int(os.getenv('JOB_RESULT_TTL_SECONDS', '3600'))
+JOB_MAX_WAIT_SECONDS = float(os.getenv('JOB_MAX_WAIT_SECONDS', '30'))
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', '0.5'))
+JOB_DEQUEUE_TIMEOUT_SECONDS = int(os.getenv('JOB_DEQUEUE_TIMEOUT_SECONDS', '1'))
+JOB_VISIBILITY_TIMEOUT_SECONDS = float(os.getenv('JOB_VISIBILITY_TIMEOUT_SECONDS', '300'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+
+# Permission checks against Engine Control policy before running an action:
+# "off", "capability" (signed tokens verified locally) or "snapshot"
+# (replica of the whole policy synced by long-polling)
+PERMISSION_ENFORCEMENT = os.getenv('PERMISSION_ENFORCEMENT', 'off')
+ENGINE_CONTROL_URL = os.getenv('ENGINE_CONTROL_URL', 'http://localhost:8000')
+ENGINE_ID = os.getenv('ENGINE_ID', 'action')
+ENGINE_KEY = os.getenv('ACTION_ENGINE_KEY', 'action-key')
+CAPABILITY_SECRET = os.getenv('CAPABILITY_SECRET', 'capability-secret')
+CAPABILITY_REFRESH_FRACTION = float(os.getenv('CAPABILITY_REFRESH_FRACTION', '0.5'))
+CAPABILITY_RETRY_SECONDS = float(os.getenv('CAPABILITY_RETRY_SECONDS', '2'))
+POLICY_POLL_WAIT_SECONDS = float(os.getenv('POLICY_POLL_WAIT_SECONDS', '25'))
+POLICY_MAX_STALENESS_SECONDS = float(os.getenv('POLICY_MAX_STALENESS_SECONDS', '60'))
+POLICY_RETRY_SECONDS = float(os.getenv('POLICY_RETRY_SECONDS', '2'))
+
 
 def get_oauth_config(platform: str) -> dict:
     """Return OAuth configuration values for a given platform."""
@@ -1,22 +1,68 @@
-from typing import Any, Dict
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from action_engine.router import route_action
+from fastapi.responses import JSONResponse
 
+from action_engine import idempotency, jobs
+from action_engine.config import BATCH_CONCURRENCY
+from action_engine.router import process_action, route_action
 
-async def execute(action_model: Any):
-    """Execute an action model immediately via :func:`route_action`.
+
+def _to_payload(action_model: Any) -> Dict[str, Any]:
+    """Normalize ``action_model`` to the dictionary the router expects."""
+    if hasattr(action_model, "dict"):
+        return action_model.dict()
+    return dict(action_model)
+
+
+async def execute(
+    action_model: Any, mode: str = "sync", idempotency_key: Optional[str] = None
+):
+    """Execute an action model via :func:`route_action`.
 
     Parameters
     ----------
     action_model: Any
         Object describing the action. It can be either a dictionary or a
         Pydantic model with a ``dict()`` method.
+    mode: str
+        ``"sync"`` runs the action before responding. ``"async"`` queues it
+        and responds with ``202`` and a ``job_id`` to poll.
+    idempotency_key: Optional[str]
+        Deduplicates retried requests; in async mode a retry receives the
+        job id of the first request.
     """
-    # Normalize the input to a simple dictionary that ``route_action`` expects.
-    if hasattr(action_model, "dict"):
-        payload: Dict[str, Any] = action_model.dict()
-    else:
-        payload = dict(action_model)
+    data = _to_payload(action_model)
+    if mode == "async":
+        async def _enqueue() -> Tuple[Dict[str, Any], int]:
+            job_id = await jobs.enqueue(data)
+            return {"job_id": job_id, "status": "queued"}, 202
 
+        if idempotency_key:
+            content, status_code = await idempotency.run(
+                f"async:{idempotency_key}", data.get("user_id"), data, _enqueue
+            )
+        else:
+            content, status_code = await _enqueue()
+        return JSONResponse(content=content, status_code=status_code)
+    if mode != "sync":
+        return JSONResponse({"error": f"Unknown mode '{mode}'"}, status_code=400)
     # Delegate execution to the central router which invokes the proper adapter.
-    return await route_action(payload)
+    return await route_action(data, idempotency_key=idempotency_key)
+
+
+async def execute_batch(
+    action_models: Iterable[Any], concurrency: int = BATCH_CONCURRENCY
+) -> List[Tuple[Dict[str, Any], int]]:
+    """Execute several actions concurrently through the router.
+
+    At most ``concurrency`` actions are in flight at once. The returned list
+    holds one ``(content, status_code)`` pair per action, in input order.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _run(action_model: Any) -> Tuple[Dict[str, Any], int]:
+        async with semaphore:
+            return await process_action(_to_payload(action_model))
+
+    return list(await asyncio.gather(*(_run(m) for m in action_models)))
@@ -0,0 +1,239 @@
+"""Deduplication of retried actions carrying an ``Idempotency-Key``.
+
+The first request with a given key executes the action. A duplicate that
+arrives while it is still running waits for that execution - in this
+process through a shared future, across workers by polling a ``pending``
+marker in Redis. If the first request is cancelled, a waiting duplicate
+runs the action itself. The worker running the action renews its marker
+until the action finishes and only deletes the marker while it still holds
+its own token. Once finished, the response is stored in Redis for
+``IDEMPOTENCY_TTL_SECONDS`` and mirrored in a bounded in-process cache, so
+later duplicates get the stored response without running the adapter.
+
+Keys are scoped per user and bound to a fingerprint of the request body;
+reusing a key for a different request is rejected with 422. Responses with
+a 5xx status are not stored so a retry can run the action again.
+"""
+
+import asyncio
+import hashlib
+import json
+import secrets
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from action_engine import metrics
+from action_engine.auth import token_manager
+from action_engine.config import (
+    IDEMPOTENCY_TTL_SECONDS,
+    IDEMPOTENCY_PENDING_TTL_SECONDS,
+    IDEMPOTENCY_POLL_SECONDS,
+    IDEMPOTENCY_LOCAL_MAX_ENTRIES,
+)
+from action_engine.logging.logger import get_logger, get_request_id
+from action_engine.utils.cache import TTLCache
+
+logger = get_logger(__name__)
+
+Result = Tuple[Dict[str, Any], int]
+
+# Completed results keyed like their Redis entry: (fingerprint, content, status)
+_results = TTLCache(IDEMPOTENCY_LOCAL_MAX_ENTRIES, IDEMPOTENCY_TTL_SECONDS)
+# Executions in flight in this process
+_inflight: Dict[str, "asyncio.Future"] = {}
+_metrics: Dict[str, int] = {"hits": 0, "misses": 0, "waits": 0, "conflicts": 0}
+
+_cache_hits = metrics.cache_requests_total.labels("idempotency", "hit")
+_cache_misses = metrics.cache_requests_total.labels("idempotency", "miss")
+metrics.REGISTRY.gauge(
+    "action_idempotency_in_flight", "Idempotent executions in flight", function=lambda: len(_inflight)
+)
+
+
+def _redis_key(user_id: Optional[str], key: str) -> str:
+    return f"idem:{user_id or ''}:{key}"
+
+
+def fingerprint(data: Dict[str, Any]) -> str:
+    """Return a stable hash of a request body."""
+    encoded = json.dumps(data, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def _conflict() -> Result:
+    _metrics["conflicts"] += 1
+    return {"error": "Idempotency-Key was already used for a different request"}, 422
+
+
+def _replay(entry: Tuple[str, Dict[str, Any], int], digest: str) -> Result:
+    stored_digest, content, status_code = entry
+    if stored_digest != digest:
+        return _conflict()
+    _metrics["hits"] += 1
+    _cache_hits.inc()
+    return content, status_code
+
+
+async def _redis():
+    try:
+        return await token_manager._get_redis()
+    except RuntimeError as exc:
+        logger.info(
+            "Idempotency store unavailable",
+            extra={"error": str(exc), "request_id": get_request_id()},
+        )
+        return None
+
+
+async def _claim(
+    client, redis_key: str, digest: str, pending: str
+) -> Optional[Tuple[str, Dict[str, Any], int]]:
+    """Claim ``redis_key`` with the ``pending`` marker or return the stored result.
+
+    Waits while another worker holds a ``pending`` marker and takes over
+    when the marker expires without a result.
+    """
+    ttl_ms = int(IDEMPOTENCY_PENDING_TTL_SECONDS * 1000)
+    while True:
+        if await client.set(redis_key, pending, nx=True, px=ttl_ms):
+            return None
+        raw = await client.get(redis_key)
+        if raw is None:
+            continue
+        record = json.loads(raw)
+        if record.get("state") == "done":
+            return record["fingerprint"], record["content"], record["status_code"]
+        if record.get("fingerprint") != digest:
+            return record.get("fingerprint", ""), {}, 0
+        await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+
+
+async def _renew(client, redis_key: str, pending: str) -> None:
+    """Keep our ``pending`` marker from expiring while the action runs."""
+    ttl_ms = int(IDEMPOTENCY_PENDING_TTL_SECONDS * 1000)
+    while True:
+        await asyncio.sleep(IDEMPOTENCY_PENDING_TTL_SECONDS / 3)
+        try:
+            if not await token_manager.pexpire_if_equal(client, redis_key, pending, ttl_ms):
+                logger.warning(
+                    "Idempotency claim lost while the action was running",
+                    extra={"request_id": get_request_id()},
+                )
+                return
+        except Exception as exc:  # pragma: no cover - Redis went away mid-request
+            logger.info(
+                "Failed to renew idempotency claim",
+                extra={"error": str(exc), "request_id": get_request_id()},
+            )
+
+
+async def _execute(
+    redis_key: str, digest: str, func: Callable[[], Awaitable[Result]]
+) -> Tuple[Tuple[str, Dict[str, Any], int], bool]:
+    """Return the result entry and whether ``func`` ran in this call."""
+    client = await _redis()
+    pending = json.dumps({"state": "pending", "fingerprint": digest, "owner": secrets.token_hex(8)})
+    renewal = None
+    if client is not None:
+        stored = await _claim(client, redis_key, digest, pending)
+        if stored is not None:
+            if stored[0] == digest:
+                _results.set(redis_key, stored)
+            return stored, False
+        renewal = asyncio.create_task(_renew(client, redis_key, pending))
+
+    _metrics["misses"] += 1
+    _cache_misses.inc()
+    try:
+        content, status_code = await func()
+    except BaseException:
+        if client is not None:
+            await token_manager.delete_if_equal(client, redis_key, pending)
+        raise
+    finally:
+        if renewal is not None:
+            renewal.cancel()
+    entry = (digest, content, status_code)
+    if client is None:
+        if status_code < 500:
+            _results.set(redis_key, entry)
+        return entry, True
+    try:
+        if status_code < 500:
+            record = {
+                "state": "done",
+                "fingerprint": digest,
+                "content": content,
+                "status_code": status_code,
+                "stored_at": time.time(),
+            }
+            await client.set(redis_key, json.dumps(record), ex=IDEMPOTENCY_TTL_SECONDS)
+            _results.set(redis_key, entry)
+        else:
+            await token_manager.delete_if_equal(client, redis_key, pending)
+    except Exception as exc:  # pragma: no cover - Redis went away mid-request
+        logger.info(
+            "Failed to store idempotent result",
+            extra={"error": str(exc), "request_id": get_request_id()},
+        )
+    return entry, True
+
+
+async def run(
+    key: str,
+    user_id: Optional[str],
+    data: Dict[str, Any],
+    func: Callable[[], Awaitable[Result]],
+) -> Result:
+    """Execute ``func`` at most once per ``user_id`` and ``key``."""
+    redis_key = _redis_key(user_id, key)
+    digest = fingerprint(data)
+
+    cached = _results.get(redis_key)
+    if cached is not None:
+        return _replay(cached, digest)
+
+    future = _inflight.get(redis_key)
+    if future is not None:
+        _metrics["waits"] += 1
+        try:
+            entry = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                raise
+            # The caller running the action was cancelled, not this one: retry.
+            return await run(key, user_id, data, func)
+        return _replay(entry, digest)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[redis_key] = future
+    try:
+        entry, executed = await _execute(redis_key, digest, func)
+        future.set_result(entry)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as exc:
+        future.set_exception(exc)
+        # Mark the exception as retrieved when nobody else awaits it.
+        future.exception()
+        raise
+    finally:
+        _inflight.pop(redis_key, None)
+
+    if executed:
+        return entry[1], entry[2]
+    return _replay(entry, digest)
+
+
+def stats() -> Dict[str, int]:
+    """Return hit/miss counters and the size of the in-process cache."""
+    return dict(_metrics, cached=len(_results), inflight=len(_inflight))
+
+
+def reset() -> None:
+    """Forget in-process results and counters (used in tests)."""
+    _results.clear()
+    _inflight.clear()
+    for name in _metrics:
+        _metrics[name] = 0
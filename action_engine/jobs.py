@@ -0,0 +1,216 @@
+"""Redis-backed queue for actions executed asynchronously.
+
+:func:`enqueue` stores a job record under ``job:<id>`` and pushes the id
+onto ``jobs:queue``. Workers move ids atomically to ``jobs:processing``
+(``BRPOPLPUSH``), run the action through the router and store the result
+in the job record, which expires ``JOB_RESULT_TTL_SECONDS`` after the last
+update. Jobs left in ``jobs:processing`` by a crashed worker are pushed
+back onto the queue after ``JOB_VISIBILITY_TIMEOUT_SECONDS``; each job runs
+with its id as idempotency key, so a re-delivered job whose action already
+finished replays the stored response instead of running again.
+"""
+
+import asyncio
+import json
+import secrets
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from action_engine import router
+from action_engine.auth import token_manager
+from action_engine.config import (
+    JOB_DEQUEUE_TIMEOUT_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    JOB_MAX_WAIT_SECONDS,
+    JOB_POLL_SECONDS,
+    JOB_RESULT_TTL_SECONDS,
+    JOB_VISIBILITY_TIMEOUT_SECONDS,
+)
+from action_engine.logging.logger import get_logger
+
+logger = get_logger(__name__)
+
+QUEUE_KEY = "jobs:queue"
+PROCESSING_KEY = "jobs:processing"
+TERMINAL_STATES = ("succeeded", "failed")
+
+# Long-polls waiting in this process, keyed by job id
+_waiters: Dict[str, Set["asyncio.Future"]] = {}
+_worker_tasks: List["asyncio.Task"] = []
+
+
+def _job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+async def _save(client, record: Dict[str, Any]) -> None:
+    record["updated_at"] = time.time()
+    await client.set(_job_key(record["job_id"]), json.dumps(record), ex=JOB_RESULT_TTL_SECONDS)
+
+
+async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Return the stored record of ``job_id`` or ``None`` once expired."""
+    client = await token_manager._get_redis()
+    raw = await client.get(_job_key(job_id))
+    return json.loads(raw) if raw else None
+
+
+async def enqueue(data: Dict[str, Any]) -> str:
+    """Queue the action ``data`` and return its job id."""
+    client = await token_manager._get_redis()
+    job_id = secrets.token_hex(16)
+    now = time.time()
+    record = {
+        "job_id": job_id,
+        "user_id": data.get("user_id"),
+        "status": "queued",
+        "payload": data,
+        "attempts": 0,
+        "created_at": now,
+    }
+    await _save(client, record)
+    await client.lpush(QUEUE_KEY, job_id)
+    return job_id
+
+
+def public_view(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the fields of a job record exposed through the API."""
+    view = {
+        "job_id": record["job_id"],
+        "status": record["status"],
+        "created_at": record.get("created_at"),
+        "updated_at": record.get("updated_at"),
+    }
+    if record["status"] in TERMINAL_STATES:
+        view["result"] = record.get("result")
+    return view
+
+
+def _notify(job_id: str, record: Dict[str, Any]) -> None:
+    for future in _waiters.pop(job_id, ()):
+        if not future.done():
+            future.set_result(record)
+
+
+async def wait_for_job(job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+    """Return the job record, waiting up to ``timeout`` seconds for a result.
+
+    Jobs finished by a worker of this process wake the waiter at once;
+    results written by other processes are picked up every
+    ``JOB_POLL_SECONDS``.
+    """
+    timeout = max(0.0, min(timeout, JOB_MAX_WAIT_SECONDS))
+    deadline = time.monotonic() + timeout
+    while True:
+        record = await get_job(job_id)
+        remaining = deadline - time.monotonic()
+        if record is None or record["status"] in TERMINAL_STATES or remaining <= 0:
+            return record
+        future = asyncio.get_running_loop().create_future()
+        _waiters.setdefault(job_id, set()).add(future)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), min(JOB_POLL_SECONDS, remaining))
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            waiters = _waiters.get(job_id)
+            if waiters is not None:
+                waiters.discard(future)
+                if not waiters:
+                    _waiters.pop(job_id, None)
+
+
+async def process_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Run a job taken from the queue and store its outcome."""
+    client = await token_manager._get_redis()
+    record = await get_job(job_id)
+    if record is None or record["status"] in TERMINAL_STATES:
+        await client.lrem(PROCESSING_KEY, 0, job_id)
+        return record
+
+    record["attempts"] = record.get("attempts", 0) + 1
+    if record["attempts"] > JOB_MAX_ATTEMPTS:
+        record["status"] = "failed"
+        record["result"] = {"status_code": 500, "body": {"error": "Job exceeded retry limit"}}
+    else:
+        record["status"] = "running"
+        record["started_at"] = time.time()
+        await _save(client, record)
+        content, status_code = await router.dispatch_action(
+            record["payload"], idempotency_key=f"job:{job_id}"
+        )
+        record["status"] = "succeeded" if status_code < 400 else "failed"
+        record["result"] = {"status_code": status_code, "body": content}
+    await _save(client, record)
+    await client.lrem(PROCESSING_KEY, 0, job_id)
+    logger.info(
+        "Job finished",
+        extra={"job_id": job_id, "status": record["status"], "attempts": record["attempts"]},
+    )
+    _notify(job_id, record)
+    return record
+
+
+async def recover_stalled_jobs(now: Optional[float] = None) -> int:
+    """Re-queue jobs whose worker stopped before finishing them."""
+    client = await token_manager._get_redis()
+    now = time.time() if now is None else now
+    recovered = 0
+    for job_id in await client.lrange(PROCESSING_KEY, 0, -1):
+        record = await get_job(job_id)
+        if record is not None and record["status"] not in TERMINAL_STATES:
+            claimed_at = record.get("started_at") or record.get("created_at", 0)
+            if now - claimed_at < JOB_VISIBILITY_TIMEOUT_SECONDS:
+                continue
+        if await client.lrem(PROCESSING_KEY, 1, job_id) and record is not None:
+            if record["status"] not in TERMINAL_STATES:
+                await client.rpush(QUEUE_KEY, job_id)
+                recovered += 1
+    if recovered:
+        logger.info("Re-queued stalled jobs", extra={"count": recovered})
+    return recovered
+
+
+async def _worker() -> None:
+    while True:
+        try:
+            client = await token_manager._get_redis()
+            job_id = await client.brpoplpush(
+                QUEUE_KEY, PROCESSING_KEY, timeout=JOB_DEQUEUE_TIMEOUT_SECONDS
+            )
+            if job_id is not None:
+                await process_job(job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.info("Job worker error", extra={"error": str(exc)})
+            await asyncio.sleep(JOB_DEQUEUE_TIMEOUT_SECONDS)
+
+
+async def _recovery_loop() -> None:
+    while True:
+        try:
+            await recover_stalled_jobs()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.info("Job recovery error", extra={"error": str(exc)})
+        await asyncio.sleep(JOB_VISIBILITY_TIMEOUT_SECONDS / 2)
+
+
+def start_workers(count: int) -> None:
+    """Start ``count`` queue workers and the stalled-job recovery task."""
+    if _worker_tasks or count <= 0:
+        return
+    loop = asyncio.get_running_loop()
+    _worker_tasks.append(loop.create_task(_recovery_loop()))
+    _worker_tasks.extend(loop.create_task(_worker()) for _ in range(count))
+
+
+async def stop_workers() -> None:
+    """Cancel the workers; unfinished jobs are recovered later."""
+    tasks = list(_worker_tasks)
+    _worker_tasks.clear()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,10 +1,17 @@
-import json
 import logging
 from typing import Any
-from datetime import datetime, timezone
 import contextvars
 import uuid
 
+from action_engine.config import (
+    LOG_SAMPLE_ERROR_BURST,
+    LOG_SAMPLE_ERROR_RATE,
+    LOG_SAMPLE_SUCCESS_EVERY,
+    LOG_SAMPLE_SUMMARY_SECONDS,
+)
+from shared.log_pipeline import JsonFormatter, configure_logger
+from shared.log_sampling import SamplingFilter, SamplingRule
+
 # Context variable storing the current request ID
 request_id_ctx_var: contextvars.ContextVar[str | None] = contextvars.ContextVar(
     "request_id",
@@ -17,23 +24,6 @@ def get_request_id() -> str | None:
     return request_id_ctx_var.get()
 
 
-class JsonFormatter(logging.Formatter):
-    """Formatter that outputs logs as JSON strings."""
-
-    def format(self, record: logging.LogRecord) -> str:  # pragma: no cover - simple formatting
-        log_record = {
-            "level": record.levelname,
-            "name": record.name,
-            "message": record.getMessage(),
-            "time": datetime.now(timezone.utc).isoformat(),
-        }
-        if record.exc_info:
-            log_record["exception"] = self.formatException(record.exc_info)
-        if hasattr(record, "request_id") and record.request_id is not None:
-            log_record["request_id"] = record.request_id
-        return json.dumps(log_record)
-
-
 class SanitizeTokenFilter(logging.Filter):
     """Remove token-like fields from log records."""
 
@@ -44,19 +34,32 @@ class SanitizeTokenFilter(logging.Filter):
         return True
 
 
+def _rate_limited(logger: str, message: str) -> SamplingRule:
+    return SamplingRule(logger, message, rate=LOG_SAMPLE_ERROR_RATE, burst=LOG_SAMPLE_ERROR_BURST)
+
+
+#: Per-request lines of the router and adapters. Failures are kept or rate
+#: limited; routine success lines are sampled 1 in ``LOG_SAMPLE_SUCCESS_EVERY``.
+SAMPLING_RULES = (
+    SamplingRule("action_engine.router", "Execution error"),
+    # Permission denials are security relevant: never sampled.
+    SamplingRule("action_engine.router", "Action not permitted"),
+    _rate_limited("action_engine.router", "Validation error"),
+    _rate_limited("action_engine.router", "Unsupported platform"),
+    _rate_limited("action_engine.router", "Unknown action"),
+    _rate_limited("action_engine.router", "Action not supported"),
+    _rate_limited("action_engine.adapters*", "*token missing"),
+    SamplingRule("action_engine.router", every=LOG_SAMPLE_SUCCESS_EVERY),
+    SamplingRule("action_engine.adapters*", every=LOG_SAMPLE_SUCCESS_EVERY),
+)
+
+sampling_filter = SamplingFilter(SAMPLING_RULES, summary_interval=LOG_SAMPLE_SUMMARY_SECONDS)
+
+
 def get_logger(name: str) -> logging.Logger:
-    """Return a logger configured with :class:`JsonFormatter`."""
-
-    logger = logging.getLogger(name)
-
-    if not logger.handlers:
-        handler = logging.StreamHandler()
-        handler.setFormatter(JsonFormatter())
-        logger.addHandler(handler)
-        logger.addFilter(SanitizeTokenFilter())
-        logger.setLevel(logging.INFO)
-        logger.propagate = False
-    return logger
+    """Return a logger writing JSON through the shared non-blocking pipeline."""
+
+    return configure_logger(logging.getLogger(name), sampling_filter, SanitizeTokenFilter())
 
 
 class RequestIdMiddleware:
@@ -1,24 +1,53 @@
 from fastapi import FastAPI, HTTPException, Header
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import json
-from action_engine.router import route_action
-from action_engine.validator import ActionRequest
-from action_engine.auth.jwt_manager import create_token, verify_token
+from action_engine.executor import execute, execute_batch
+from action_engine.validator import ActionRequest, BatchActionRequest, validate_batch
+from action_engine.auth.jwt_manager import create_token, decode_token
 
 from action_engine.logging.logger import (
     get_logger,
     get_request_id,
     RequestIdMiddleware,
 )
-from action_engine.auth import token_manager
+from action_engine.auth import capability_client, policy_replica, revocation, token_manager
 from action_engine.auth.oauth_client import OAuthClient
-from action_engine import config
+from action_engine.adapters.http_client import close_http_client
+from action_engine import config, jobs, metrics
 
 app = FastAPI()
 app.add_middleware(RequestIdMiddleware)
+app.add_middleware(metrics.MetricsMiddleware, registry=metrics.REGISTRY)
 logger = get_logger(__name__)
 
 
+@app.on_event("startup")
+async def startup() -> None:
+    """Start the job workers and the background sync tasks."""
+    jobs.start_workers(config.JOB_WORKERS)
+    revocation.start()
+    if config.PERMISSION_ENFORCEMENT == "capability":
+        capability_client.client.start()
+    elif config.PERMISSION_ENFORCEMENT == "snapshot":
+        policy_replica.replica.start()
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    """Stop background tasks and close pooled upstream connections."""
+    await jobs.stop_workers()
+    await revocation.stop()
+    await capability_client.client.stop()
+    await policy_replica.replica.stop()
+    await close_http_client()
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Expose in-process metrics in the Prometheus text format."""
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.post("/login")
 async def login(data: dict):
     """Issue a token for ``user_id``."""
@@ -29,11 +58,29 @@ async def login(data: dict):
     return JSONResponse({"token": token})
 
 
-def _get_user_id(authorization: str | None) -> str | None:
+async def _verify(token: str) -> dict | None:
+    """Return the payload of a valid token that has not been revoked."""
+    payload = decode_token(token)
+    if payload is None:
+        return None
+    jti = payload.get("jti")
+    if jti and await revocation.is_revoked(jti):
+        return None
+    return payload
+
+
+def _bearer(authorization: str | None) -> str | None:
     if not authorization or not authorization.startswith("Bearer "):
         return None
-    token = authorization.split(" ", 1)[1]
-    return verify_token(token)
+    return authorization.split(" ", 1)[1]
+
+
+async def _get_user_id(authorization: str | None) -> str | None:
+    token = _bearer(authorization)
+    if token is None:
+        return None
+    payload = await _verify(token)
+    return payload.get("user_id") if payload else None
 
 
 def build_oauth_client(platform: str) -> OAuthClient:
@@ -46,21 +93,107 @@ def build_oauth_client(platform: str) -> OAuthClient:
 
 @app.post("/perform_action")
 async def perform_action(
-    request: ActionRequest, authorization: str = Header(None)
+    request: ActionRequest,
+    authorization: str = Header(None),
+    idempotency_key: str = Header(None),
+    mode: str = "sync",
 ):
-    user_id = _get_user_id(authorization)
+    user_id = await _get_user_id(authorization)
     if user_id != request.user_id:
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
     request_id = get_request_id()
     logger.info("Received action request", extra={"request_id": request_id})
-    response = await route_action(request.dict())
+    response = await execute(request, mode=mode, idempotency_key=idempotency_key)
     logger.info("Action request completed", extra={"request_id": request_id})
     return response
 
 
+@app.get("/actions/{job_id}")
+async def get_action_result(
+    job_id: str, wait: float = 0, authorization: str = Header(None)
+):
+    """Return the state of an async job, waiting up to ``wait`` seconds for it to finish."""
+    user_id = await _get_user_id(authorization)
+    if not user_id:
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+    record = await jobs.wait_for_job(job_id, wait)
+    if record is None or record.get("user_id") != user_id:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    return JSONResponse(jobs.public_view(record))
+
+
+@app.post("/perform_actions")
+async def perform_actions(
+    request: BatchActionRequest, authorization: str = Header(None)
+):
+    """Execute a batch of actions and return per-item results in input order."""
+    user_id = await _get_user_id(authorization)
+    if not user_id:
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+    actions = request.actions
+    if len(actions) > config.BATCH_MAX_ACTIONS:
+        return JSONResponse(
+            {"error": f"Batch too large: at most {config.BATCH_MAX_ACTIONS} actions"},
+            status_code=413,
+        )
+    request_id = get_request_id()
+    logger.info(
+        "Received batch request",
+        extra={"size": len(actions), "request_id": request_id},
+    )
+
+    results: list = [None] * len(actions)
+    runnable = []
+    for index, item in enumerate(validate_batch(actions)):
+        if isinstance(item, HTTPException):
+            results[index] = {"status_code": item.status_code, "body": {"error": item.detail}}
+        elif item.user_id != user_id:
+            results[index] = {"status_code": 401, "body": {"error": "Unauthorized"}}
+        else:
+            runnable.append((index, item))
+
+    outcomes = await execute_batch(
+        [item for _, item in runnable], concurrency=config.BATCH_CONCURRENCY
+    )
+    for (index, _), (content, status_code) in zip(runnable, outcomes):
+        results[index] = {"status_code": status_code, "body": content}
+
+    logger.info(
+        "Batch request completed",
+        extra={"size": len(actions), "executed": len(runnable), "request_id": request_id},
+    )
+    return JSONResponse(
+        {"results": [dict(index=i, **result) for i, result in enumerate(results)]}
+    )
+
+
+@app.post("/auth/revoke")
+async def revoke_token(data: dict | None = None, authorization: str = Header(None)):
+    """Revoke ``data["token"]``, or the caller's own token when none is given."""
+    token = _bearer(authorization)
+    caller = await _verify(token) if token else None
+    if caller is None:
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+    target = (data or {}).get("token") or token
+    payload = caller if target == token else await _verify(target)
+    if payload is None or payload.get("user_id") != caller.get("user_id"):
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+    if not payload.get("jti"):
+        return JSONResponse({"error": "Token cannot be revoked"}, status_code=400)
+    try:
+        await revocation.revoke(payload["jti"], payload["exp"])
+    except RuntimeError as exc:
+        logger.info(
+            "Token revocation failed",
+            extra={"error": str(exc), "request_id": get_request_id()},
+        )
+        return JSONResponse({"error": "Revocation store unavailable"}, status_code=503)
+    return JSONResponse({"status": "revoked"})
+
+
 @app.post("/auth/token")
 async def save_token(data: dict, authorization: str = Header(None)):
-    user_id_header = _get_user_id(authorization)
+    user_id_header = await _get_user_id(authorization)
     if user_id_header != data.get("user_id"):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
     """Store an access token for a user/platform."""
@@ -87,7 +220,7 @@ async def save_token(data: dict, authorization: str = Header(None)):
 @app.post("/auth/start")
 async def start_oauth(data: dict, authorization: str = Header(None)):
     """Initiate an OAuth authorization flow for a platform."""
-    user_id_header = _get_user_id(authorization)
+    user_id_header = await _get_user_id(authorization)
     if user_id_header != data.get("user_id"):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
 
@@ -118,7 +251,7 @@ async def start_oauth(data: dict, authorization: str = Header(None)):
 @app.post("/auth/callback")
 async def oauth_callback(data: dict, authorization: str = Header(None)):
     """Handle OAuth callback and store tokens."""
-    user_id_header = _get_user_id(authorization)
+    user_id_header = await _get_user_id(authorization)
     if user_id_header != data.get("user_id"):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
 
@@ -0,0 +1,53 @@
+"""Prometheus metrics of the Action Engine.
+
+The metric types, the registry and the HTTP middleware live in
+:mod:`shared.metrics`. This module holds the service's :data:`REGISTRY`,
+which the ``/metrics`` endpoint renders, the metrics shared by several
+modules and the per-action stage timer.
+"""
+
+from __future__ import annotations
+
+import contextvars
+from typing import Dict, Optional
+
+from shared.metrics import CONTENT_TYPE, MetricsMiddleware, Registry, http_metrics
+
+REGISTRY = Registry()
+# Listed on ``/metrics`` before the middleware has handled a request
+http_metrics(REGISTRY)
+
+cache_requests_total = REGISTRY.counter(
+    "action_cache_requests_total", "Lookups in in-process caches", ("cache", "result")
+)
+
+# Durations of sub-stages measured below the router (e.g. token fetches)
+# for the action currently being processed
+_stage_times: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "stage_times", default=None
+)
+
+
+def begin_stages() -> Dict[str, float]:
+    """Start collecting sub-stage durations for the current action."""
+    times: Dict[str, float] = {}
+    _stage_times.set(times)
+    return times
+
+
+def add_stage_time(stage: str, seconds: float) -> None:
+    """Add ``seconds`` to ``stage`` of the action being processed, if any."""
+    times = _stage_times.get()
+    if times is not None:
+        times[stage] = times.get(stage, 0.0) + seconds
+
+
+__all__ = [
+    "CONTENT_TYPE",
+    "MetricsMiddleware",
+    "REGISTRY",
+    "Registry",
+    "add_stage_time",
+    "begin_stages",
+    "cache_requests_total",
+]
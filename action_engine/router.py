@@ -1,28 +1,147 @@
+from typing import Any, Dict, Optional, Tuple
+
 from fastapi.responses import JSONResponse
 from fastapi import HTTPException
 
+import time
+
 from action_engine.logging.logger import get_logger, get_request_id
+from action_engine import config, idempotency, metrics
+from action_engine.auth import capability_client, policy_replica
 
 from action_engine.validator import validate_request
 from action_engine.action_parser import parse_request
 
 # ייבוא אדפטרים
 from action_engine.actions_registry import (
+    ACTION_FUNCTIONS,
     get_action_function,
     supported_actions,
 )
 
 logger = get_logger(__name__)
 
+stage_seconds = metrics.REGISTRY.histogram(
+    "action_stage_duration_seconds",
+    "Time spent per routing stage (validate, token_fetch, adapter, respond); "
+    "adapter includes token_fetch",
+    ("stage", "platform", "action_type", "status"),
+)
+actions_total = metrics.REGISTRY.counter(
+    "action_requests_total", "Actions processed", ("platform", "action_type", "status")
+)
+action_errors_total = metrics.REGISTRY.counter(
+    "action_errors_total", "Actions that failed, by failure kind", ("platform", "action_type", "kind")
+)
+actions_in_flight = metrics.REGISTRY.gauge(
+    "action_requests_in_flight", "Actions currently being processed"
+)
+
+
+def _metric_labels(data: Any) -> Tuple[str, str]:
+    """Return ``(platform, action_type)`` labels for ``data``.
+
+    Values that are not registered are reported as ``unknown`` so arbitrary
+    client input cannot create new time series.
+    """
+    if not isinstance(data, dict):
+        return "unknown", "unknown"
+    platform = data.get("platform")
+    action_type = data.get("action_type")
+    if not isinstance(platform, str) or not isinstance(action_type, str):
+        return "unknown", "unknown"
+    if platform == "test":
+        return platform, "unknown"
+    if platform not in ACTION_FUNCTIONS:
+        return "unknown", "unknown"
+    if get_action_function(platform, action_type) is None:
+        return platform, "unknown"
+    return platform, action_type
+
+
+async def route_action(data, idempotency_key: Optional[str] = None):
+    """Route ``data`` to its adapter and wrap the outcome in a JSON response.
+
+    With ``idempotency_key`` the action runs at most once per user and key;
+    duplicates receive the response of the first execution.
+    """
+    content, status_code = await dispatch_action(data, idempotency_key)
+    start = time.perf_counter()
+    response = JSONResponse(content=content, status_code=status_code)
+    stage_seconds.labels("respond", *_metric_labels(data), str(status_code)).observe(
+        time.perf_counter() - start
+    )
+    return response
+
 
-async def route_action(data):
+async def dispatch_action(
+    data, idempotency_key: Optional[str] = None
+) -> Tuple[Dict[str, Any], int]:
+    """Like :func:`route_action` but return ``(content, status_code)``."""
+    if idempotency_key:
+        return await idempotency.run(
+            idempotency_key, data.get("user_id"), data, lambda: process_action(data)
+        )
+    return await process_action(data)
+
+
+async def process_action(data) -> Tuple[Dict[str, Any], int]:
+    """Validate and execute an action, returning ``(content, status_code)``.
+
+    Stage durations and the outcome are recorded in :mod:`action_engine.metrics`.
+    """
+    stages = metrics.begin_stages()
+    in_flight = actions_in_flight.labels()
+    in_flight.inc()
+    try:
+        content, status_code = await _process_action(data, stages)
+    finally:
+        in_flight.dec()
+    platform, action_type = _metric_labels(data)
+    status = str(status_code)
+    for stage, seconds in stages.items():
+        stage_seconds.labels(stage, platform, action_type, status).observe(seconds)
+    actions_total.labels(platform, action_type, status).inc()
+    if status_code >= 400:
+        kind = "adapter" if "adapter" in stages else "request"
+        action_errors_total.labels(platform, action_type, kind).inc()
+    return content, status_code
+
+
+def _check_permission(platform: str, action_type: str) -> Optional[Tuple[Dict[str, Any], int]]:
+    """Return a 403 result if Engine Control policy forbids the action."""
+    mode = config.PERMISSION_ENFORCEMENT
+    if mode == "capability":
+        decision = capability_client.client.check(platform, action_type)
+    elif mode == "snapshot":
+        decision = policy_replica.replica.check(config.ENGINE_ID, platform, action_type)
+    else:
+        return None
+    if decision["allowed"]:
+        return None
+    logger.info(
+        "Action not permitted",
+        extra={
+            "platform": platform,
+            "action_type": action_type,
+            "platform_status": decision["platform_status"],
+            "request_id": get_request_id(),
+        },
+    )
+    return {"error": "Action not permitted", "platform_status": decision["platform_status"]}, 403
+
+
+async def _process_action(data, stages: Dict[str, float]) -> Tuple[Dict[str, Any], int]:
     request_id = get_request_id()
     logger.info("Routing action", extra={"payload": data, "request_id": request_id})
+    start = time.perf_counter()
     try:
         request_model = validate_request(data)
     except HTTPException as exc:
+        stages["validate"] = time.perf_counter() - start
         logger.info("Validation error", extra={"error": exc.detail, "request_id": request_id})
-        return JSONResponse(content={"error": exc.detail}, status_code=exc.status_code)
+        return {"error": exc.detail}, exc.status_code
+    stages["validate"] = time.perf_counter() - start
 
     action = parse_request(request_model)
     platform = action.platform
@@ -31,14 +150,11 @@ async def route_action(data):
     payload = action.payload
 
     if platform == "test":
-        return JSONResponse(content={"message": "המערכת עובדת 🎯"})
+        return {"message": "המערכת עובדת 🎯"}, 200
 
     if not platform or not list(supported_actions(platform)):
         logger.info("Unsupported platform", extra={"platform": platform, "request_id": request_id})
-        return JSONResponse(
-            content={"error": f"פלטפורמה לא תקינה או לא נתמכת: '{platform}'"},
-            status_code=400
-        )
+        return {"error": f"פלטפורמה לא תקינה או לא נתמכת: '{platform}'"}, 400
 
     # מנסה למצוא את הפונקציה המתאימה לפעולה
     action_func = get_action_function(platform, action_type)
@@ -48,31 +164,33 @@ async def route_action(data):
             "Unknown action",
             extra={"action_type": action_type, "platform": platform, "request_id": request_id},
         )
-        return JSONResponse(
-            content={"error": f"הפעולה '{action_type}' לא קיימת באדפטר '{platform}'"},
-            status_code=400
-        )
+        return {"error": f"הפעולה '{action_type}' לא קיימת באדפטר '{platform}'"}, 400
 
     if action_type not in supported_actions(platform):
         logger.info(
             "Action not supported",
             extra={"action_type": action_type, "platform": platform, "request_id": request_id},
         )
-        return JSONResponse(
-            content={"error": f"הפעולה '{action_type}' אינה נתמכת עבור הפלטפורמה '{platform}'"},
-            status_code=400,
-        )
+        return {"error": f"הפעולה '{action_type}' אינה נתמכת עבור הפלטפורמה '{platform}'"}, 400
+
+    denied = _check_permission(platform, action_type)
+    if denied is not None:
+        return denied
 
+    start = time.perf_counter()
     try:
         result = await action_func(user_id, payload)
+        stages["adapter"] = time.perf_counter() - start
         logger.info(
             "Adapter executed",
             extra={"platform": platform, "action_type": action_type, "request_id": request_id},
         )
-        return JSONResponse(content={"status": "success", "result": result})
+        return {"status": "success", "result": result}, 200
     except HTTPException as exc:
+        stages["adapter"] = time.perf_counter() - start
         logger.info("Execution error", extra={"error": exc.detail, "request_id": request_id})
-        return JSONResponse(content={"error": exc.detail}, status_code=exc.status_code)
+        return {"error": exc.detail}, exc.status_code
     except Exception as e:
+        stages["adapter"] = time.perf_counter() - start
         logger.info("Execution error", extra={"error": str(e), "request_id": request_id})
-        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
+        return {"status": "error", "message": str(e)}, 500
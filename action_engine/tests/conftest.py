@@ -1,4 +1,7 @@
+import fnmatch
+import json
 import sys
+import time
 import types
 from pathlib import Path
 
@@ -11,13 +14,35 @@ class DummyJSONResponse:
 class DummyHTTPException(Exception):
     """Lightweight stand-in for FastAPI HTTPException."""
 
-    def __init__(self, status_code: int, detail: str):
+    def __init__(self, status_code: int, detail: str, headers=None):
         super().__init__(detail)
         self.status_code = status_code
         self.detail = detail
+        self.headers = headers
+
+
+class DummyRequest:
+    """Request carrying a raw body and headers (lower-case names)."""
+
+    def __init__(self, body=b"", headers=None):
+        self._body = body
+        self.headers = {k.lower(): v for k, v in (headers or {}).items()}
+
+    async def body(self):
+        return self._body
+
+class DummyResponse:
+    def __init__(self, content=None, status_code=200, media_type=None, headers=None):
+        self.content = content
+        self.status_code = status_code
+        self.media_type = media_type
+        self.headers = dict(headers or {})
+
 
 a_responses = types.ModuleType("fastapi.responses")
 a_responses.JSONResponse = DummyJSONResponse
+a_responses.Response = DummyResponse
+a_responses.PlainTextResponse = DummyResponse
 
 a_exceptions = types.ModuleType("fastapi.exceptions")
 a_exceptions.HTTPException = DummyHTTPException
@@ -25,6 +50,7 @@ a_exceptions.HTTPException = DummyHTTPException
 fastapi = types.ModuleType("fastapi")
 fastapi.responses = a_responses
 fastapi.HTTPException = DummyHTTPException
+fastapi.Request = DummyRequest
 def Header(default=None):
     return default
 fastapi.Header = Header
@@ -47,6 +73,11 @@ class DummyFastAPI:
     def add_middleware(self, middleware_class, **options):
         self.middlewares.append((middleware_class, options))
 
+    def on_event(self, event):
+        def decorator(func):
+            return func
+        return decorator
+
 fastapi.FastAPI = DummyFastAPI
 
 sys.modules.setdefault("fastapi", fastapi)
@@ -88,7 +119,8 @@ def pytest_pyfunc_call(pyfuncitem):
     if pyfuncitem.get_closest_marker("asyncio"):
         func = pyfuncitem.obj
         if inspect.iscoroutinefunction(func):
-            asyncio.run(func(**pyfuncitem.funcargs))
+            argnames = pyfuncitem._fixtureinfo.argnames
+            asyncio.run(func(**{name: pyfuncitem.funcargs[name] for name in argnames}))
             return True
 
 def pytest_configure(config):
@@ -97,15 +129,267 @@ def pytest_configure(config):
     )
 
 
+class DummyPubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.channels = set()
+        self.messages = asyncio.Queue()
+
+    async def subscribe(self, *channels):
+        for channel in channels:
+            self.channels.add(channel)
+            self.redis.subscribers.setdefault(channel, set()).add(self)
+            self.messages.put_nowait({"type": "subscribe", "channel": channel, "data": 1})
+
+    async def unsubscribe(self, *channels):
+        for channel in channels or list(self.channels):
+            self.channels.discard(channel)
+            self.redis.subscribers.get(channel, set()).discard(self)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        deadline = time.time() + (timeout or 0)
+        while True:
+            try:
+                message = self.messages.get_nowait()
+            except asyncio.QueueEmpty:
+                if time.time() >= deadline:
+                    return None
+                await asyncio.sleep(0.001)
+                continue
+            if ignore_subscribe_messages and message["type"] != "message":
+                continue
+            return message
+
+    async def aclose(self):
+        await self.unsubscribe()
+
+
+class DummyPipeline:
+    """Queues commands and runs them against a :class:`DummyRedis` on ``execute``."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self):
+        commands, self.commands = self.commands, []
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in commands]
+
+
 class DummyRedis:
     def __init__(self):
         self.store = {}
+        self.expiry = {}
+        self.subscribers = {}
+
+    def pubsub(self):
+        return DummyPubSub(self)
+
+    def pipeline(self, transaction=True):
+        return DummyPipeline(self)
+
+    async def publish(self, channel, message):
+        receivers = self.subscribers.get(channel, set())
+        for pubsub in receivers:
+            pubsub.messages.put_nowait({"type": "message", "channel": channel, "data": message})
+        return len(receivers)
+
+    def _purge(self, key):
+        deadline = self.expiry.get(key)
+        if deadline is not None and time.time() >= deadline:
+            self.store.pop(key, None)
+            self.expiry.pop(key, None)
 
     async def ping(self):  # pragma: no cover - simple stub
         return True
 
     async def get(self, key):
+        self._purge(key)
         return self.store.get(key)
 
-    async def set(self, key, value):
+    async def set(self, key, value, ex=None, px=None, nx=False):
+        self._purge(key)
+        if nx and key in self.store:
+            return None
         self.store[key] = value
+        self.expiry.pop(key, None)
+        if ex is not None:
+            self.expiry[key] = time.time() + ex
+        elif px is not None:
+            self.expiry[key] = time.time() + px / 1000
+        return True
+
+    async def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            self._purge(key)
+            self.expiry.pop(key, None)
+            if self.store.pop(key, None) is not None:
+                removed += 1
+        return removed
+
+    async def pexpire(self, key, ttl_ms):
+        self._purge(key)
+        if key not in self.store:
+            return 0
+        self.expiry[key] = time.time() + int(ttl_ms) / 1000
+        return 1
+
+    async def incr(self, key):
+        self._purge(key)
+        self.store[key] = str(int(self.store.get(key, 0)) + 1)
+        return int(self.store[key])
+
+    async def eval(self, script, numkeys, *args):
+        # Only the scripts the services use are supported: Engine Control's
+        # shared state write, and compare-then-act scripts that run their
+        # command on KEYS[1] when it holds ARGV[1].
+        keys, argv = args[:numkeys], args[numkeys:]
+        if "'incr'" in script:
+            message = json.loads(argv[0])
+            if message["replace"]:
+                await self.delete(keys[0])
+            if message["values"]:
+                await self.hset(keys[0], mapping=message["values"])
+            version = await self.incr(keys[1])
+            await self.publish(argv[1], argv[0][:-1] + f',"version":{version}}}')
+            return version
+        if await self.get(keys[0]) != argv[0]:
+            return 0
+        if "'del'" in script:
+            return await self.delete(keys[0])
+        if "'pexpire'" in script:
+            return await self.pexpire(keys[0], argv[1])
+        raise NotImplementedError(script)
+
+    async def mget(self, keys, *args):
+        keys = list(keys) + list(args)
+        return [await self.get(key) for key in keys]
+
+    async def hset(self, name, key=None, value=None, mapping=None):
+        bucket = self.store.setdefault(name, {})
+        items = dict(mapping or {})
+        if key is not None:
+            items[key] = value
+        added = len([k for k in items if k not in bucket])
+        bucket.update(items)
+        return added
+
+    async def hsetnx(self, name, key, value):
+        bucket = self.store.setdefault(name, {})
+        if key in bucket:
+            return 0
+        bucket[key] = value
+        return 1
+
+    async def hget(self, name, key):
+        return self.store.get(name, {}).get(key)
+
+    async def hmget(self, name, keys, *args):
+        bucket = self.store.get(name, {})
+        return [bucket.get(key) for key in list(keys) + list(args)]
+
+    async def hgetall(self, name):
+        return dict(self.store.get(name, {}))
+
+    async def hincrby(self, name, key, amount=1):
+        bucket = self.store.setdefault(name, {})
+        bucket[key] = str(int(bucket.get(key, 0)) + amount)
+        return int(bucket[key])
+
+    async def hdel(self, name, *keys):
+        bucket = self.store.get(name, {})
+        return len([bucket.pop(k) for k in keys if k in bucket])
+
+    async def zadd(self, name, mapping):
+        bucket = self.store.setdefault(name, {})
+        added = len([m for m in mapping if m not in bucket])
+        bucket.update({m: float(score) for m, score in mapping.items()})
+        return added
+
+    async def zrem(self, name, *members):
+        bucket = self.store.get(name, {})
+        return len([bucket.pop(m) for m in members if m in bucket])
+
+    async def zscore(self, name, member):
+        return self.store.get(name, {}).get(member)
+
+    async def zcard(self, name):
+        return len(self.store.get(name, {}))
+
+    async def zrangebyscore(self, name, min, max, start=None, num=None, withscores=False):
+        low, high = float(min), float(max)
+        items = sorted(
+            ((m, s) for m, s in self.store.get(name, {}).items() if low <= s <= high),
+            key=lambda item: (item[1], item[0]),
+        )
+        if start is not None and num is not None:
+            items = items[start:start + num]
+        return items if withscores else [m for m, _ in items]
+
+    async def lpush(self, name, *values):
+        items = self.store.setdefault(name, [])
+        for value in values:
+            items.insert(0, value)
+        return len(items)
+
+    async def rpush(self, name, *values):
+        items = self.store.setdefault(name, [])
+        items.extend(values)
+        return len(items)
+
+    async def llen(self, name):
+        return len(self.store.get(name, []))
+
+    async def lrange(self, name, start, end):
+        items = self.store.get(name, [])
+        return list(items[start:] if end == -1 else items[start:end + 1])
+
+    async def lrem(self, name, count, value):
+        items = self.store.get(name, [])
+        removed = 0
+        while value in items and (count == 0 or removed < abs(count)):
+            items.remove(value)
+            removed += 1
+        return removed
+
+    async def rpoplpush(self, src, dst):
+        items = self.store.get(src)
+        if not items:
+            return None
+        value = items.pop()
+        self.store.setdefault(dst, []).insert(0, value)
+        return value
+
+    async def brpoplpush(self, src, dst, timeout=0):
+        deadline = time.time() + timeout
+        while True:
+            value = await self.rpoplpush(src, dst)
+            if value is not None or (timeout and time.time() >= deadline):
+                return value
+            await asyncio.sleep(0.001)
+
+    async def type(self, key):
+        self._purge(key)
+        value = self.store.get(key)
+        if value is None:
+            return "none"
+        if isinstance(value, list):
+            return "list"
+        if isinstance(value, dict):
+            # Sorted sets are stored as member -> float score.
+            scores = list(value.values())
+            return "zset" if scores and all(isinstance(s, float) for s in scores) else "hash"
+        return "string"
+
+    async def scan_iter(self, match=None, count=None):
+        for key in list(self.store):
+            if match is None or fnmatch.fnmatchcase(key, match):
+                yield key
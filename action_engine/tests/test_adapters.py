@@ -8,6 +8,7 @@ from action_engine.adapters import (
     zapier_adapter,
     BaseAdapter,
 )
+from action_engine.adapters.http_client import HTTPResponse
 from action_engine.auth import token_manager
 from action_engine.tests.conftest import DummyRedis
 
@@ -143,32 +144,37 @@ async def test_base_adapter_timeout(monkeypatch):
 
     called = {}
 
-    class DummyResp:
-        def __enter__(self):
-            return self
+    class FakeClient:
+        async def request(self, method, url, headers=None, body=None, timeout=None):
+            called["timeout"] = timeout
+            return HTTPResponse(200, "OK", {}, b"{}")
 
-        def __exit__(self, exc_type, exc, tb):
-            pass
+    import action_engine.adapters as base_mod
 
-        def read(self):
-            return b"{}"
+    monkeypatch.setattr(base_mod, "get_http_client", lambda: FakeClient())
 
-    def fake_urlopen(req, timeout=None):
-        called["timeout"] = timeout
-        return DummyResp()
-
-    import action_engine.adapters.__init__ as base_mod
-
-    monkeypatch.setattr(base_mod.request, "urlopen", fake_urlopen)
-
-    coro = await adapter.send_http_request("GET", "http://x")
-    result = await coro
+    result = await adapter.send_http_request("GET", "http://x")
     assert result == {}
     assert called["timeout"] == 10.0
 
     called.clear()
-    coro = await adapter.send_http_request("GET", "http://x", timeout=5)
-    result = await coro
+    result = await adapter.send_http_request("GET", "http://x", timeout=5)
     assert result == {}
     assert called["timeout"] == 5
 
+
+@pytest.mark.asyncio
+async def test_base_adapter_maps_http_errors(monkeypatch):
+    adapter = BaseAdapter("dummy")
+
+    class FakeClient:
+        async def request(self, method, url, headers=None, body=None, timeout=None):
+            return HTTPResponse(404, "Not Found", {}, b"")
+
+    import action_engine.adapters as base_mod
+
+    monkeypatch.setattr(base_mod, "get_http_client", lambda: FakeClient())
+
+    with pytest.raises(HTTPException) as exc:
+        await adapter.send_http_request("GET", "http://x")
+    assert exc.value.status_code == 404
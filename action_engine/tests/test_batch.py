@@ -0,0 +1,78 @@
+import asyncio
+import importlib
+import pytest
+
+from action_engine import actions_registry, executor
+from action_engine.auth import token_manager
+from action_engine.tests.conftest import DummyRedis
+
+# Import main after FastAPI stubs are set up in conftest
+main = importlib.import_module("action_engine.main")
+
+
+async def _token(user_id: str) -> str:
+    resp = await main.login({"user_id": user_id})
+    return resp.content["token"]
+
+
+@pytest.mark.asyncio
+async def test_batch_returns_per_item_results_in_order():
+    await token_manager.init_redis(DummyRedis())
+    await token_manager.set_token("u1", "zapier", {"access_token": "t"})
+    await token_manager.set_token("u1", "notion", {"access_token": "t"})
+    token = await _token("u1")
+    request = main.BatchActionRequest(
+        actions=[
+            {"platform": "zapier", "action_type": "perform_action", "user_id": "u1", "payload": {"x": 1}},
+            {"platform": "zapier", "action_type": "perform_action", "user_id": "u1"},
+            {"platform": "notion", "action_type": "create_task", "user_id": "u2", "payload": {"title": "t"}},
+            "not-an-action",
+            {"platform": "notion", "action_type": "create_task", "user_id": "u1", "payload": {"title": "t"}},
+            {"platform": "gmail", "action_type": "unknown", "user_id": "u1", "payload": {}},
+        ]
+    )
+    response = await main.perform_actions(request, authorization=f"Bearer {token}")
+    assert response.status_code == 200
+    results = response.content["results"]
+    assert [r["index"] for r in results] == list(range(6))
+    assert [r["status_code"] for r in results] == [200, 400, 401, 400, 200, 400]
+    assert results[0]["body"]["result"]["params"] == {"x": 1}
+    assert results[4]["body"]["result"]["platform"] == "notion"
+
+
+@pytest.mark.asyncio
+async def test_batch_requires_token():
+    request = main.BatchActionRequest(actions=[])
+    response = await main.perform_actions(request, authorization="Bearer bad")
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_batch_too_large(monkeypatch):
+    monkeypatch.setattr(main.config, "BATCH_MAX_ACTIONS", 2)
+    token = await _token("u1")
+    request = main.BatchActionRequest(actions=[{}, {}, {}])
+    response = await main.perform_actions(request, authorization=f"Bearer {token}")
+    assert response.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_execute_batch_bounds_concurrency(monkeypatch):
+    state = {"active": 0, "max": 0}
+
+    async def slow_action(user_id, payload):
+        state["active"] += 1
+        state["max"] = max(state["max"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        return payload
+
+    monkeypatch.setitem(actions_registry.ACTION_FUNCTIONS["zapier"], "perform_action", slow_action)
+    actions = [
+        {"platform": "zapier", "action_type": "perform_action", "user_id": "u1", "payload": {"i": i}}
+        for i in range(20)
+    ]
+    outcomes = await executor.execute_batch(actions, concurrency=3)
+    assert state["max"] == 3
+    assert [content["result"]["i"] for content, _ in outcomes] == list(range(20))
+    assert all(status == 200 for _, status in outcomes)
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from action_engine import config, router
+from action_engine.auth import capability_client
+from shared import capability
+from shared.permission_trie import PermissionTrie
+
+SECRET = "test-secret"
+
+
+def _fetcher(calls, ttl=60.0, permissions=None):
+    async def fetch():
+        calls.append(1)
+        trie = PermissionTrie.build(permissions or {"test": {"*": []}, "gmail": {"send_email": []}})
+        return capability.issue("action", trie, {}, SECRET, ttl)[0]
+
+    return fetch
+
+
+@pytest.mark.asyncio
+async def test_check_is_denied_until_a_token_is_held():
+    client = capability_client.CapabilityClient(SECRET, fetch=_fetcher([]))
+    assert client.check("gmail", "send_email")["allowed"] is False
+    await client.refresh()
+    assert client.check("gmail", "send_email")["allowed"] is True
+    assert client.check("gmail", "delete")["allowed"] is False
+
+
+@pytest.mark.asyncio
+async def test_background_task_refreshes_before_expiry():
+    calls = []
+    client = capability_client.CapabilityClient(SECRET, refresh_fraction=0.5, fetch=_fetcher(calls, ttl=0.1))
+    client.start()
+    try:
+        await asyncio.sleep(0.18)
+    finally:
+        await client.stop()
+    assert len(calls) >= 3
+    assert client.check("gmail", "send_email")["allowed"] is True
+
+
+@pytest.mark.asyncio
+async def test_invalid_tokens_are_not_accepted():
+    async def fetch():
+        return capability.issue("action", PermissionTrie(()), {}, "other-secret", 60)[0]
+
+    client = capability_client.CapabilityClient(SECRET, fetch=fetch)
+    with pytest.raises(RuntimeError):
+        await client.refresh()
+    assert client.current is None
+
+
+@pytest.mark.asyncio
+async def test_router_enforces_capability(monkeypatch):
+    client = capability_client.CapabilityClient(
+        SECRET, fetch=_fetcher([], permissions={"gmail": {"create_draft": []}})
+    )
+    await client.refresh()
+    monkeypatch.setattr(capability_client, "client", client)
+    monkeypatch.setattr(config, "PERMISSION_ENFORCEMENT", "capability")
+    action = {
+        "platform": "gmail",
+        "action_type": "send_email",
+        "user_id": "u1",
+        "payload": {"to": "a@b.c"},
+    }
+    content, status = await router.process_action(action)
+    assert status == 403
+    assert content == {"error": "Action not permitted", "platform_status": "active"}
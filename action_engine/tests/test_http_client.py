@@ -0,0 +1,182 @@
+import asyncio
+import json
+
+import pytest
+
+from action_engine.adapters.http_client import AsyncHTTPClient
+
+
+class LocalServer:
+    """Tiny keep-alive HTTP/1.1 server standing in for an upstream API."""
+
+    def __init__(self, delay: float = 0.0, chunked: bool = False, redirects=None, drop=()):
+        self.delay = delay
+        self.chunked = chunked
+        # path -> (status, location) answered instead of the echo response
+        self.redirects = redirects or {}
+        # 1-based numbers of requests to hang up on without answering
+        self.drop = set(drop)
+        self.requests = []
+        self.connections = 0
+        self.active = 0
+        self.max_active = 0
+        self.server = None
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                body = await reader.readexactly(length) if length else b""
+                method, path = request_line.decode().split()[:2]
+                self.requests.append((method, path, body))
+                if len(self.requests) in self.drop:
+                    break
+                if path in self.redirects:
+                    status, location = self.redirects[path]
+                    writer.write(
+                        b"HTTP/1.1 %d Moved\r\nLocation: %s\r\nContent-Length: 0\r\n\r\n"
+                        % (status, location.encode())
+                    )
+                    await writer.drain()
+                    continue
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+                await asyncio.sleep(self.delay)
+                self.active -= 1
+                payload = json.dumps(
+                    {"path": request_line.split()[1].decode(), "body": body.decode()}
+                ).encode()
+                if self.chunked:
+                    half = len(payload) // 2
+                    writer.write(
+                        b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                        + b"%x\r\n%s\r\n" % (half, payload[:half])
+                        + b"%x\r\n%s\r\n" % (len(payload) - half, payload[half:])
+                        + b"0\r\n\r\n"
+                    )
+                else:
+                    writer.write(
+                        b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%s" % (len(payload), payload)
+                    )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+@pytest.mark.asyncio
+async def test_connections_are_kept_alive():
+    async with LocalServer() as server:
+        client = AsyncHTTPClient()
+        for i in range(5):
+            resp = await client.request("POST", f"http://127.0.0.1:{server.port}/x?i={i}", body=b"hi")
+            assert resp.status == 200
+            assert json.loads(resp.body) == {"path": f"/x?i={i}", "body": "hi"}
+        assert server.connections == 1
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_pool_limits_concurrent_connections():
+    async with LocalServer(delay=0.02) as server:
+        client = AsyncHTTPClient(max_connections_per_host=2)
+        url = f"http://127.0.0.1:{server.port}/"
+        responses = await asyncio.gather(*(client.request("GET", url) for _ in range(10)))
+        assert all(r.status == 200 for r in responses)
+        assert server.connections == 2
+        assert server.max_active == 2
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_chunked_response_body():
+    async with LocalServer(chunked=True) as server:
+        client = AsyncHTTPClient()
+        resp = await client.request("GET", f"http://127.0.0.1:{server.port}/chunked")
+        assert json.loads(resp.body)["path"] == "/chunked"
+        resp = await client.request("GET", f"http://127.0.0.1:{server.port}/again")
+        assert json.loads(resp.body)["path"] == "/again"
+        assert server.connections == 1
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_per_request_timeout():
+    async with LocalServer(delay=0.5) as server:
+        client = AsyncHTTPClient()
+        with pytest.raises(asyncio.TimeoutError):
+            await client.request("GET", f"http://127.0.0.1:{server.port}/", timeout=0.05)
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_only_idempotent_requests_are_resent_on_a_stale_connection():
+    async with LocalServer(drop=(2, 4)) as server:
+        client = AsyncHTTPClient()
+        url = f"http://127.0.0.1:{server.port}/"
+        await client.request("GET", url)
+        # The second request reuses the connection and the server hangs up.
+        resp = await client.request("GET", url)
+        assert resp.status == 200
+        assert [m for m, _, _ in server.requests] == ["GET", "GET", "GET"]
+
+        with pytest.raises(ConnectionError):
+            await client.request("POST", url, body=b"once")
+        assert [m for m, _, _ in server.requests] == ["GET", "GET", "GET", "POST"]
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_redirects_are_followed_like_urllib():
+    redirects = {"/old": (302, "/new"), "/kept": (307, "/new"), "/loop": (301, "/loop")}
+    async with LocalServer(redirects=redirects) as server:
+        client = AsyncHTTPClient(max_redirects=3)
+        base = f"http://127.0.0.1:{server.port}"
+
+        resp = await client.request("GET", base + "/old")
+        assert json.loads(resp.body)["path"] == "/new"
+
+        resp = await client.request("POST", base + "/old", body=b"x", headers={"Content-Type": "text/plain"})
+        assert json.loads(resp.body) == {"path": "/new", "body": ""}
+        assert server.requests[-1][0] == "GET"
+
+        # A 307 must not change the method, and a POST is not resent.
+        resp = await client.request("POST", base + "/kept", body=b"x")
+        assert resp.status == 307
+
+        with pytest.raises(ValueError):
+            await client.request("GET", base + "/loop")
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_http_requests_are_forwarded_through_the_proxy():
+    async with LocalServer() as proxy:
+        client = AsyncHTTPClient(
+            proxies={"http": f"http://user:pw@127.0.0.1:{proxy.port}", "no": "skip.test"}
+        )
+        resp = await client.request("GET", "http://api.example.test/v1?q=1")
+        assert json.loads(resp.body)["path"] == "http://api.example.test/v1?q=1"
+        assert client._pool_for("http", "skip.test", 80).proxy is None
+        await client.aclose()
@@ -0,0 +1,186 @@
+import asyncio
+import importlib
+import json
+import pytest
+
+from action_engine import idempotency
+from action_engine.auth import token_manager
+from action_engine.tests.conftest import DummyRedis
+
+router = importlib.import_module("action_engine.router")
+
+
+def _action(payload=None):
+    return {
+        "platform": "gmail",
+        "action_type": "perform_action",
+        "user_id": "u1",
+        "payload": payload or {"to": "a@example.com"},
+    }
+
+
+def _counting_processor(monkeypatch, status_code=200, delay=0.01):
+    calls = []
+
+    async def fake_process(data):
+        calls.append(data)
+        await asyncio.sleep(delay)
+        return {"status": "success", "n": len(calls)}, status_code
+
+    monkeypatch.setattr(router, "process_action", fake_process)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_wait_for_single_execution(monkeypatch):
+    await token_manager.init_redis(DummyRedis())
+    idempotency.reset()
+    calls = _counting_processor(monkeypatch)
+    responses = await asyncio.gather(
+        *(router.route_action(_action(), idempotency_key="k1") for _ in range(20))
+    )
+    assert len(calls) == 1
+    assert {r.content["n"] for r in responses} == {1}
+    stats = idempotency.stats()
+    assert stats["misses"] == 1
+    assert stats["waits"] == 19
+    assert stats["inflight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_later_duplicate_replays_stored_response(monkeypatch):
+    redis = DummyRedis()
+    await token_manager.init_redis(redis)
+    idempotency.reset()
+    calls = _counting_processor(monkeypatch)
+    first = await router.route_action(_action(), idempotency_key="k1")
+
+    # A fresh worker only has the Redis copy.
+    idempotency.reset()
+    second = await router.route_action(_action(), idempotency_key="k1")
+    assert len(calls) == 1
+    assert second.status_code == first.status_code == 200
+    assert second.content == first.content
+    assert idempotency.stats()["hits"] == 1
+    assert json.loads(await redis.get("idem:u1:k1"))["state"] == "done"
+
+    await router.route_action(_action(), idempotency_key="k2")
+    await router.route_action(_action())
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_waits_for_execution_on_another_worker(monkeypatch):
+    redis = DummyRedis()
+    await token_manager.init_redis(redis)
+    idempotency.reset()
+    calls = _counting_processor(monkeypatch)
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_POLL_SECONDS", 0.005)
+    digest = idempotency.fingerprint(_action())
+    await redis.set(
+        "idem:u1:k1", json.dumps({"state": "pending", "fingerprint": digest}), px=5000
+    )
+
+    async def other_worker_finishes():
+        await asyncio.sleep(0.02)
+        record = {
+            "state": "done",
+            "fingerprint": digest,
+            "content": {"status": "success", "from": "other"},
+            "status_code": 200,
+        }
+        await redis.set("idem:u1:k1", json.dumps(record))
+
+    _, response = await asyncio.gather(
+        other_worker_finishes(), router.route_action(_action(), idempotency_key="k1")
+    )
+    assert calls == []
+    assert response.content == {"status": "success", "from": "other"}
+
+
+@pytest.mark.asyncio
+async def test_key_reused_for_different_request_is_rejected(monkeypatch):
+    await token_manager.init_redis(DummyRedis())
+    idempotency.reset()
+    calls = _counting_processor(monkeypatch)
+    await router.route_action(_action(), idempotency_key="k1")
+    response = await router.route_action(_action({"to": "b@example.com"}), idempotency_key="k1")
+    assert response.status_code == 422
+    assert len(calls) == 1
+    assert idempotency.stats()["conflicts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_server_errors_are_not_stored(monkeypatch):
+    redis = DummyRedis()
+    await token_manager.init_redis(redis)
+    idempotency.reset()
+    calls = _counting_processor(monkeypatch, status_code=502, delay=0)
+    await router.route_action(_action(), idempotency_key="k1")
+    await router.route_action(_action(), idempotency_key="k1")
+    assert len(calls) == 2
+    assert await redis.get("idem:u1:k1") is None
+
+
+@pytest.mark.asyncio
+async def test_keys_are_scoped_per_user(monkeypatch):
+    await token_manager.init_redis(DummyRedis())
+    idempotency.reset()
+    calls = _counting_processor(monkeypatch, delay=0)
+    await router.route_action(_action(), idempotency_key="k1")
+    await router.route_action(dict(_action(), user_id="u2"), idempotency_key="k1")
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_claim_is_renewed_while_a_slow_action_runs(monkeypatch):
+    redis = DummyRedis()
+    await token_manager.init_redis(redis)
+    idempotency.reset()
+    calls = _counting_processor(monkeypatch, delay=0.4)
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_PENDING_TTL_SECONDS", 0.15)
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_POLL_SECONDS", 0.005)
+
+    async def other_worker():
+        await asyncio.sleep(0.25)
+        # A fresh worker only sees Redis, where the marker must still be held.
+        idempotency._inflight.clear()
+        return await router.route_action(_action(), idempotency_key="k1")
+
+    first, second = await asyncio.gather(router.route_action(_action(), idempotency_key="k1"), other_worker())
+    assert len(calls) == 1
+    assert second.content == first.content
+
+
+@pytest.mark.asyncio
+async def test_failed_action_does_not_delete_a_claim_it_lost(monkeypatch):
+    redis = DummyRedis()
+    await token_manager.init_redis(redis)
+    idempotency.reset()
+
+    async def failing_process(data):
+        # Another worker took the key over after our marker expired.
+        await redis.set("idem:u1:k1", json.dumps({"state": "pending", "fingerprint": "theirs"}))
+        return {"status": "error"}, 502
+
+    monkeypatch.setattr(router, "process_action", failing_process)
+    await router.route_action(_action(), idempotency_key="k1")
+    assert json.loads(await redis.get("idem:u1:k1"))["fingerprint"] == "theirs"
+
+
+@pytest.mark.asyncio
+async def test_waiter_runs_the_action_when_the_first_caller_is_cancelled(monkeypatch):
+    await token_manager.init_redis(DummyRedis())
+    idempotency.reset()
+    calls = _counting_processor(monkeypatch, delay=0.1)
+    first = asyncio.ensure_future(router.route_action(_action(), idempotency_key="k1"))
+    await asyncio.sleep(0.01)
+    second = asyncio.ensure_future(router.route_action(_action(), idempotency_key="k1"))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    resp = await asyncio.wait_for(second, 1)
+    assert first.cancelled()
+    assert resp.status_code == 200
+    assert resp.content["n"] == 2
+    assert len(calls) == 2
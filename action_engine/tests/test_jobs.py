@@ -0,0 +1,132 @@
+import asyncio
+import importlib
+import time
+import pytest
+
+from action_engine import executor, idempotency, jobs
+from action_engine.auth import token_manager
+from action_engine.auth.jwt_manager import create_token
+from action_engine.tests.conftest import DummyRedis
+
+router = importlib.import_module("action_engine.router")
+main = importlib.import_module("action_engine.main")
+
+
+def _action(user_id="u1"):
+    return {
+        "platform": "gmail",
+        "action_type": "perform_action",
+        "user_id": user_id,
+        "payload": {"to": "a@example.com"},
+    }
+
+
+def _slow_processor(monkeypatch, delay=0.02):
+    calls = []
+
+    async def fake_process(data):
+        calls.append(data)
+        await asyncio.sleep(delay)
+        return {"status": "success", "n": len(calls)}, 200
+
+    monkeypatch.setattr(router, "process_action", fake_process)
+    return calls
+
+
+async def _setup():
+    redis = DummyRedis()
+    await token_manager.init_redis(redis)
+    idempotency.reset()
+    return redis
+
+
+@pytest.mark.asyncio
+async def test_async_mode_returns_job_id_and_worker_stores_result(monkeypatch):
+    redis = await _setup()
+    calls = _slow_processor(monkeypatch)
+    response = await executor.execute(_action(), mode="async")
+    assert response.status_code == 202
+    job_id = response.content["job_id"]
+    assert calls == []
+    assert (await jobs.get_job(job_id))["status"] == "queued"
+
+    jobs.start_workers(2)
+    try:
+        record = await jobs.wait_for_job(job_id, 5)
+    finally:
+        await jobs.stop_workers()
+    assert record["status"] == "succeeded"
+    assert record["result"] == {"status_code": 200, "body": {"status": "success", "n": 1}}
+    assert len(calls) == 1
+    assert await redis.llen(jobs.PROCESSING_KEY) == 0
+    assert 0 < redis.expiry[jobs._job_key(job_id)] - time.time() <= jobs.JOB_RESULT_TTL_SECONDS
+
+
+@pytest.mark.asyncio
+async def test_long_poll_endpoint_is_owner_only(monkeypatch):
+    await _setup()
+    _slow_processor(monkeypatch)
+    headers = {"authorization": f"Bearer {create_token('u1')}"}
+    created = await main.perform_action(
+        main.ActionRequest(**_action()), mode="async", idempotency_key=None, **headers
+    )
+    job_id = created.content["job_id"]
+
+    pending = await main.get_action_result(job_id, wait=0, **headers)
+    assert pending.status_code == 200
+    assert pending.content["status"] == "queued"
+    assert "result" not in pending.content
+
+    jobs.start_workers(1)
+    try:
+        done = await main.get_action_result(job_id, wait=5, **headers)
+    finally:
+        await jobs.stop_workers()
+    assert done.content["status"] == "succeeded"
+    assert done.content["result"]["status_code"] == 200
+
+    other = await main.get_action_result(
+        job_id, wait=0, authorization=f"Bearer {create_token('u2')}"
+    )
+    assert other.status_code == 404
+    missing = await main.get_action_result("nope", wait=0, **headers)
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_idempotent_async_request_reuses_job(monkeypatch):
+    redis = await _setup()
+    _slow_processor(monkeypatch)
+    first = await executor.execute(_action(), mode="async", idempotency_key="k1")
+    second = await executor.execute(_action(), mode="async", idempotency_key="k1")
+    assert first.content["job_id"] == second.content["job_id"]
+    assert await redis.llen(jobs.QUEUE_KEY) == 1
+
+
+@pytest.mark.asyncio
+async def test_stalled_job_is_requeued_and_not_executed_twice(monkeypatch):
+    redis = await _setup()
+    calls = _slow_processor(monkeypatch, delay=0)
+    job_id = await jobs.enqueue(_action())
+    # A worker took the job, ran the action and died before storing the job result.
+    await redis.rpoplpush(jobs.QUEUE_KEY, jobs.PROCESSING_KEY)
+    await router.dispatch_action(_action(), idempotency_key=f"job:{job_id}")
+    assert len(calls) == 1
+
+    assert await jobs.recover_stalled_jobs() == 0
+    later = time.time() + jobs.JOB_VISIBILITY_TIMEOUT_SECONDS + 1
+    assert await jobs.recover_stalled_jobs(now=later) == 1
+    assert await redis.lrange(jobs.QUEUE_KEY, 0, -1) == [job_id]
+
+    moved = await redis.rpoplpush(jobs.QUEUE_KEY, jobs.PROCESSING_KEY)
+    record = await jobs.process_job(moved)
+    assert record["status"] == "succeeded"
+    assert record["attempts"] == 1
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_unknown_mode_is_rejected():
+    await _setup()
+    response = await executor.execute(_action(), mode="later")
+    assert response.status_code == 400
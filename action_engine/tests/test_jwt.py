@@ -0,0 +1,50 @@
+import base64
+import json
+import time
+
+from action_engine.auth import jwt_manager
+
+
+def _forge(payload, sign=True):
+    payload_bytes = json.dumps(payload, separators=(",", ":")).encode()
+    signature = jwt_manager._sign(payload_bytes) if sign else b"x" * 32
+    return base64.urlsafe_b64encode(payload_bytes + b"." + signature).decode()
+
+
+def test_signature_containing_separator_verifies(monkeypatch):
+    # Find an expiry whose signature contains b"." - the old rsplit-based
+    # parser rejected such tokens.
+    base = int(time.time()) + 3600
+    for exp in range(base, base + 5000):
+        payload = {"user_id": "u1", "exp": exp}
+        payload_bytes = json.dumps(payload, separators=(",", ":")).encode()
+        if b"." in jwt_manager._sign(payload_bytes):
+            break
+    assert jwt_manager.verify_token(_forge(payload)) == "u1"
+
+
+def test_rejects_bad_signature_and_expired_tokens():
+    assert jwt_manager.verify_token(_forge({"user_id": "u1", "exp": time.time() + 60}, sign=False)) is None
+    assert jwt_manager.verify_token(_forge({"user_id": "u1", "exp": time.time() - 1})) is None
+    assert jwt_manager.verify_token("not-a-token") is None
+
+
+def test_verified_tokens_are_cached_until_exp(monkeypatch):
+    token = jwt_manager.create_token("u1")
+    jwt_manager.verify_token(token)
+    calls = []
+    original = jwt_manager._decode_uncached
+    monkeypatch.setattr(
+        jwt_manager, "_decode_uncached", lambda t: calls.append(t) or original(t)
+    )
+    for _ in range(100):
+        assert jwt_manager.verify_token(token) == "u1"
+    assert calls == []
+
+    # An entry never outlives the token's exp.
+    short = _forge({"user_id": "u2", "exp": int(time.time()) + 1})
+    assert jwt_manager.verify_token(short) == "u2"
+    real_time = time.time
+    monkeypatch.setattr(jwt_manager._verified, "_clock", lambda: real_time() + 2)
+    monkeypatch.setattr(jwt_manager.time, "time", lambda: real_time() + 2)
+    assert jwt_manager.verify_token(short) is None
@@ -2,6 +2,7 @@ import io
 import json
 import logging
 from action_engine.logging.logger import JsonFormatter, get_logger
+from shared import log_pipeline
 
 
 def create_logger():
@@ -38,11 +39,26 @@ def test_sanitize_token_filter_replaces_sensitive_values():
     logger = get_logger('token_test_logger')
     stream = io.StringIO()
 
-    handler = logger.handlers[0]
-    handler.stream = stream
+    handler = logging.StreamHandler(stream)
     handler.setFormatter(logging.Formatter('%(access_token)s %(refresh_token)s'))
-
-    logger.info('ignore', extra={'access_token': 'secret', 'refresh_token': 'r'})
+    previous = log_pipeline.set_sink(handler)
+    try:
+        logger.info('ignore', extra={'access_token': 'secret', 'refresh_token': 'r'})
+        assert log_pipeline.flush()
+    finally:
+        log_pipeline.set_sink(previous)
 
     assert stream.getvalue().strip() == '*** ***'
 
+
+
+def test_permission_denials_are_never_sampled():
+    from action_engine.logging.logger import SAMPLING_RULES
+    from shared.log_sampling import SamplingFilter
+
+    sampler = SamplingFilter(SAMPLING_RULES)
+    records = [
+        logging.LogRecord("action_engine.router", logging.INFO, __file__, 1, "Action not permitted", (), None)
+        for _ in range(50)
+    ]
+    assert all(sampler.filter(record) for record in records)
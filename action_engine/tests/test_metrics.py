@@ -0,0 +1,50 @@
+import importlib
+import pytest
+
+from action_engine import metrics
+from action_engine.auth import token_manager
+from action_engine.tests.conftest import DummyRedis
+
+router = importlib.import_module("action_engine.router")
+main = importlib.import_module("action_engine.main")
+
+
+def _sample(text, line_prefix):
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+@pytest.mark.asyncio
+async def test_router_records_stages_and_cache_hits():
+    await token_manager.init_redis(DummyRedis())
+    await token_manager.set_token("u1", "gmail", {"access_token": "t"})
+    action = {"platform": "gmail", "action_type": "perform_action", "user_id": "u1", "payload": {"key": "value"}}
+    before = metrics.REGISTRY.render()
+    for _ in range(2):
+        await router.route_action(action)
+    await router.route_action(dict(action, platform="bogus-platform"))
+    after = metrics.REGISTRY.render()
+
+    def delta(prefix):
+        return _sample(after, prefix) - _sample(before, prefix)
+
+    labels = 'platform="gmail",action_type="perform_action",status="200"'
+    for stage in ("validate", "token_fetch", "adapter", "respond"):
+        assert delta(f'action_stage_duration_seconds_count{{stage="{stage}",{labels}}}') == 2
+    assert delta(f"action_requests_total{{{labels}}}") == 2
+    assert delta('action_cache_requests_total{cache="token",result="hit"}') == 1
+    assert delta('action_cache_requests_total{cache="token",result="miss"}') == 1
+    assert delta(
+        'action_errors_total{platform="unknown",action_type="unknown",kind="request"}'
+    ) == 1
+    assert "bogus-platform" not in after
+    assert _sample(after, "action_requests_in_flight") == 0
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    response = await main.metrics_endpoint()
+    assert response.media_type == metrics.CONTENT_TYPE
+    assert "# TYPE http_requests_total counter" in response.content
@@ -0,0 +1,68 @@
+import pytest
+
+from action_engine import config, router
+from action_engine.auth import policy_replica
+
+FULL = {
+    "epoch": "ep1",
+    "version": 3,
+    "full": True,
+    "engines": {"action": [["gmail", "*", ["mail.all"], False], ["gmail", "delete_*", [], True]]},
+    "platforms": {},
+}
+
+
+def _fetcher(responses, calls):
+    async def fetch(since, epoch, wait):
+        calls.append((since, epoch))
+        return responses.pop(0)
+
+    return fetch
+
+
+@pytest.mark.asyncio
+async def test_applies_full_snapshot_then_deltas():
+    calls = []
+    delta = {
+        "epoch": "ep1",
+        "version": 5,
+        "full": False,
+        "changes": [
+            {"version": 3, "type": "platform", "id": "gmail", "value": "deprecated"},
+            {"version": 4, "type": "engine", "id": "other", "value": [["notion", "*", [], False]]},
+            {"version": 5, "type": "engine", "id": "action", "value": None},
+        ],
+    }
+    replica = policy_replica.PolicyReplica(fetch=_fetcher([FULL, delta], calls))
+    await replica.sync_once()
+    assert replica.check("action", "gmail", "send_email")["required_scopes"] == ["mail.all"]
+    assert replica.check("action", "gmail", "delete_thread")["allowed"] is False
+
+    await replica.sync_once()
+    assert calls == [(None, None), (3, "ep1")]
+    # Version 3 was already part of the snapshot and is skipped.
+    assert replica.statuses == {}
+    assert replica.check("action", "gmail", "send_email")["allowed"] is False
+    assert replica.check("other", "notion", "create_task")["allowed"] is True
+    assert replica.version == 5
+
+
+@pytest.mark.asyncio
+async def test_stale_replica_denies(monkeypatch):
+    replica = policy_replica.PolicyReplica(max_staleness=10, fetch=_fetcher([FULL], []))
+    assert replica.check("action", "gmail", "send")["platform_status"] == "unknown"
+    await replica.sync_once()
+    assert replica.check("action", "gmail", "send")["allowed"] is True
+    replica.last_synced -= 11
+    assert replica.check("action", "gmail", "send")["allowed"] is False
+
+
+@pytest.mark.asyncio
+async def test_router_enforces_snapshot_policy(monkeypatch):
+    replica = policy_replica.PolicyReplica(fetch=_fetcher([dict(FULL, engines={})], []))
+    await replica.sync_once()
+    monkeypatch.setattr(policy_replica, "replica", replica)
+    monkeypatch.setattr(config, "PERMISSION_ENFORCEMENT", "snapshot")
+    action = {"platform": "gmail", "action_type": "send_email", "user_id": "u1", "payload": {}}
+    content, status = await router.process_action(action)
+    assert status == 403
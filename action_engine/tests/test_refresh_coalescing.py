@@ -0,0 +1,91 @@
+import asyncio
+import time
+import pytest
+
+from action_engine.auth import token_manager
+from action_engine.tests.conftest import DummyRedis
+
+
+def _count_exchanges(monkeypatch, delay=0.01):
+    calls = []
+
+    async def fake_exchange(platform, refresh_token_value):
+        calls.append(refresh_token_value)
+        await asyncio.sleep(delay)
+        return {
+            "access_token": f"refreshed-{len(calls)}",
+            "refresh_token": refresh_token_value,
+            "expires_at": time.time() + 3600,
+        }
+
+    monkeypatch.setattr(token_manager, "_exchange_refresh_token", fake_exchange)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_single_refresh_under_1000_concurrent_callers(monkeypatch):
+    await token_manager.init_redis(DummyRedis())
+    calls = _count_exchanges(monkeypatch)
+    await token_manager.set_token(
+        "u1", "gmail", {"access_token": "old", "refresh_token": "r", "expires_at": 0}
+    )
+    tokens = await asyncio.gather(
+        *(token_manager.get_access_token("u1", "gmail") for _ in range(1000))
+    )
+    assert len(calls) == 1
+    assert set(tokens) == {"refreshed-1"}
+    assert token_manager._inflight == {}
+    assert await token_manager._redis_client.get("lock:refresh:u1:gmail") is None
+
+
+@pytest.mark.asyncio
+async def test_waits_for_refresh_by_another_worker(monkeypatch):
+    redis = DummyRedis()
+    await token_manager.init_redis(redis)
+    calls = _count_exchanges(monkeypatch)
+    monkeypatch.setattr(token_manager, "TOKEN_REFRESH_LOCK_POLL_SECONDS", 0.005)
+    await token_manager.set_token(
+        "u1", "gmail", {"access_token": "old", "refresh_token": "r", "expires_at": 0}
+    )
+    # Another worker holds the refresh lock for this token.
+    await redis.set("lock:refresh:u1:gmail", "other-worker", px=5000)
+
+    async def other_worker_finishes():
+        await asyncio.sleep(0.02)
+        await token_manager.set_token(
+            "u1",
+            "gmail",
+            {"access_token": "from-other", "refresh_token": "r", "expires_at": time.time() + 3600},
+        )
+        await redis.delete("lock:refresh:u1:gmail")
+
+    results = await asyncio.gather(
+        other_worker_finishes(),
+        *(token_manager.get_access_token("u1", "gmail") for _ in range(50)),
+    )
+    assert calls == []
+    assert set(results[1:]) == {"from-other"}
+
+
+@pytest.mark.asyncio
+async def test_expired_lock_of_dead_worker_is_taken_over(monkeypatch):
+    redis = DummyRedis()
+    await token_manager.init_redis(redis)
+    calls = _count_exchanges(monkeypatch, delay=0)
+    monkeypatch.setattr(token_manager, "TOKEN_REFRESH_LOCK_POLL_SECONDS", 0.005)
+    await token_manager.set_token(
+        "u1", "gmail", {"access_token": "old", "refresh_token": "r", "expires_at": 0}
+    )
+    await redis.set("lock:refresh:u1:gmail", "dead-worker", px=20)
+    assert await token_manager.get_access_token("u1", "gmail") == "refreshed-1"
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_release_keeps_a_lock_another_worker_took_over():
+    redis = DummyRedis()
+    await redis.set("lock:refresh:u1:gmail", "other-worker", px=5000)
+    await token_manager._release_lock(redis, "lock:refresh:u1:gmail", "expired-owner")
+    assert await redis.get("lock:refresh:u1:gmail") == "other-worker"
+    await token_manager._release_lock(redis, "lock:refresh:u1:gmail", "other-worker")
+    assert await redis.get("lock:refresh:u1:gmail") is None
@@ -0,0 +1,145 @@
+import asyncio
+import importlib
+
+import pytest
+
+from action_engine.auth import revocation, token_manager
+from action_engine.tests.conftest import DummyRedis
+
+main = importlib.import_module("action_engine.main")
+
+
+class CountingRedis(DummyRedis):
+    def __init__(self):
+        super().__init__()
+        self.gets = 0
+
+    async def get(self, key):
+        self.gets += 1
+        return await super().get(key)
+
+
+async def _token(user_id: str) -> str:
+    resp = await main.login({"user_id": user_id})
+    return resp.content["token"]
+
+
+def _request(user_id: str):
+    return main.ActionRequest(
+        action_type="perform_action", platform="test", user_id=user_id, payload={}
+    )
+
+
+def test_bloom_filter_has_no_false_negatives_and_bounded_fp_rate():
+    bloom = revocation.BloomFilter(1000, 0.01)
+    for i in range(1000):
+        bloom.add(f"in-{i}")
+    assert all(f"in-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"out-{i}" in bloom for i in range(10000))
+    assert false_positives / 10000 < 0.03
+    assert bloom.estimated_fp_rate() < 0.02
+
+
+@pytest.mark.asyncio
+async def test_revoked_token_is_rejected_even_when_cached():
+    await token_manager.init_redis(DummyRedis())
+    revocation.reset()
+    token = await _token("u1")
+    other = await _token("u1")
+    ok = await main.perform_action(_request("u1"), authorization=f"Bearer {token}")
+    assert ok.status_code == 200
+
+    resp = await main.revoke_token({}, authorization=f"Bearer {token}")
+    assert resp.content == {"status": "revoked"}
+
+    denied = await main.perform_action(_request("u1"), authorization=f"Bearer {token}")
+    assert denied.status_code == 401
+    still_ok = await main.perform_action(_request("u1"), authorization=f"Bearer {other}")
+    assert still_ok.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_cannot_revoke_another_users_token():
+    await token_manager.init_redis(DummyRedis())
+    revocation.reset()
+    mine = await _token("u1")
+    theirs = await _token("u2")
+    resp = await main.revoke_token({"token": theirs}, authorization=f"Bearer {mine}")
+    assert resp.status_code == 401
+    assert await main._get_user_id(f"Bearer {theirs}") == "u2"
+
+
+@pytest.mark.asyncio
+async def test_revoke_answers_503_when_redis_fails():
+    class DownRedis(DummyRedis):
+        async def set(self, *args, **kwargs):
+            raise ConnectionError("down")
+
+    await token_manager.init_redis(DownRedis())
+    revocation.reset()
+    token = await _token("u1")
+    resp = await main.revoke_token({}, authorization=f"Bearer {token}")
+    assert resp.status_code == 503
+    assert resp.content == {"error": "Revocation store unavailable"}
+
+
+@pytest.mark.asyncio
+async def test_unrevoked_tokens_skip_redis():
+    client = CountingRedis()
+    await token_manager.init_redis(client)
+    revocation.reset()
+    await revocation.rebuild()
+    token = await _token("u1")
+    for _ in range(20):
+        assert await main._get_user_id(f"Bearer {token}") == "u1"
+    assert client.gets == 0
+
+
+@pytest.mark.asyncio
+async def test_unloaded_filter_checks_redis_and_fails_closed():
+    client = CountingRedis()
+    await token_manager.init_redis(client)
+    revocation.reset()
+    await revocation.rebuild()
+    token = await _token("u1")
+    payload = main.decode_token(token)
+    # Revoked by another worker while this one was not subscribed.
+    await client.set(f"revoked:{payload['jti']}", "1", ex=60)
+    revocation.reset()
+    assert await main._get_user_id(f"Bearer {token}") is None
+    assert client.gets == 1
+
+    class DownRedis(DummyRedis):
+        async def get(self, key):
+            raise ConnectionError("down")
+
+    await token_manager.init_redis(DownRedis())
+    other = await _token("u2")
+    assert await main._get_user_id(f"Bearer {other}") is None
+
+
+@pytest.mark.asyncio
+async def test_other_workers_learn_revocations():
+    client = DummyRedis()
+    await token_manager.init_redis(client)
+    revocation.reset()
+    early = await _token("u1")
+    await main.revoke_token({}, authorization=f"Bearer {early}")
+
+    # A fresh worker starts with an empty filter and rebuilds it from Redis.
+    revocation.reset()
+    revocation.start()
+    try:
+        await asyncio.sleep(0.05)
+        assert await main._get_user_id(f"Bearer {early}") is None
+
+        # Revocations published by another worker arrive over pub/sub.
+        late = await _token("u1")
+        payload = main.decode_token(late)
+        await client.set(f"revoked:{payload['jti']}", "1", ex=60)
+        await client.publish(revocation.CHANNEL, payload["jti"])
+        await asyncio.sleep(0.05)
+        assert payload["jti"] in revocation._filter
+        assert await main._get_user_id(f"Bearer {late}") is None
+    finally:
+        await revocation.stop()
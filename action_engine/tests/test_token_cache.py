@@ -0,0 +1,83 @@
+import asyncio
+import time
+import pytest
+
+from action_engine.auth import token_manager
+from action_engine.tests.conftest import DummyRedis
+from action_engine.utils.cache import TTLCache
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_after_first_lookup():
+    await token_manager.init_redis(DummyRedis())
+    await token_manager.set_token("u1", "gmail", {"access_token": "tok"})
+    before = token_manager.cache_stats()
+    assert await token_manager.get_access_token("u1", "gmail") == "tok"
+    assert await token_manager.get_access_token("u1", "gmail") == "tok"
+    after = token_manager.cache_stats()
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_set_token_invalidates_cache():
+    await token_manager.init_redis(DummyRedis())
+    await token_manager.set_token("u1", "gmail", {"access_token": "old"})
+    assert await token_manager.get_access_token("u1", "gmail") == "old"
+    await token_manager.set_token("u1", "gmail", {"access_token": "new"})
+    assert await token_manager.get_access_token("u1", "gmail") == "new"
+
+
+@pytest.mark.asyncio
+async def test_slow_reader_does_not_cache_a_replaced_token(monkeypatch):
+    await token_manager.init_redis(DummyRedis())
+    await token_manager.set_token("u1", "gmail", {"access_token": "old"})
+    read = token_manager.get_token
+    reading = asyncio.Event()
+
+    async def slow_get_token(user_id, platform):
+        data = await read(user_id, platform)
+        reading.set()
+        await asyncio.sleep(0.01)
+        return data
+
+    monkeypatch.setattr(token_manager, "get_token", slow_get_token)
+
+    async def writer():
+        await reading.wait()
+        await token_manager.set_token("u1", "gmail", {"access_token": "new"})
+
+    stale, _ = await asyncio.gather(token_manager.get_access_token("u1", "gmail"), writer())
+    assert stale == "old"
+    monkeypatch.setattr(token_manager, "get_token", read)
+    assert await token_manager.get_access_token("u1", "gmail") == "new"
+
+
+@pytest.mark.asyncio
+async def test_refresh_ahead_runs_in_background(monkeypatch):
+    await token_manager.init_redis(DummyRedis())
+    monkeypatch.setattr(token_manager, "TOKEN_REFRESH_AHEAD_SECONDS", 60)
+    soon = time.time() + 30
+    await token_manager.set_token(
+        "u1", "gmail", {"access_token": "old", "refresh_token": "r", "expires_at": soon}
+    )
+    # The still-valid token is served while the refresh happens off-path.
+    assert await token_manager.get_access_token("u1", "gmail") == "old"
+    await asyncio.gather(*token_manager._background_tasks)
+    assert (await token_manager.get_token("u1", "gmail"))["access_token"] == "refreshed-r"
+    assert await token_manager.get_access_token("u1", "gmail") == "refreshed-r"
+
+
+def test_ttl_cache_respects_expiry_and_size():
+    now = [1000.0]
+    cache = TTLCache(maxsize=2, ttl=60, clock=lambda: now[0])
+    cache.set("a", 1, expires_at=1010)
+    cache.set("b", 2)
+    cache.set("c", 3)
+    assert cache.get("a") is None
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("b") == 2
+    now[0] = 1061
+    assert cache.get("b") is None
+    cache.set("d", 4, expires_at=1000)
+    assert cache.get("d") is None
@@ -0,0 +1,91 @@
+"""Small in-process caches used on hot request paths."""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire at a per-entry deadline.
+
+    Every entry lives at most ``ttl`` seconds and never past the optional
+    ``expires_at`` timestamp given to :meth:`set`. When the cache is full the
+    least recently used entry is evicted. Hit, miss and eviction counters are
+    available through :meth:`stats`.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for ``key`` or ``default``."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        deadline, value = entry
+        if deadline <= self._clock():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for ``key`` without counting a hit or a miss."""
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= self._clock():
+            return default
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None) -> None:
+        """Cache ``value`` until ``ttl`` elapses or ``expires_at`` passes."""
+        if self.maxsize <= 0:
+            return
+        now = self._clock()
+        deadline = now + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, float(expires_at))
+        if deadline <= now:
+            self._data.pop(key, None)
+            return
+        self._data[key] = (deadline, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> Any:
+        """Remove ``key`` and return its value if it was cached."""
+        entry = self._data.pop(key, None)
+        return entry[1] if entry else None
+
+    def clear(self) -> None:
+        """Drop every entry (counters are kept)."""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/eviction counters and the current size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+        }
@@ -1,6 +1,6 @@
 """Request validation utilities."""
 
-from typing import Any, Dict
+from typing import Any, Dict, List, Union
 
 from fastapi import HTTPException
 from pydantic import BaseModel, ValidationError
@@ -15,6 +15,16 @@ class ActionRequest(BaseModel):
     payload: Dict[str, Any]
 
 
+class BatchActionRequest(BaseModel):
+    """Batch of raw action requests sent to ``/perform_actions``.
+
+    Items are left untyped so that :func:`validate_batch` rejects a malformed
+    one on its own instead of the whole batch.
+    """
+
+    actions: List[Any]
+
+
 def validate_request(data: Dict[str, Any]) -> ActionRequest:
     """Validate that the incoming data contains the required fields.
 
@@ -48,3 +58,22 @@ def validate_request(data: Dict[str, Any]) -> ActionRequest:
     except ValidationError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
 
+
+def validate_batch(items: List[Any]) -> List[Union[ActionRequest, HTTPException]]:
+    """Validate every item of a batch up front.
+
+    Returns a list aligned with ``items`` holding either the parsed
+    :class:`ActionRequest` or the :class:`HTTPException` describing why the
+    item was rejected, so one bad item does not fail the whole batch.
+    """
+
+    results: List[Union[ActionRequest, HTTPException]] = []
+    for item in items:
+        if not isinstance(item, dict):
+            results.append(HTTPException(status_code=400, detail="Invalid action request"))
+            continue
+        try:
+            results.append(validate_request(item))
+        except HTTPException as exc:
+            results.append(exc)
+    return results
@@ -0,0 +1,80 @@
+"""Measure event store ingestion and query latency.
+
+Fills an :class:`~engine_control.store.event_store.EventStore` with
+``--events`` events spread over the last ``--hours`` hours, from ``--engines``
+engines and 20 event types, then times typical ``/log/events`` queries
+(newest 100 matches) with and without engine and type filters.
+
+Run with::
+
+    python -m engine_control.benchmarks.bench_event_store --events 2000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from engine_control.store.event_store import EventStore
+
+TYPES = [f"type{i}" for i in range(19)] + ["rare"]
+
+
+def _fill(store: EventStore, events: int, engines: int, hours: float) -> float:
+    rng = random.Random(1)
+    now = time.time()
+    start = now - hours * 3600
+    step = hours * 3600 / events
+    batch = []
+    began = time.perf_counter()
+    for i in range(events):
+        event_type = "rare" if i % 10000 == 0 else TYPES[rng.randrange(19)]
+        batch.append(
+            {
+                "engine_id": f"engine{rng.randrange(engines)}",
+                "received_at": start + i * step,
+                "data": {"type": event_type, "platform": "gmail", "duration_ms": i % 500},
+            }
+        )
+        if len(batch) == 1000:
+            store.append(batch)
+            batch = []
+    store.append(batch)
+    return time.perf_counter() - began
+
+
+def main(events: int, engines: int, hours: float, repeat: int) -> None:
+    store = EventStore(segment_seconds=300, retention_seconds=hours * 3600 + 600, max_events=events + 1)
+    elapsed = _fill(store, events, engines, hours)
+    stats = store.stats()
+    print(
+        f"ingested {events:,} events in {elapsed:.1f}s ({events / elapsed:,.0f}/s), "
+        f"{stats['segments']} segments, {stats['bytes'] / events:.0f} bytes/event"
+    )
+    now = time.time()
+    queries = {
+        "last 10 min, all": dict(since=now - 600),
+        "last 10 min, engine": dict(since=now - 600, engine_id="engine7"),
+        "last 10 min, type": dict(since=now - 600, event_type="type3"),
+        "last hour, engine+type": dict(since=now - 3600, engine_id="engine7", event_type="type3"),
+        "all time, rare type": dict(since=now - hours * 3600, event_type="rare"),
+        "all time, engine+rare": dict(since=now - hours * 3600, engine_id="engine7", event_type="rare"),
+    }
+    for name, query in queries.items():
+        timings = []
+        for _ in range(repeat):
+            began = time.perf_counter()
+            found, _ = store.query(until=now, limit=100, **query)
+            timings.append(time.perf_counter() - began)
+        print(f"{name:>24}: {min(timings) * 1000:7.2f}ms  ({len(found)} events)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=2000000)
+    parser.add_argument("--engines", type=int, default=100)
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.events, args.engines, args.hours, args.repeat)
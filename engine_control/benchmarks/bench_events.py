@@ -0,0 +1,67 @@
+"""Measure engine event ingestion through the HTTP handlers.
+
+Sends ``--events`` events once as single ``/log/engine_event`` calls and
+once as ``/log/engine_events`` requests of ``--batch`` events (JSON array and
+NDJSON), with the buffer flushing to a sink that discards them. Only handler
+time is measured; HTTP framing would add a fixed cost per request on top.
+
+Run with::
+
+    python -m engine_control.benchmarks.bench_events --events 100000 --batch 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi import Request
+
+from engine_control import engine_api, event_buffer
+
+HEADERS = {"x_engine_id": "local", "x_engine_key": "local-key"}
+
+
+async def _discard(events) -> None:
+    return None
+
+
+async def main(events: int, batch: int) -> None:
+    event_buffer.buffer = event_buffer.EventBuffer(
+        capacity=events, batch_size=1000, flush_seconds=0.05, sink=_discard
+    )
+    event_buffer.buffer.start()
+    event = {"type": "action.completed", "platform": "gmail", "duration_ms": 12}
+
+    start = time.perf_counter()
+    for _ in range(events):
+        await engine_api.log_engine_event_endpoint(dict(event), **HEADERS)
+    single = time.perf_counter() - start
+    await event_buffer.buffer.flush()
+
+    bodies = {
+        "JSON array": (json.dumps([event] * batch).encode(), {}),
+        "NDJSON": (
+            b"".join(json.dumps(event).encode() + b"\n" for _ in range(batch)),
+            {"content-type": "application/x-ndjson"},
+        ),
+    }
+    print(f"{'single events':>14}: {events / single:12,.0f} events/s")
+    for name, (body, headers) in bodies.items():
+        start = time.perf_counter()
+        for _ in range(events // batch):
+            await engine_api.log_engine_events_endpoint(Request(body, headers), **HEADERS)
+        elapsed = time.perf_counter() - start
+        await event_buffer.buffer.flush()
+        print(f"{name:>14}: {events // batch * batch / elapsed:12,.0f} events/s")
+    await event_buffer.buffer.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.events, args.batch))
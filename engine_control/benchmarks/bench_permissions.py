@@ -0,0 +1,82 @@
+"""Measure permission check latency as an engine's rule set grows.
+
+Registers one engine with ``N`` rules (a mix of exact grants, prefix grants
+and deny patterns) for several sizes and times
+:func:`engine_control.permission_checker.check` for an exact grant, a
+wildcard grant, a denied action and a miss. A linear ``fnmatch`` scan over
+the same rules is shown for comparison.
+
+Run with::
+
+    python -m engine_control.benchmarks.bench_permissions --sizes 10 100 1000 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import timeit
+
+from engine_control import engine_registry, permission_checker
+
+
+def _rules(size: int):
+    permissions = {"gmail": {"send": ["mail.send"], "read_*": ["mail.read"]}}
+    deny = ["gmail.delete_*"]
+    for i in range(size - 3):
+        platform = f"platform{i % 97}"
+        if i % 3 == 0:
+            permissions.setdefault(platform, {})[f"act{i}_*"] = [f"s{i}"]
+        elif i % 3 == 1:
+            permissions.setdefault(platform, {})[f"act{i}"] = [f"s{i}"]
+        else:
+            deny.append(f"{platform}.drop{i}_*")
+    return permissions, deny
+
+
+def _linear(permissions, deny):
+    patterns = [(f"{p}.{a}", s) for p, actions in permissions.items() for a, s in actions.items()]
+
+    def check(platform: str, action_type: str):
+        name = f"{platform}.{action_type}"
+        if any(fnmatch.fnmatchcase(name, d) for d in deny):
+            return None
+        return next((s for p, s in patterns if fnmatch.fnmatchcase(name, p)), None)
+
+    return check
+
+
+def main(sizes, number: int) -> None:
+    cases = {
+        "exact": ("gmail", "send"),
+        "wildcard": ("gmail", "read_labels"),
+        "denied": ("gmail", "delete_thread"),
+        "miss": ("slack", "post"),
+    }
+    print(f"{'rules':>7} " + " ".join(f"{name:>10}" for name in cases) + f" {'linear miss':>12}")
+    for size in sizes:
+        permissions, deny = _rules(size)
+        engine_registry.clear_engines()
+        engine_registry.register_engine("bench", permissions, deny=deny)
+        row = []
+        for platform, action_type in cases.values():
+            seconds = min(
+                timeit.repeat(
+                    lambda: permission_checker.check("bench", platform, action_type),
+                    number=number,
+                    repeat=5,
+                )
+            )
+            row.append(f"{seconds / number * 1e9:8.0f}ns")
+        linear = _linear(permissions, deny)
+        linear_number = max(1, number // max(1, size // 10))
+        seconds = min(timeit.repeat(lambda: linear("slack", "post"), number=linear_number, repeat=3))
+        print(f"{size:>7} " + " ".join(f"{v:>10}" for v in row) + f" {seconds / linear_number * 1e9:10.0f}ns")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--number", type=int, default=100000)
+    args = parser.parse_args()
+    main(args.sizes, args.number)
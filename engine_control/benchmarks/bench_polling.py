@@ -0,0 +1,66 @@
+"""Measure the cost of polling ``/config/global`` and ``/platforms/list``.
+
+Calls the endpoint handlers directly with a config of ``--keys`` feature flags
+and as many platforms, comparing a poll without ``If-None-Match`` (cached
+body returned) to one that presents the current ETag (``304``). The previous
+behaviour, copying the dict and serializing it on every poll, is shown for
+comparison.
+
+Run with::
+
+    python -m engine_control.benchmarks.bench_polling --keys 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+
+from engine_control import config, engine_api, platform_registry
+
+HEADERS = {"x_engine_id": "local", "x_engine_key": "local-key"}
+
+
+async def _per_call(call, number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        await call()
+    return (time.perf_counter() - start) / number
+
+
+async def main(keys: int, number: int) -> None:
+    config.set_global_config({"feature_flags": {f"flag{i}": i % 2 == 0 for i in range(keys)}})
+    for i in range(keys):
+        platform_registry.set_platform_status(f"platform{i}", "active" if i % 3 else "maintenance")
+
+    endpoints = {
+        "config/global": (engine_api.global_config_endpoint, config.get_global_config),
+        "platforms/list": (
+            engine_api.platforms_list_endpoint,
+            lambda: {"platforms": platform_registry.list_platforms()},
+        ),
+    }
+    print(f"{'resource':>15} {'serialize':>11} {'cached 200':>11} {'304':>11}")
+    for name, (endpoint, value) in endpoints.items():
+        etag = (await endpoint(**HEADERS)).headers["ETag"]
+
+        async def serialize():
+            engine_api.verify_engine(HEADERS["x_engine_id"], HEADERS["x_engine_key"])
+            return json.dumps(value()).encode()
+
+        timings = [
+            await _per_call(serialize, number),
+            await _per_call(lambda: endpoint(**HEADERS), number),
+            await _per_call(lambda: endpoint(if_none_match=etag, **HEADERS), number),
+        ]
+        print(f"{name:>15} " + " ".join(f"{t * 1e6:9.2f}us" for t in timings))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=200)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.keys, args.number))
@@ -0,0 +1,90 @@
+"""Measure incremental readiness updates on a large dependency graph.
+
+Registers ``--engines`` engines in independent groups of ``--group``
+engines (a service and its helpers). Inside a group, engines form
+``--layers`` layers and each depends on two engines of the layer below.
+Each engine holds a grant on one of ``--platforms`` platforms. Then times a
+readiness lookup, a platform status flip (which only revisits the engines it
+affects) and, for comparison, recomputing every engine's readiness from
+scratch.
+
+Run with::
+
+    python -m engine_control.benchmarks.bench_readiness --engines 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+import timeit
+
+from engine_control import dependency_graph, engine_registry, platform_registry
+
+
+def _recompute_all() -> int:
+    """Readiness of every engine by depth-first search, ignoring the cache."""
+    nodes = dependency_graph._nodes
+    memo = {}
+
+    def ready(engine_id):
+        if engine_id not in memo:
+            node = nodes[engine_id]
+            memo[engine_id] = (
+                node.registered
+                and not any(p in dependency_graph._statuses for p in node.platforms)
+                and all(ready(dep) for dep in node.depends_on)
+            )
+        return memo[engine_id]
+
+    return sum(ready(engine_id) for engine_id in nodes)
+
+
+def main(engines: int, group: int, layers: int, platforms: int) -> None:
+    rng = random.Random(1)
+    per_layer = group // layers
+    start = time.perf_counter()
+    for g in range(engines // group):
+        for layer in range(layers):
+            for i in range(per_layer):
+                below = [f"g{g}_{layer - 1}_{rng.randrange(per_layer)}" for _ in range(2)]
+                engine_registry.register_engine(
+                    f"g{g}_{layer}_{i}",
+                    {f"p{rng.randrange(platforms)}": {"run": []}},
+                    depends_on=below if layer else [],
+                )
+    total = len(dependency_graph._nodes)
+    print(f"registered {total:,} engines in {time.perf_counter() - start:.1f}s")
+
+    number = 200000
+    lookup = min(timeit.repeat(lambda: dependency_graph.readiness("g7_5_3"), number=number, repeat=3))
+    print(f"{'readiness lookup':>28}: {lookup / number * 1e9:10.0f}ns")
+
+    for platform in ("p7", "p8"):
+        touched = dependency_graph.stats()["touched"]
+        began = time.perf_counter()
+        platform_registry.set_platform_status(platform, "maintenance")
+        down = time.perf_counter() - began
+        down_touched = dependency_graph.stats()["touched"] - touched
+        began = time.perf_counter()
+        platform_registry.set_platform_status(platform, "active")
+        up = time.perf_counter() - began
+        print(
+            f"{platform + ' down / up':>28}: {down * 1000:8.2f}ms / {up * 1000:.2f}ms "
+            f"({down_touched:,} engines revisited)"
+        )
+
+    began = time.perf_counter()
+    _recompute_all()
+    print(f"{'full recompute':>28}: {(time.perf_counter() - began) * 1000:8.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--engines", type=int, default=100000)
+    parser.add_argument("--group", type=int, default=100)
+    parser.add_argument("--layers", type=int, default=5)
+    parser.add_argument("--platforms", type=int, default=5000)
+    args = parser.parse_args()
+    main(args.engines, args.group, args.layers, args.platforms)
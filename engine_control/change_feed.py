@@ -0,0 +1,112 @@
+"""Versioned feed of policy changes for engines that replicate the policy.
+
+Every change to an engine's compiled rules or to a platform status is kept
+with its version in a bounded in-memory log. Engines holding a replica ask
+for the changes after the version they have and apply only those; an engine
+that is too far behind, or whose version belongs to another :func:`epoch`,
+receives a full snapshot instead.
+
+In shared mode (:mod:`engine_control.store.shared`) a change gets the
+version its write got in Redis, and the epoch is kept there too, so every
+replica reports the same versions and a client may continue against any
+replica, or after a restart. Otherwise versions count the changes made in
+this process, under an epoch of its own.
+
+Long-polling clients wait in :func:`wait_for_change` until a newer version is
+recorded or their timeout passes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import secrets
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from .store import shared
+
+CHANGE_FEED_MAX_ENTRIES = int(os.getenv("CHANGE_FEED_MAX_ENTRIES", "10000"))
+
+_epoch = secrets.token_hex(8)
+_version = 0
+# Every change after this version is still in the log.
+_floor = 0
+_changes: Deque[Dict[str, Any]] = deque(maxlen=CHANGE_FEED_MAX_ENTRIES)
+_waiters: Set["asyncio.Future"] = set()
+
+
+def epoch() -> str:
+    """Return the identifier of the sequence :func:`current_version` belongs to."""
+    return _epoch
+
+
+def current_version() -> int:
+    return _version
+
+
+def record(kind: str, key: str, value: Any) -> None:
+    """Record a change of ``kind`` (``engine`` or ``platform``).
+
+    ``value`` is the new state of ``key``; ``None`` means it was removed.
+    In shared mode the change is logged once its write is in Redis.
+    """
+    change = {"type": kind, "id": key, "value": value}
+    if not shared.attach(change):
+        _append(_version + 1, [change])
+
+
+def _append(version: int, changes: List[Dict[str, Any]]) -> None:
+    global _version, _floor
+    for change in changes:
+        if len(_changes) == _changes.maxlen:
+            _floor = _changes[0]["version"]
+        _changes.append({"version": version, **change})
+    _version = version
+    if changes:
+        _wake()
+
+
+def _wake() -> None:
+    for waiter in list(_waiters):
+        if not waiter.done():
+            waiter.set_result(_version)
+    _waiters.clear()
+
+
+def _sequenced(epoch: Optional[str], version: int, changes: List[Dict[str, Any]], reset: bool) -> None:
+    global _epoch, _version, _floor
+    if not reset:
+        _append(version, changes)
+        return
+    _epoch = epoch or secrets.token_hex(8)
+    _changes.clear()
+    _version = _floor = version
+    _wake()
+
+
+def changes_since(epoch: str, version: int) -> Optional[List[Dict[str, Any]]]:
+    """Return changes after ``version`` of ``epoch``, or ``None`` if they are not all kept."""
+    if epoch != _epoch or not _floor <= version <= _version:
+        return None
+    if version == _version:
+        return []
+    return [change for change in _changes if change["version"] > version]
+
+
+async def wait_for_change(version: int, timeout: float) -> bool:
+    """Wait up to ``timeout`` seconds for a version newer than ``version``."""
+    if _version != version or timeout <= 0:
+        return _version != version
+    waiter = asyncio.get_running_loop().create_future()
+    _waiters.add(waiter)
+    try:
+        await asyncio.wait_for(waiter, timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        _waiters.discard(waiter)
+
+
+shared.on_sequence(_sequenced)
@@ -2,7 +2,10 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict
+from typing import Any, Dict, Optional
+
+from .store import durable, shared
+from .versioned import VersionedResource
 
 _GLOBAL_CONFIG: Dict[str, Any] = {
     "api_version": "1.0",
@@ -10,6 +13,27 @@ _GLOBAL_CONFIG: Dict[str, Any] = {
 }
 
 
+# Serialized body and ETag served by ``GET /config/global``
+resource = VersionedResource(lambda: _GLOBAL_CONFIG)
+
+
+def _apply_set(data: Dict[str, Any]) -> None:
+    _GLOBAL_CONFIG.update(data["data"])
+    resource.bump()
+
+
+def _apply_clear(data: Optional[Dict[str, Any]] = None) -> None:
+    _GLOBAL_CONFIG.clear()
+    _GLOBAL_CONFIG.update({"api_version": "1.0", "feature_flags": {}})
+    resource.bump()
+
+
+def _load(state: Optional[Dict[str, Any]]) -> None:
+    _apply_clear()
+    _GLOBAL_CONFIG.update(state or {})
+    resource.bump()
+
+
 def get_global_config() -> Dict[str, Any]:
     """Return a copy of the global configuration."""
 
@@ -19,11 +43,24 @@ def get_global_config() -> Dict[str, Any]:
 def set_global_config(data: Dict[str, Any]) -> None:
     """Merge ``data`` into the current global configuration."""
 
-    _GLOBAL_CONFIG.update(data)
+    durable.check_writable()
+    _apply_set({"data": data})
+    stored = durable.record("global_config.set", {"data": data})
+    shared.write("global_config", data, after=stored)
 
 
 def clear_global_config() -> None:
     """Reset the global configuration to defaults."""
 
-    _GLOBAL_CONFIG.clear()
-    _GLOBAL_CONFIG.update({"api_version": "1.0", "feature_flags": {}})
+    durable.check_writable()
+    _apply_clear()
+    stored = durable.record("global_config.clear", {})
+    shared.replace("global_config", get_global_config(), after=stored)
+
+
+durable.register_op("global_config.set", _apply_set)
+durable.register_op("global_config.clear", _apply_clear)
+durable.register_state("global_config", get_global_config, _load)
+shared.register_map(
+    "global_config", get_global_config, _load, lambda key, value: _apply_set({"data": {key: value}})
+)
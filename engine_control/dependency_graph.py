@@ -0,0 +1,204 @@
+"""Engine readiness derived from ``depends_on`` and platform status.
+
+An engine is *ready* when it is registered, every platform it holds a
+literal grant on is ``active``, and every engine it depends on is ready.
+Each engine's readiness is kept precomputed, so answering is one dictionary
+lookup.
+
+Every engine node records which of its own platforms are down and which of
+its direct dependencies are not ready. A change only updates the nodes it
+affects: when a node's readiness flips, its dependents are updated in turn,
+and the walk stops at every dependent whose readiness does not change.
+
+``register_engine`` refuses ``depends_on`` lists that would close a cycle
+(:func:`check_acyclic`). An engine on a cycle can never become ready, so
+replaying or merging state that somehow contains one is still safe.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Dict, Iterable, List, Mapping, Optional, Set
+
+from shared.permission_trie import is_pattern
+
+ACTIVE = "active"
+
+
+class _Node:
+    __slots__ = ("depends_on", "dependents", "platforms", "registered", "down", "waiting", "ready", "view")
+
+    def __init__(self) -> None:
+        self.depends_on: List[str] = []
+        self.dependents: Set[str] = set()
+        self.platforms: Set[str] = set()
+        self.registered = False
+        self.down: Set[str] = set()  # own platforms that are not active
+        self.waiting: Set[str] = set()  # direct dependencies that are not ready
+        self.ready = False
+        self.view: Dict = {}
+
+
+_nodes: Dict[str, _Node] = {}
+_statuses: Dict[str, str] = {}  # only platforms that are not active
+_by_platform: Dict[str, Set[str]] = {}
+_stats = {"updates": 0, "touched": 0}
+
+
+def _node(engine_id: str) -> _Node:
+    node = _nodes.get(engine_id)
+    if node is None:
+        node = _nodes[engine_id] = _Node()
+    return node
+
+
+def platforms_of(permissions: Mapping) -> Set[str]:
+    """Return the literal platforms an engine holds grants on."""
+    return {
+        platform
+        for platform, actions in (permissions or {}).items()
+        if isinstance(platform, str) and not is_pattern(platform) and isinstance(actions, Mapping)
+    }
+
+
+def check_acyclic(engine_id: str, depends_on: Iterable[str]) -> None:
+    """Raise ``ValueError`` if ``engine_id`` depending on ``depends_on`` closes a cycle."""
+    parents: Dict[str, Optional[str]] = {}
+    stack = []
+    for dep in depends_on:
+        if dep not in parents:
+            parents[dep] = None
+            stack.append(dep)
+    while stack:
+        current = stack.pop()
+        if current == engine_id:
+            path = [current]
+            while parents[path[-1]] is not None:
+                path.append(parents[path[-1]])
+            raise ValueError("Dependency cycle: " + " -> ".join([engine_id] + path[::-1]))
+        node = _nodes.get(current)
+        for dep in node.depends_on if node is not None else ():
+            if dep not in parents:
+                parents[dep] = current
+                stack.append(dep)
+
+
+def _refresh(engine_id: str, node: _Node) -> bool:
+    """Recompute the cached answer of one node; return ``True`` if readiness flipped."""
+    ready = node.registered and not node.down and not node.waiting
+    node.view = {
+        "engine_id": engine_id,
+        "ready": ready,
+        "registered": node.registered,
+        "unavailable_platforms": {platform: _statuses[platform] for platform in sorted(node.down)},
+        "waiting_on": sorted(node.waiting),
+    }
+    flipped = ready != node.ready
+    node.ready = ready
+    return flipped
+
+
+def _propagate(engine_ids: Iterable[str]) -> None:
+    """Refresh ``engine_ids`` and carry readiness flips to their dependents."""
+    _stats["updates"] += 1
+    queue = deque(dict.fromkeys(engine_ids))
+    queued = set(queue)
+    while queue:
+        engine_id = queue.popleft()
+        queued.discard(engine_id)
+        node = _nodes[engine_id]
+        _stats["touched"] += 1
+        if not _refresh(engine_id, node):
+            continue
+        for dependent in node.dependents:
+            waiting = _nodes[dependent].waiting
+            if node.ready:
+                waiting.discard(engine_id)
+            else:
+                waiting.add(engine_id)
+            if dependent not in queued:
+                queued.add(dependent)
+                queue.append(dependent)
+
+
+def index_engine(engine_id: str, depends_on: Iterable[str], platforms: Iterable[str]) -> None:
+    """Record (or replace) a registered engine's dependencies and platforms."""
+    node = _node(engine_id)
+    for dep in node.depends_on:
+        _nodes[dep].dependents.discard(engine_id)
+    for platform in node.platforms:
+        _by_platform.get(platform, set()).discard(engine_id)
+    node.depends_on = list(dict.fromkeys(depends_on))
+    node.platforms = set(platforms)
+    node.registered = True
+    node.waiting = set()
+    for dep in node.depends_on:
+        dep_node = _node(dep)
+        dep_node.dependents.add(engine_id)
+        if not dep_node.ready:
+            node.waiting.add(dep)
+        if not dep_node.view:
+            _refresh(dep, dep_node)
+    for platform in node.platforms:
+        _by_platform.setdefault(platform, set()).add(engine_id)
+    node.down = {platform for platform in node.platforms if platform in _statuses}
+    _propagate([engine_id])
+
+
+def remove_engine(engine_id: str) -> None:
+    """Forget a registered engine; engines depending on it start waiting."""
+    node = _nodes.get(engine_id)
+    if node is None or not node.registered:
+        return
+    for dep in node.depends_on:
+        dep_node = _nodes[dep]
+        dep_node.dependents.discard(engine_id)
+        if not dep_node.registered and not dep_node.dependents:
+            del _nodes[dep]
+    for platform in node.platforms:
+        _by_platform.get(platform, set()).discard(engine_id)
+    node.depends_on, node.platforms = [], set()
+    node.down, node.waiting = set(), set()
+    node.registered = False
+    _propagate([engine_id])
+    if not node.dependents:
+        del _nodes[engine_id]
+
+
+def index_platform_status(platform: str, status: str) -> None:
+    """Apply a platform status change to the engines using the platform."""
+    if status == ACTIVE:
+        _statuses.pop(platform, None)
+    else:
+        _statuses[platform] = status
+    affected = _by_platform.get(platform, ())
+    for engine_id in affected:
+        node = _nodes[engine_id]
+        if status == ACTIVE:
+            node.down.discard(platform)
+        else:
+            node.down.add(platform)
+    _propagate(list(affected))
+
+
+def clear_platforms() -> None:
+    """Treat every platform as active again."""
+    for platform in list(_statuses):
+        index_platform_status(platform, ACTIVE)
+
+
+def clear() -> None:
+    """Forget all engines."""
+    _nodes.clear()
+    _by_platform.clear()
+
+
+def readiness(engine_id: str) -> Optional[Dict]:
+    """Return the cached readiness of an engine that is registered or depended on."""
+    node = _nodes.get(engine_id)
+    return node.view if node is not None else None
+
+
+def stats() -> Dict[str, int]:
+    """Return graph size and how many node refreshes changes have caused."""
+    return dict(_stats, engines=len(_nodes))
@@ -2,19 +2,69 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Header, HTTPException
-from fastapi.responses import JSONResponse
+import base64
+import binascii
+import json
+import math
+import os
+import time
+
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
 
 from .auth_middleware import verify_engine
-from .engine_registry import register_engine, validate_engine, get_engine
-from .permission_checker import is_action_allowed
-from .platform_registry import list_platforms
-from .config import get_global_config
+from .engine_registry import register_engine_recorded, revert_engine, validate_engine, get_engine, list_engines
+from .permission_checker import (
+    check,
+    engine_trie,
+    is_action_allowed,
+    platform_statuses,
+    policy_snapshot,
+)
+from . import config, platform_registry
 from .engine_logger import get_logger, get_request_id
+from . import change_feed, dependency_graph, engine_metrics, event_buffer
+from .store import durable, event_store, shared
+from .versioned import VersionedResource, etag_matches
+from shared import capability
 
 router = APIRouter()
 logger = get_logger(__name__)
 
+CHECK_BATCH_MAX = int(os.getenv("CHECK_BATCH_MAX", "1000"))
+CAPABILITY_SECRET = os.getenv("CAPABILITY_SECRET", "capability-secret")
+CAPABILITY_TTL_SECONDS = float(os.getenv("CAPABILITY_TTL_SECONDS", "60"))
+POLICY_MAX_WAIT_SECONDS = float(os.getenv("POLICY_MAX_WAIT_SECONDS", "30"))
+WATCH_MAX_WAIT_SECONDS = float(os.getenv("WATCH_MAX_WAIT_SECONDS", "30"))
+ENGINE_EVENTS_MAX_BATCH = int(os.getenv("ENGINE_EVENTS_MAX_BATCH", "10000"))
+EVENT_QUERY_MAX_LIMIT = int(os.getenv("EVENT_QUERY_MAX_LIMIT", "1000"))
+EVENT_QUERY_DEFAULT_SECONDS = 600
+
+# Resources clients can poll with ``If-None-Match`` or ``/watch``
+WATCHABLE = {
+    "config/global": config.resource,
+    "platforms/list": platform_registry.resource,
+}
+
+permission_checks_total = engine_metrics.REGISTRY.counter(
+    "engine_control_permission_checks_total", "Permission checks answered", ("result",)
+)
+cached_reads_total = engine_metrics.REGISTRY.counter(
+    "engine_control_cached_reads_total", "Reads of versioned resources", ("resource", "result")
+)
+engine_metrics.REGISTRY.gauge(
+    "engine_control_registered_engines", "Engines currently registered",
+    function=lambda: len(list_engines()),
+)
+
+
+@router.get("/metrics")
+async def metrics_endpoint():
+    """Expose in-process metrics in the Prometheus text format."""
+    return Response(
+        content=engine_metrics.REGISTRY.render(), media_type=engine_metrics.CONTENT_TYPE
+    )
+
 
 @router.post("/engines/register")
 async def register_engine_endpoint(
@@ -28,10 +78,36 @@ async def register_engine_endpoint(
     engine_id = data.get("engine_id")
     permissions = data.get("permissions", {})
     depends_on = data.get("depends_on", [])
+    deny = data.get("deny", [])
     if not isinstance(engine_id, str) or not engine_id:
         raise HTTPException(status_code=400, detail="Invalid engine_id")
+    if not isinstance(deny, list):
+        raise HTTPException(status_code=400, detail="Invalid deny rules")
+    if not isinstance(depends_on, list):
+        raise HTTPException(status_code=400, detail="Invalid depends_on")
 
-    token = register_engine(engine_id, permissions, depends_on)
+    previous = get_engine(engine_id)
+    try:
+        token, stored = register_engine_recorded(engine_id, permissions, depends_on, deny)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    # The token is only handed out once the registration survives a restart
+    # and every replica can see it.
+    try:
+        await durable.stored(stored)
+    except Exception as exc:
+        revert_engine(engine_id, previous)
+        logger.info(
+            "Engine registration not stored",
+            extra={"engine_id": engine_id, "error": str(exc), "request_id": get_request_id()},
+        )
+        raise HTTPException(status_code=503, detail="Registration could not be stored")
+    try:
+        await shared.committed()
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
     logger.info(
         "Engine registered",
         extra={"engine_id": engine_id, "request_id": get_request_id()},
@@ -39,6 +115,21 @@ async def register_engine_endpoint(
     return JSONResponse({"engine_id": engine_id, "engine_key": token})
 
 
+@router.get("/engines/{engine_id}/readiness")
+async def engine_readiness_endpoint(
+    engine_id: str,
+    x_engine_id: str = Header(None),
+    x_engine_key: str = Header(None),
+):
+    """Return whether an engine, its platforms and all its dependencies are ready."""
+
+    verify_engine(x_engine_id, x_engine_key)
+    readiness = dependency_graph.readiness(engine_id)
+    if readiness is None:
+        raise HTTPException(status_code=404, detail="Unknown engine")
+    return JSONResponse(readiness)
+
+
 @router.post("/engines/validate")
 async def validate_engine_endpoint(
     data: dict | None = None,
@@ -69,6 +160,7 @@ async def actions_check_endpoint(
         raise HTTPException(status_code=400, detail="Invalid payload")
 
     result = is_action_allowed(engine_id, platform, action_type)
+    permission_checks_total.labels("allowed" if result["allowed"] else "denied").inc()
     logger.info(
         "Permission check",
         extra={
@@ -81,26 +173,157 @@ async def actions_check_endpoint(
     return JSONResponse(result)
 
 
+@router.post("/actions/check_batch")
+async def actions_check_batch_endpoint(
+    data: dict,
+    x_engine_id: str = Header(None),
+    x_engine_key: str = Header(None),
+):
+    """Evaluate many ``(engine_id, platform, action_type)`` checks in one call.
+
+    Results are returned in input order; malformed items get an ``error``
+    entry instead of failing the whole batch.
+    """
+
+    verify_engine(x_engine_id, x_engine_key)
+    checks = data.get("checks")
+    if not isinstance(checks, list):
+        raise HTTPException(status_code=400, detail="Invalid payload")
+    if len(checks) > CHECK_BATCH_MAX:
+        raise HTTPException(
+            status_code=413, detail=f"Batch too large: at most {CHECK_BATCH_MAX} checks"
+        )
+
+    allowed = permission_checks_total.labels("allowed")
+    denied = permission_checks_total.labels("denied")
+    results = []
+    for item in checks:
+        values = (
+            tuple(item.get(k) for k in ("engine_id", "platform", "action_type"))
+            if isinstance(item, dict)
+            else ()
+        )
+        if len(values) != 3 or not all(isinstance(v, str) and v for v in values):
+            results.append({"error": "Invalid payload"})
+            continue
+        decision = check(*values)
+        (allowed if decision.allowed else denied).inc()
+        results.append(decision.as_dict())
+    logger.info(
+        "Permission batch check",
+        extra={"size": len(checks), "engine_id": x_engine_id, "request_id": get_request_id()},
+    )
+    return JSONResponse({"results": results})
+
+
+@router.post("/capabilities/issue")
+async def issue_capability_endpoint(
+    data: dict | None = None,
+    x_engine_id: str = Header(None),
+    x_engine_key: str = Header(None),
+):
+    """Issue a short-lived signed token with the calling engine's permissions."""
+
+    verify_engine(x_engine_id, x_engine_key)
+    token, expires_at = capability.issue(
+        x_engine_id,
+        engine_trie(x_engine_id),
+        platform_statuses(),
+        CAPABILITY_SECRET,
+        CAPABILITY_TTL_SECONDS,
+    )
+    logger.info(
+        "Capability issued",
+        extra={"engine_id": x_engine_id, "request_id": get_request_id()},
+    )
+    return JSONResponse({"token": token, "expires_at": expires_at})
+
+
+@router.get("/policy/snapshot")
+async def policy_snapshot_endpoint(
+    since: int | None = None,
+    epoch: str | None = None,
+    wait: float = 0,
+    x_engine_id: str = Header(None),
+    x_engine_key: str = Header(None),
+):
+    """Return the policy changes after ``since``, or a full snapshot.
+
+    A full snapshot is returned when ``since`` is missing, belongs to another
+    ``epoch`` or is older than the retained change log. When the caller is
+    up to date, the request waits up to ``wait`` seconds for a change.
+    """
+
+    verify_engine(x_engine_id, x_engine_key)
+    if since is None or epoch != change_feed.epoch():
+        return JSONResponse(policy_snapshot())
+    if since == change_feed.current_version():
+        await change_feed.wait_for_change(since, min(wait, POLICY_MAX_WAIT_SECONDS))
+    changes = change_feed.changes_since(epoch, since)
+    if changes is None:
+        return JSONResponse(policy_snapshot())
+    return JSONResponse(
+        {
+            "epoch": epoch,
+            "version": change_feed.current_version(),
+            "full": False,
+            "changes": changes,
+        }
+    )
+
+
+def _versioned_response(name: str, resource: VersionedResource, if_none_match: str | None):
+    etag, body = resource.current()
+    if etag_matches(if_none_match, etag):
+        cached_reads_total.labels(name, "not_modified").inc()
+        return Response(status_code=304, headers={"ETag": etag})
+    cached_reads_total.labels(name, "full").inc()
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
 @router.get("/platforms/list")
 async def platforms_list_endpoint(
     x_engine_id: str = Header(None),
     x_engine_key: str = Header(None),
+    if_none_match: str = Header(None),
 ):
-    """Return known platforms and their statuses."""
+    """Return known platforms and their statuses, or ``304`` if unchanged."""
 
     verify_engine(x_engine_id, x_engine_key)
-    return JSONResponse({"platforms": list_platforms()})
+    return _versioned_response("platforms/list", platform_registry.resource, if_none_match)
 
 
 @router.get("/config/global")
 async def global_config_endpoint(
     x_engine_id: str = Header(None),
     x_engine_key: str = Header(None),
+    if_none_match: str = Header(None),
 ):
-    """Return global configuration information."""
+    """Return global configuration information, or ``304`` if unchanged."""
 
     verify_engine(x_engine_id, x_engine_key)
-    return JSONResponse(get_global_config())
+    return _versioned_response("config/global", config.resource, if_none_match)
+
+
+@router.get("/watch")
+async def watch_endpoint(
+    resource: str,
+    wait: float = 0,
+    x_engine_id: str = Header(None),
+    x_engine_key: str = Header(None),
+    if_none_match: str = Header(None),
+):
+    """Wait up to ``wait`` seconds for ``resource`` to differ from ``If-None-Match``.
+
+    Returns the new body with its ETag, or ``304`` if nothing changed in time.
+    """
+
+    verify_engine(x_engine_id, x_engine_key)
+    target = WATCHABLE.get(resource)
+    if target is None:
+        raise HTTPException(status_code=404, detail="Unknown resource")
+    await target.wait(if_none_match, min(max(wait, 0), WATCH_MAX_WAIT_SECONDS))
+    return _versioned_response(resource, target, if_none_match)
 
 
 @router.post("/log/engine_event")
@@ -109,8 +332,123 @@ async def log_engine_event_endpoint(
     x_engine_id: str = Header(None),
     x_engine_key: str = Header(None),
 ):
-    """Log an arbitrary engine event."""
+    """Queue an arbitrary engine event for logging."""
 
     verify_engine(x_engine_id, x_engine_key)
-    logger.info("Engine event", extra={"data": data, "request_id": get_request_id()})
+    _buffer_events(x_engine_id, [data])
     return JSONResponse({"status": "logged"})
+
+
+def _parse_events(body: bytes, content_type: str) -> list:
+    """Return the events of a JSON array or NDJSON body; raise ``ValueError`` if malformed."""
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        events = [json.loads(line) for line in body.splitlines() if line.strip()]
+    else:
+        events = json.loads(body or b"null")
+        if not isinstance(events, list):
+            raise ValueError("Expected a JSON array")
+    if not all(isinstance(event, dict) for event in events):
+        raise ValueError("Events must be JSON objects")
+    return events
+
+
+def _encode_cursor(since: float, event: dict) -> str:
+    """Return the cursor paging on from ``event`` in a query starting at ``since``."""
+    raw = f"{since!r}:{event['received_at']!r}:{event['seq']}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    """Return ``(since, received_at, seq)`` from a cursor; raise ``ValueError`` if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    except (binascii.Error, UnicodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    since, received_at, seq = raw.split(":")
+    since, received_at = float(since), float(received_at)
+    if not (math.isfinite(since) and math.isfinite(received_at)):
+        raise ValueError("Invalid cursor")
+    return since, received_at, int(seq)
+
+
+def _buffer_events(engine_id: str, events: list) -> None:
+    received_at = time.time()
+    stamped = [
+        {"engine_id": engine_id, "received_at": received_at, "data": event} for event in events
+    ]
+    if not event_buffer.buffer.offer(stamped):
+        raise HTTPException(
+            status_code=429,
+            detail="Event buffer full",
+            headers={"Retry-After": str(event_buffer.buffer.retry_after())},
+        )
+
+
+@router.post("/log/engine_events")
+async def log_engine_events_endpoint(
+    request: Request,
+    x_engine_id: str = Header(None),
+    x_engine_key: str = Header(None),
+):
+    """Queue many engine events sent as a JSON array or as NDJSON.
+
+    Returns ``429`` with ``Retry-After`` when the buffer cannot take them all.
+    """
+
+    verify_engine(x_engine_id, x_engine_key)
+    try:
+        events = _parse_events(await request.body(), request.headers.get("content-type", ""))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid payload")
+    if len(events) > ENGINE_EVENTS_MAX_BATCH:
+        raise HTTPException(status_code=413, detail="Too many events")
+    _buffer_events(x_engine_id, events)
+    logger.info(
+        "Engine events queued",
+        extra={"engine_id": x_engine_id, "count": len(events), "request_id": get_request_id()},
+    )
+    return JSONResponse({"accepted": len(events)}, status_code=202)
+
+
+@router.get("/log/events")
+async def log_events_query_endpoint(
+    since: float | None = None,
+    until: float | None = None,
+    engine_id: str | None = None,
+    type: str | None = None,
+    limit: int = 100,
+    cursor: str | None = None,
+    x_engine_id: str = Header(None),
+    x_engine_key: str = Header(None),
+):
+    """Return stored engine events received in ``[since, until)``, newest first.
+
+    ``since`` and ``until`` are Unix timestamps and default to the last ten
+    minutes. ``more`` is true when older matching events were left out; ask
+    again with the returned ``cursor`` (and the same ``engine_id`` and
+    ``type``) to page. The cursor keeps the first page's ``since``, so
+    ``since`` and ``until`` are ignored while paging.
+    """
+
+    verify_engine(x_engine_id, x_engine_key)
+    before_seq = None
+    if cursor is not None:
+        try:
+            since, until, before_seq = _decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    now = time.time()
+    until = now if until is None else until
+    since = until - EVENT_QUERY_DEFAULT_SECONDS if since is None else since
+    if since > until or not 0 < limit <= EVENT_QUERY_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail="Invalid query")
+    start = time.perf_counter()
+    events, more = event_store.store.query(since, until, engine_id, type, limit, before_seq)
+    return JSONResponse(
+        {
+            "events": events,
+            "more": more,
+            "cursor": _encode_cursor(since, events[-1]) if more else None,
+            "took_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+    )
@@ -1,11 +1,30 @@
-from typing import Dict
+from typing import Dict, Optional
+
+from .store import durable, shared
 
 _ENGINE_CONFIGS: Dict[str, Dict] = {}
 
 
+def _apply_set(data: Dict) -> None:
+    _ENGINE_CONFIGS[data["engine_id"]] = data["config"]
+
+
+def _apply_clear(data: Optional[Dict] = None) -> None:
+    _ENGINE_CONFIGS.clear()
+
+
+def _load(state: Optional[Dict[str, Dict]]) -> None:
+    _ENGINE_CONFIGS.clear()
+    _ENGINE_CONFIGS.update(state or {})
+
+
 def set_engine_config(engine_id: str, config: Dict) -> None:
     """Store configuration for an engine."""
-    _ENGINE_CONFIGS[engine_id] = config
+    durable.check_writable()
+    data = {"engine_id": engine_id, "config": config}
+    _apply_set(data)
+    stored = durable.record("engine_config.set", data)
+    shared.write("engine_configs", {engine_id: config}, after=stored)
 
 
 def get_engine_config(engine_id: str) -> Dict:
@@ -15,4 +34,18 @@ def get_engine_config(engine_id: str) -> Dict:
 
 def clear_engine_configs() -> None:
     """Remove all configs (mainly for tests)."""
-    _ENGINE_CONFIGS.clear()
+    durable.check_writable()
+    _apply_clear()
+    stored = durable.record("engine_config.clear", {})
+    shared.replace("engine_configs", {}, after=stored)
+
+
+durable.register_op("engine_config.set", _apply_set)
+durable.register_op("engine_config.clear", _apply_clear)
+durable.register_state("engine_configs", lambda: dict(_ENGINE_CONFIGS), _load)
+shared.register_map(
+    "engine_configs",
+    lambda: dict(_ENGINE_CONFIGS),
+    _load,
+    lambda engine_id, config: _apply_set({"engine_id": engine_id, "config": config}),
+)
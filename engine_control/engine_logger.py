@@ -1,10 +1,10 @@
-import json
 import logging
 from typing import Any
-from datetime import datetime
 import contextvars
 import uuid
 
+from shared.log_pipeline import configure_logger
+
 # Context variable storing the current request ID
 request_id_ctx_var: contextvars.ContextVar[str | None] = contextvars.ContextVar(
     "request_id",
@@ -17,23 +17,6 @@ def get_request_id() -> str | None:
     return request_id_ctx_var.get()
 
 
-class JsonFormatter(logging.Formatter):
-    """Formatter that outputs logs as JSON strings."""
-
-    def format(self, record: logging.LogRecord) -> str:  # pragma: no cover - simple formatting
-        log_record = {
-            "level": record.levelname,
-            "name": record.name,
-            "message": record.getMessage(),
-            "time": datetime.utcnow().isoformat(),
-        }
-        if record.exc_info:
-            log_record["exception"] = self.formatException(record.exc_info)
-        if hasattr(record, "request_id") and record.request_id is not None:
-            log_record["request_id"] = record.request_id
-        return json.dumps(log_record)
-
-
 class SanitizeTokenFilter(logging.Filter):
     """Remove token-like fields from log records."""
 
@@ -45,18 +28,9 @@ class SanitizeTokenFilter(logging.Filter):
 
 
 def get_logger(name: str) -> logging.Logger:
-    """Return a logger configured with :class:`JsonFormatter`."""
-
-    logger = logging.getLogger(name)
+    """Return a logger writing JSON through the shared non-blocking pipeline."""
 
-    if not logger.handlers:
-        handler = logging.StreamHandler()
-        handler.setFormatter(JsonFormatter())
-        logger.addHandler(handler)
-        logger.addFilter(SanitizeTokenFilter())
-        logger.setLevel(logging.INFO)
-        logger.propagate = False
-    return logger
+    return configure_logger(logging.getLogger(name), SanitizeTokenFilter())
 
 
 class RequestIdMiddleware:
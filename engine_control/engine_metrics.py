@@ -0,0 +1,15 @@
+"""Prometheus metrics of Engine Control.
+
+The metric types, the registry and the HTTP middleware live in
+:mod:`shared.metrics`. This module holds the service's :data:`REGISTRY`,
+which the ``/metrics`` endpoint renders and the other modules register
+their metrics on.
+"""
+
+from shared.metrics import CONTENT_TYPE, MetricsMiddleware, Registry, http_metrics
+
+REGISTRY = Registry()
+# Listed on ``/metrics`` before the middleware has handled a request
+http_metrics(REGISTRY)
+
+__all__ = ["CONTENT_TYPE", "MetricsMiddleware", "REGISTRY", "Registry"]
@@ -1,25 +1,110 @@
-"""In-memory store and helpers for registered engines."""
+"""In-memory store and helpers for registered engines.
+
+Changes are applied as operations and recorded in the durable store (see
+:mod:`engine_control.store.durable`), which replays them on startup, and in
+the state shared with other replicas (:mod:`engine_control.store.shared`).
+"""
 
 from __future__ import annotations
 
 import secrets
-from typing import Dict, List, Optional
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
 
-_engine_store: Dict[str, Dict] = {}
+from . import dependency_graph, permission_checker
+from .store import durable, engine_store, shared
 
+_engine_store: Dict[str, Dict] = engine_store.ENGINES
 
-def register_engine(
-    engine_id: str, permissions: Dict, depends_on: Optional[List[str]] = None
-) -> str:
-    """Register an engine and return its generated secret token."""
 
-    token = secrets.token_hex(16)
+def _apply_register(data: Dict) -> None:
+    engine_id = data["engine_id"]
+    permission_checker.index_engine(engine_id, data["permissions"], data["deny"])
+    dependency_graph.index_engine(
+        engine_id, data["depends_on"], dependency_graph.platforms_of(data["permissions"])
+    )
     _engine_store[engine_id] = {
-        "token": token,
+        "token": data["token"],
+        "permissions": data["permissions"],
+        "depends_on": data["depends_on"],
+        "deny": data["deny"],
+    }
+
+
+def _apply_unregister(data: Dict) -> None:
+    engine_id = data["engine_id"]
+    _engine_store.pop(engine_id, None)
+    permission_checker.remove_engine(engine_id)
+    dependency_graph.remove_engine(engine_id)
+
+
+def _apply_clear(data: Optional[Dict] = None) -> None:
+    _engine_store.clear()
+    permission_checker.clear_engine_index()
+    dependency_graph.clear()
+
+
+def _load(state: Optional[Dict[str, Dict]]) -> None:
+    _apply_clear()
+    for engine_id, engine in (state or {}).items():
+        _apply_register(dict(engine, engine_id=engine_id))
+
+
+def register_engine(
+    engine_id: str,
+    permissions: Dict,
+    depends_on: Optional[List[str]] = None,
+    deny: Optional[List[str]] = None,
+) -> str:
+    """Register an engine and return its generated secret token.
+
+    Raises ``ValueError`` if a permission or deny pattern is malformed or if
+    ``depends_on`` would create a dependency cycle, and ``RuntimeError`` if
+    the durable store can no longer log changes.
+    """
+
+    return register_engine_recorded(engine_id, permissions, depends_on, deny)[0]
+
+
+def register_engine_recorded(
+    engine_id: str,
+    permissions: Dict,
+    depends_on: Optional[List[str]] = None,
+    deny: Optional[List[str]] = None,
+) -> Tuple[str, Optional[Future]]:
+    """Like :func:`register_engine`, also returning the registration's durable record.
+
+    The record is the future :func:`durable.record` returned; pass it to
+    :func:`durable.stored` to wait for this registration alone.
+    """
+
+    if not all(isinstance(dep, str) and dep for dep in depends_on or ()):
+        raise ValueError("Invalid depends_on")
+    dependency_graph.check_acyclic(engine_id, depends_on or ())
+    durable.check_writable()
+    data = {
+        "engine_id": engine_id,
+        "token": secrets.token_hex(16),
         "permissions": permissions or {},
         "depends_on": depends_on or [],
+        "deny": deny or [],
     }
-    return token
+    _apply_register(data)
+    stored = durable.record("engine.register", data)
+    shared.write("engines", {engine_id: _engine_store[engine_id]}, after=stored)
+    return data["token"], stored
+
+
+def revert_engine(engine_id: str, previous: Optional[Dict]) -> None:
+    """Undo, in memory only, a registration the durable store failed to write.
+
+    ``previous`` is what :func:`get_engine` returned before the registration.
+    """
+
+    if previous is None:
+        _apply_unregister({"engine_id": engine_id})
+    else:
+        _apply_register(dict(previous, engine_id=engine_id))
 
 
 def get_engine(engine_id: str) -> Optional[Dict]:
@@ -44,4 +129,18 @@ def list_engines() -> Dict[str, Dict]:
 def clear_engines() -> None:
     """Remove all registered engines (mainly for tests)."""
 
-    _engine_store.clear()
+    durable.check_writable()
+    _apply_clear()
+    stored = durable.record("engine.clear", {})
+    shared.replace("engines", {}, after=stored)
+
+
+durable.register_op("engine.register", _apply_register)
+durable.register_op("engine.clear", _apply_clear)
+durable.register_state("engines", list_engines, _load)
+shared.register_map(
+    "engines",
+    list_engines,
+    _load,
+    lambda engine_id, engine: _apply_register(dict(engine, engine_id=engine_id)),
+)
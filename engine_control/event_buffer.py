@@ -0,0 +1,210 @@
+"""Buffered ingestion of engine events.
+
+``/log/engine_event`` and ``/log/engine_events`` only append events to a
+bounded in-memory ring buffer and return. A background task takes up to
+``ENGINE_EVENT_BATCH_SIZE`` events at a time and hands each batch to the
+configured sink, either as soon as a full batch is waiting or every
+``ENGINE_EVENT_FLUSH_SECONDS``. A batch the sink fails on stays at the head
+of the buffer and is retried, so events are delivered in order.
+
+Requests are accepted whole or not at all: when the events of a request do
+not fit in the free space, :meth:`EventBuffer.offer` refuses them and the
+endpoint answers ``429`` so the engine retries later.
+
+Sinks are async callables taking a list of events. ``ENGINE_EVENT_SINK``
+names one or more of them, separated by commas (default ``log,store``).
+With several sinks, each one is tracked separately: when a later sink fails,
+the retry only hands the batch to the sinks that have not received it yet.
+
+``log``
+    One structured log record per event.
+``store``
+    The queryable in-memory store in :mod:`engine_control.store.event_store`.
+``file``
+    Appends the batch as JSON lines to ``ENGINE_EVENT_SINK_PATH`` in one
+    write, off the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence
+
+from .engine_logger import get_logger
+from .store import event_store
+
+ENGINE_EVENT_BUFFER_SIZE = int(os.getenv("ENGINE_EVENT_BUFFER_SIZE", "100000"))
+ENGINE_EVENT_BATCH_SIZE = int(os.getenv("ENGINE_EVENT_BATCH_SIZE", "1000"))
+ENGINE_EVENT_FLUSH_SECONDS = float(os.getenv("ENGINE_EVENT_FLUSH_SECONDS", "1"))
+ENGINE_EVENT_SINK = os.getenv("ENGINE_EVENT_SINK", "log,store")
+ENGINE_EVENT_SINK_PATH = os.getenv("ENGINE_EVENT_SINK_PATH", "engine_events.jsonl")
+
+logger = get_logger(__name__)
+
+Sink = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+
+async def log_sink(events: List[Dict[str, Any]]) -> None:
+    # Event bodies may hold user data; only where it came from and its type
+    # are logged. The ``store`` and ``file`` sinks keep the full event.
+    for event in events:
+        logger.info(
+            "Engine event",
+            extra={"engine_id": event.get("engine_id"), "type": event_store.event_type_of(event.get("data"))},
+        )
+
+
+def file_sink(path: str) -> Sink:
+    """Return a sink appending events as JSON lines to ``path``."""
+
+    def write(events: List[Dict[str, Any]]) -> None:
+        data = "".join(json.dumps(event, separators=(",", ":")) + "\n" for event in events)
+        with open(path, "a", encoding="utf-8") as handle:
+            handle.write(data)
+
+    async def sink(events: List[Dict[str, Any]]) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, write, events)
+
+    return sink
+
+
+_SINKS: Dict[str, Callable[[], Sink]] = {
+    "log": lambda: log_sink,
+    "store": lambda: event_store.store_sink,
+    "file": lambda: file_sink(ENGINE_EVENT_SINK_PATH),
+}
+
+
+def register_sink(name: str, factory: Callable[[], Sink]) -> None:
+    """Make a sink selectable through ``ENGINE_EVENT_SINK``."""
+    _SINKS[name] = factory
+
+
+def make_sink(names: str) -> Sink:
+    """Return the sink for comma-separated sink ``names``."""
+    try:
+        sinks = [_SINKS[name.strip()]() for name in names.split(",") if name.strip()]
+    except KeyError as exc:
+        raise ValueError(f"Unknown engine event sink {exc.args[0]!r}") from None
+    if len(sinks) == 1:
+        return sinks[0]
+
+    # How many events at the head of the buffer each sink already has. A
+    # retried batch starts with the same event and may have grown since.
+    head: List[Optional[Dict[str, Any]]] = [None]
+    delivered = [0] * len(sinks)
+
+    async def fan_out(events: List[Dict[str, Any]]) -> None:
+        if not events:
+            return
+        if head[0] is not events[0]:
+            head[0] = events[0]
+            delivered[:] = [0] * len(sinks)
+        for index, sink in enumerate(sinks):
+            if delivered[index] < len(events):
+                await sink(events[delivered[index]:])
+                delivered[index] = len(events)
+        head[0] = None
+
+    return fan_out
+
+
+class EventBuffer:
+    """Bounded FIFO of events drained to a sink by one background task."""
+
+    def __init__(
+        self,
+        capacity: int = 100000,
+        batch_size: int = 1000,
+        flush_seconds: float = 1.0,
+        sink: Optional[Sink] = None,
+        retry_seconds: float = 1.0,
+    ) -> None:
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.retry_seconds = retry_seconds
+        self.sink = sink or log_sink
+        self._events: Deque[Dict[str, Any]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional["asyncio.Task"] = None
+        self.metrics = {"accepted": 0, "rejected": 0, "flushed": 0, "batches": 0, "failures": 0}
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def offer(self, events: Sequence[Dict[str, Any]]) -> bool:
+        """Queue all ``events``, or none of them if they do not fit."""
+        if len(self._events) + len(events) > self.capacity:
+            self.metrics["rejected"] += len(events)
+            return False
+        self._events.extend(events)
+        self.metrics["accepted"] += len(events)
+        if self._wakeup is not None and len(self._events) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def retry_after(self) -> int:
+        """Seconds a refused client should wait: roughly one flush interval."""
+        return max(1, round(self.flush_seconds))
+
+    async def flush(self) -> int:
+        """Hand every queued event to the sink; return how many were delivered."""
+        delivered = 0
+        while self._events:
+            batch = [self._events[i] for i in range(min(self.batch_size, len(self._events)))]
+            await self.sink(batch)
+            for _ in batch:
+                self._events.popleft()
+            delivered += len(batch)
+            self.metrics["flushed"] += len(batch)
+            self.metrics["batches"] += 1
+        return delivered
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.metrics["failures"] += 1
+                logger.info("Engine event sink failed", extra={"error": str(exc), "queued": len(self)})
+                await asyncio.sleep(self.retry_seconds)
+
+    def start(self) -> None:
+        """Start the background flush task."""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush task, then deliver what is still queued."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self._wakeup = None
+        try:
+            await self.flush()
+        except Exception as exc:
+            logger.info("Engine events dropped on shutdown", extra={"error": str(exc), "queued": len(self)})
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.metrics, queued=len(self), capacity=self.capacity)
+
+
+buffer = EventBuffer(
+    ENGINE_EVENT_BUFFER_SIZE,
+    ENGINE_EVENT_BATCH_SIZE,
+    ENGINE_EVENT_FLUSH_SECONDS,
+    make_sink(ENGINE_EVENT_SINK),
+)
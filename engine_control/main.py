@@ -1,8 +1,40 @@
 from fastapi import FastAPI
 
+from . import (  # noqa: F401 - register persisted state
+    config,
+    engine_config,
+    engine_registry,
+    event_buffer,
+    platform_registry,
+)
 from .engine_api import router
-from .engine_logger import RequestIdMiddleware
+from .engine_logger import RequestIdMiddleware, get_logger
+from . import engine_metrics
+from .store import durable, shared
+
+logger = get_logger(__name__)
 
 app = FastAPI()
 app.add_middleware(RequestIdMiddleware)
+app.add_middleware(engine_metrics.MetricsMiddleware, registry=engine_metrics.REGISTRY)
 app.include_router(router)
+
+
+@app.on_event("startup")
+async def startup() -> None:
+    """Restore the registries and join the other replicas when configured."""
+    if durable.DATA_DIR:
+        restored = durable.open_store(durable.DATA_DIR)
+        logger.info("Durable store opened", extra=restored)
+    if shared.SHARED_STATE_REDIS_URL:
+        await shared.start()
+        logger.info("Shared state loaded", extra=shared.stats())
+    event_buffer.buffer.start()
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    """Deliver queued events and shared writes, then close the durable store."""
+    await event_buffer.buffer.stop()
+    await shared.stop()
+    durable.close_store()
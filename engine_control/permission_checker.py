@@ -1,23 +1,191 @@
-from typing import Dict, List
-from .engine_registry import get_engine
-from .platform_registry import get_platform_status
+"""Permission checks answered from a precompiled, immutable index.
+
+Each registered engine's ``platform -> action_type -> scopes`` blob and its
+deny patterns are compiled once into a :class:`CompiledEngine`. It holds a
+:class:`~shared.permission_trie.PermissionTrie` for wildcard and
+prefix rules (``gmail.*``, ``*.read_*``), plus a read-only map from every
+exact ``(platform, action_type)`` grant to its finished :class:`Decision`,
+with deny rules and the platform status already applied. A check of an
+exactly granted action is one dictionary lookup; anything else is one trie
+walk.
+
+The index is only touched when something changes: ``register_engine``
+recompiles that engine when its rules differ from the indexed ones, and
+``set_platform_status`` recompiles only the engines with exact grants on
+that platform. Compiled entries are never mutated, only replaced.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Mapping, NamedTuple, Optional, Sequence, Set, Tuple
+
+from shared.permission_trie import PermissionTrie, is_pattern
+
+from . import change_feed
+
+ACTIVE = "active"
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    required_scopes: Tuple[str, ...]
+    platform_status: str
+
+    def as_dict(self) -> Dict:
+        return {
+            "allowed": self.allowed,
+            "required_scopes": list(self.required_scopes),
+            "platform_status": self.platform_status,
+        }
+
+
+@dataclass(frozen=True)
+class CompiledEngine:
+    """Rules of one engine; ``decisions`` only holds exact grants."""
+
+    trie: PermissionTrie
+    platforms: frozenset
+    decisions: Mapping[Tuple[str, str], Decision]
+
+
+_engines: Dict[str, CompiledEngine] = {}
+# Only platforms that are not active; everything else defaults to "active"
+_statuses: Dict[str, str] = {}
+# Engines with at least one exact grant on a platform
+_by_platform: Dict[str, Set[str]] = {}
+_stats = {"compiles": 0}
+_EMPTY = PermissionTrie(())
+_snapshot: Optional[Dict] = None
+
+
+def _decide(trie: PermissionTrie, platform: str, action_type: str) -> Decision:
+    status = _statuses.get(platform, ACTIVE)
+    rule = trie.match(platform, action_type)
+    if rule is None or rule.deny or status != ACTIVE:
+        return Decision(False, (), status)
+    return Decision(True, rule.scopes, status)
+
+
+def _compile(trie: PermissionTrie) -> CompiledEngine:
+    _stats["compiles"] += 1
+    exact = {
+        (rule.platform, rule.action_type)
+        for rule in trie.rules
+        if not rule.deny and not is_pattern(rule.platform) and not is_pattern(rule.action_type)
+    }
+    return CompiledEngine(
+        trie=trie,
+        platforms=frozenset(platform for platform, _ in exact),
+        decisions=MappingProxyType({key: _decide(trie, *key) for key in exact}),
+    )
+
+
+def index_engine(engine_id: str, permissions: Mapping, deny: Sequence[str] = ()) -> bool:
+    """Compile the rules of ``engine_id``; return ``False`` if unchanged.
+
+    Raises ``ValueError`` for malformed patterns, leaving the index as it was.
+    """
+    trie = PermissionTrie.build(permissions, deny)
+    current = _engines.get(engine_id)
+    if current is not None and current.trie.rules == trie.rules:
+        return False
+    if current is not None:
+        for platform in current.platforms:
+            _by_platform.get(platform, set()).discard(engine_id)
+    compiled = _compile(trie)
+    _engines[engine_id] = compiled
+    for platform in compiled.platforms:
+        _by_platform.setdefault(platform, set()).add(engine_id)
+    change_feed.record("engine", engine_id, trie.to_json())
+    return True
+
+
+def remove_engine(engine_id: str) -> bool:
+    """Forget one compiled engine; return ``False`` if it was not indexed."""
+    current = _engines.pop(engine_id, None)
+    if current is None:
+        return False
+    for platform in current.platforms:
+        _by_platform.get(platform, set()).discard(engine_id)
+    change_feed.record("engine", engine_id, None)
+    return True
+
+
+def index_platform_status(platform: str, status: str) -> bool:
+    """Apply a platform status change; return ``False`` if nothing changed."""
+    if _statuses.get(platform, ACTIVE) == status:
+        return False
+    if status == ACTIVE:
+        _statuses.pop(platform, None)
+    else:
+        _statuses[platform] = status
+    for engine_id in _by_platform.get(platform, ()):
+        _engines[engine_id] = _compile(_engines[engine_id].trie)
+    change_feed.record("platform", platform, status)
+    return True
+
+
+def clear_engine_index() -> None:
+    """Forget all compiled engines."""
+    for engine_id in list(_engines):
+        change_feed.record("engine", engine_id, None)
+    _engines.clear()
+    _by_platform.clear()
+
+
+def clear_platform_index() -> None:
+    """Treat every platform as active again."""
+    for platform in list(_statuses):
+        index_platform_status(platform, ACTIVE)
+
+
+def check(engine_id: str, platform: str, action_type: str) -> Decision:
+    """Return the decision for one action."""
+    engine = _engines.get(engine_id)
+    if engine is not None:
+        decision = engine.decisions.get((platform, action_type))
+        if decision is not None:
+            return decision
+        return _decide(engine.trie, platform, action_type)
+    return Decision(False, (), _statuses.get(platform, ACTIVE))
 
 
 def is_action_allowed(engine_id: str, platform: str, action_type: str) -> Dict:
     """Return whether the action is permitted for the engine and platform."""
-    engine = get_engine(engine_id)
-    status = get_platform_status(platform)
-    if not engine:
-        return {"allowed": False, "required_scopes": [], "platform_status": status}
-    if status != "active":
-        return {"allowed": False, "required_scopes": [], "platform_status": status}
-    permissions = engine.get("permissions", {})
-    scopes: List[str] | None = None
-    if platform in permissions:
-        scopes = permissions[platform].get(action_type)
-    allowed = scopes is not None
-    return {
-        "allowed": allowed,
-        "required_scopes": scopes or [],
-        "platform_status": status,
-    }
+    return check(engine_id, platform, action_type).as_dict()
+
+
+def engine_trie(engine_id: str) -> PermissionTrie:
+    """Return the compiled rules of ``engine_id`` (empty if not registered)."""
+    engine = _engines.get(engine_id)
+    return engine.trie if engine is not None else _EMPTY
+
+
+def platform_statuses() -> Dict[str, str]:
+    """Return the platforms that are not active and their statuses."""
+    return dict(_statuses)
+
+
+def policy_snapshot() -> Dict:
+    """Return all engines' rules and platform statuses at the current version.
+
+    The result is built once per version and shared; it must not be modified.
+    """
+    global _snapshot
+    epoch, version = change_feed.epoch(), change_feed.current_version()
+    if _snapshot is None or (_snapshot["epoch"], _snapshot["version"]) != (epoch, version):
+        _snapshot = {
+            "epoch": epoch,
+            "version": version,
+            "full": True,
+            "engines": {engine_id: e.trie.to_json() for engine_id, e in _engines.items()},
+            "platforms": dict(_statuses),
+        }
+    return _snapshot
+
+
+def stats() -> Dict[str, int]:
+    """Return the number of indexed engines and compilations so far."""
+    return dict(_stats, engines=len(_engines), inactive_platforms=len(_statuses))
@@ -1,16 +1,47 @@
-from typing import Dict
+from typing import Dict, Optional
 
-_PLATFORM_STATUS: Dict[str, str] = {}
+from . import dependency_graph, permission_checker
+from .store import durable, platform_store, shared
+from .versioned import VersionedResource
+
+_PLATFORM_STATUS: Dict[str, str] = platform_store.PLATFORMS
 
 
 VALID_STATUSES = {"active", "maintenance", "deprecated"}
 
+# Serialized body and ETag served by ``GET /platforms/list``
+resource = VersionedResource(lambda: {"platforms": _PLATFORM_STATUS})
+
+
+def _apply_status(data: Dict) -> None:
+    _PLATFORM_STATUS[data["platform"]] = data["status"]
+    permission_checker.index_platform_status(data["platform"], data["status"])
+    dependency_graph.index_platform_status(data["platform"], data["status"])
+    resource.bump()
+
+
+def _apply_clear(data: Optional[Dict] = None) -> None:
+    _PLATFORM_STATUS.clear()
+    permission_checker.clear_platform_index()
+    dependency_graph.clear_platforms()
+    resource.bump()
+
+
+def _load(state: Optional[Dict[str, str]]) -> None:
+    _apply_clear()
+    for platform_name, status in (state or {}).items():
+        _apply_status({"platform": platform_name, "status": status})
+
 
 def set_platform_status(platform_name: str, status: str) -> None:
     """Set operational status for a platform."""
     if status not in VALID_STATUSES:
         raise ValueError("Invalid status")
-    _PLATFORM_STATUS[platform_name] = status
+    durable.check_writable()
+    data = {"platform": platform_name, "status": status}
+    _apply_status(data)
+    stored = durable.record("platform.status", data)
+    shared.write("platforms", {platform_name: status}, after=stored)
 
 
 def get_platform_status(platform_name: str) -> str:
@@ -26,4 +57,18 @@ def list_platforms() -> Dict[str, str]:
 
 def clear_platforms() -> None:
     """Remove all platform statuses (mainly for tests)."""
-    _PLATFORM_STATUS.clear()
+    durable.check_writable()
+    _apply_clear()
+    stored = durable.record("platform.clear", {})
+    shared.replace("platforms", {}, after=stored)
+
+
+durable.register_op("platform.status", _apply_status)
+durable.register_op("platform.clear", _apply_clear)
+durable.register_state("platforms", list_platforms, _load)
+shared.register_map(
+    "platforms",
+    list_platforms,
+    _load,
+    lambda platform_name, status: _apply_status({"platform": platform_name, "status": status}),
+)
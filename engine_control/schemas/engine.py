@@ -11,6 +11,7 @@ class EngineRegistration(BaseModel):
     engine_id: str
     permissions: Dict[str, Dict[str, List[str]]]
     depends_on: Optional[List[str]] = None
+    deny: Optional[List[str]] = None
 
 
 class EngineValidation(BaseModel):
@@ -0,0 +1,249 @@
+"""Durable persistence of the Engine Control registries.
+
+Registries change their state only through *operations*: a registry builds
+an operation record, applies it to its in-memory state and hands it to
+:func:`record`, which appends it to the write-ahead log. Each registry
+registers the functions applying its operations (:func:`register_op`) and
+dumping/loading its whole state (:func:`register_state`).
+
+:func:`open_store` restores the state on startup by loading the latest snapshot
+and replaying only the log records written after it, then starts a new log
+segment. After ``STORE_SNAPSHOT_EVERY`` records a checkpoint writes a new
+snapshot and deletes the log segments it covers, so startup time is bounded
+by the snapshot size plus a short tail.
+
+If the log fails to write, it stops accepting records. Registries call
+:func:`check_writable` before changing anything, so the service then refuses
+changes until it is restarted and has recovered from the log.
+
+Persistence is off until :func:`open_store` is called; :func:`record` is then a
+no-op and the registries behave as plain in-memory dicts.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ..engine_logger import get_logger
+from .snapshot import read_snapshot, write_snapshot
+from .wal import WriteAheadLog, list_segments, scan_segment, segment_name, truncate_segment
+
+DATA_DIR = os.getenv("ENGINE_CONTROL_DATA_DIR", "")
+STORE_SNAPSHOT_EVERY = int(os.getenv("STORE_SNAPSHOT_EVERY", "50000"))
+STORE_COMMIT_DELAY_MS = float(os.getenv("STORE_COMMIT_DELAY_MS", "0"))
+
+logger = get_logger(__name__)
+
+Apply = Callable[[Dict[str, Any]], None]
+
+_ops: Dict[str, Apply] = {}
+_states: Dict[str, Tuple[Callable[[], Any], Callable[[Any], None]]] = {}
+
+
+def register_op(name: str, apply: Apply) -> None:
+    """Register the function replaying operation ``name``."""
+    _ops[name] = apply
+
+
+def register_state(name: str, dump: Callable[[], Any], load: Callable[[Any], None]) -> None:
+    """Register how the state called ``name`` is saved in and restored from snapshots.
+
+    ``dump`` runs on the event loop and must return a copy that later
+    changes do not touch, because the snapshot is encoded in another thread.
+    """
+    _states[name] = (dump, load)
+
+
+class _Store:
+    def __init__(self, directory: str, wal: WriteAheadLog, lsn: int, snapshot_lsn: int) -> None:
+        self.directory = directory
+        self.wal = wal
+        self.lsn = lsn
+        self.snapshot_lsn = snapshot_lsn
+        self.checkpointing = False
+
+
+_store: Optional[_Store] = None
+
+
+def is_open() -> bool:
+    return _store is not None
+
+
+def open_store(directory: str, commit_delay: Optional[float] = None) -> Dict[str, Any]:
+    """Restore all registered state from ``directory`` and start logging to it."""
+    global _store
+    if _store is not None:
+        raise RuntimeError("Store is already open")
+    start = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+
+    snapshot = read_snapshot(directory)
+    lsn = snapshot_lsn = 0
+    if snapshot is not None:
+        lsn = snapshot_lsn = snapshot["lsn"]
+        for name, (_, load) in _states.items():
+            load(snapshot["state"].get(name))
+    loaded = time.perf_counter()
+
+    replayed = truncated = 0
+    for _, path in list_segments(directory):
+        valid = 0
+        for valid, entry in scan_segment(path):
+            if entry["lsn"] <= lsn:
+                continue
+            if entry["lsn"] != lsn + 1:
+                raise RuntimeError(
+                    f"Write-ahead log is missing records {lsn + 1} to {entry['lsn'] - 1} "
+                    f"before {os.path.basename(path)}"
+                )
+            _ops[entry["op"]](entry["data"])
+            lsn = entry["lsn"]
+            replayed += 1
+        # Drop a torn tail: the new log may continue in this very segment,
+        # and records appended after torn bytes could never be read back.
+        if os.path.getsize(path) > valid:
+            truncate_segment(path, valid)
+            truncated += 1
+
+    delay = STORE_COMMIT_DELAY_MS / 1000 if commit_delay is None else commit_delay
+    wal = WriteAheadLog(os.path.join(directory, segment_name(lsn + 1)), delay)
+    _store = _Store(directory, wal, lsn, snapshot_lsn)
+    return {
+        "snapshot_lsn": snapshot_lsn,
+        "replayed": replayed,
+        "truncated_segments": truncated,
+        "lsn": lsn,
+        "snapshot_seconds": loaded - start,
+        "replay_seconds": time.perf_counter() - loaded,
+    }
+
+
+def check_writable() -> None:
+    """Raise ``RuntimeError`` if changes cannot be logged any more."""
+    store = _store
+    if store is not None and store.wal.failed is not None:
+        raise RuntimeError("Durable store is not writable")
+
+
+def record(op: str, data: Dict[str, Any]) -> Optional[Future]:
+    """Append an operation that was just applied in memory to the log.
+
+    Returns a future resolving once the record is on disk, or ``None`` when
+    persistence is off.
+    """
+    store = _store
+    if store is None:
+        return None
+    store.lsn += 1
+    try:
+        future = store.wal.append({"lsn": store.lsn, "op": op, "data": data})
+    except RuntimeError:
+        store.lsn -= 1
+        raise
+    if store.lsn - store.snapshot_lsn >= STORE_SNAPSHOT_EVERY and not store.checkpointing:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            checkpoint()
+            return future
+        store.checkpointing = True
+        loop.create_task(_checkpoint_in_background(store))
+    return future
+
+
+async def stored(future: Optional[Future]) -> None:
+    """Wait until the record :func:`record` returned ``future`` for is on disk.
+
+    Raises the log's write error if that record failed; later records do
+    not matter.
+    """
+    if future is not None:
+        # Shielded: the batch future is shared with every record in the batch.
+        await asyncio.shield(asyncio.wrap_future(future))
+
+
+async def committed() -> None:
+    """Wait until every operation recorded so far is on disk.
+
+    Raises the log's write error if that failed.
+    """
+    if _store is not None:
+        # Shielded: the batch future is shared with every other waiter.
+        await asyncio.shield(asyncio.wrap_future(_store.wal.committed()))
+
+
+def _begin_checkpoint(store: _Store) -> Tuple[int, Dict[str, Any]]:
+    lsn = store.lsn
+    state = {name: dump() for name, (dump, _) in _states.items()}
+    store.wal.rotate(os.path.join(store.directory, segment_name(lsn + 1)))
+    return lsn, state
+
+
+def _write_checkpoint(store: _Store, lsn: int, state: Dict[str, Any]) -> None:
+    write_snapshot(store.directory, lsn, state)
+    for first, path in list_segments(store.directory):
+        if first <= lsn:
+            os.remove(path)
+
+
+def checkpoint() -> int:
+    """Write a snapshot of the current state and drop the log it covers."""
+    store = _store
+    if store is None:
+        return 0
+    store.checkpointing = True
+    try:
+        lsn, state = _begin_checkpoint(store)
+        store.wal.committed().result()
+        _write_checkpoint(store, lsn, state)
+    finally:
+        store.checkpointing = False
+    store.snapshot_lsn = lsn
+    return lsn
+
+
+async def _checkpoint_in_background(store: _Store) -> None:
+    """Checkpoint with the snapshot encoded and written off the event loop."""
+    try:
+        lsn, state = _begin_checkpoint(store)
+        await asyncio.wrap_future(store.wal.committed())
+        await asyncio.get_running_loop().run_in_executor(
+            None, _write_checkpoint, store, lsn, state
+        )
+        store.snapshot_lsn = lsn
+    except Exception as exc:  # pragma: no cover - disk errors; retried on a later record
+        logger.info("Checkpoint failed", extra={"error": str(exc)})
+    finally:
+        store.checkpointing = False
+
+
+def close_store() -> None:
+    """Checkpoint if anything was logged since the last snapshot, then stop logging."""
+    global _store
+    store = _store
+    if store is None:
+        return
+    # After a write failure memory may hold changes the log does not; the
+    # next startup rebuilds from the log instead.
+    if store.lsn > store.snapshot_lsn and store.wal.failed is None:
+        checkpoint()
+    store.wal.close()
+    _store = None
+
+
+def stats() -> Dict[str, Any]:
+    """Return log counters and sequence numbers."""
+    if _store is None:
+        return {"open": False}
+    return dict(
+        _store.wal.metrics,
+        open=True,
+        writable=_store.wal.failed is None,
+        lsn=_store.lsn,
+        snapshot_lsn=_store.snapshot_lsn,
+    )
@@ -0,0 +1,280 @@
+"""Embedded, time-partitioned store of engine events.
+
+Events are grouped into segments by time window (``EVENT_SEGMENT_SECONDS``)
+and by engine, so a query for one engine over a time range only touches that
+engine's segments in the windows overlapping the range. Each segment stores
+its events column by column:
+
+* ``times``: ``received_at`` of every row, in arrival order;
+* ``seqs``: a store-wide sequence number of every row, increasing with
+  arrival, which orders events received at the same time and lets pages
+  resume exactly where the previous one stopped;
+* ``types``: the ``type`` field of every row as a small integer code, with
+  the code -> name table kept once per segment;
+* ``payloads``: the JSON-encoded event bodies concatenated in one buffer,
+  located through ``offsets``.
+
+A per-segment index maps each type code to its rows, and a per-window index
+maps each type to the engines that reported it, so a type filter never scans
+other rows or visits segments without that type. Time ranges are found by bisecting ``times``. Only rows
+that are returned are decoded from JSON.
+
+Whole windows are dropped once they are older than
+``EVENT_RETENTION_SECONDS``, and the oldest windows also go when the store
+holds more than ``EVENT_STORE_MAX_EVENTS`` events.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+EVENT_SEGMENT_SECONDS = float(os.getenv("EVENT_SEGMENT_SECONDS", "300"))
+EVENT_RETENTION_SECONDS = float(os.getenv("EVENT_RETENTION_SECONDS", "86400"))
+EVENT_STORE_MAX_EVENTS = int(os.getenv("EVENT_STORE_MAX_EVENTS", "5000000"))
+
+
+class Segment:
+    """Columns of the events one engine reported in one time window."""
+
+    __slots__ = ("engine_id", "times", "seqs", "types", "type_codes", "type_names", "type_rows",
+                 "payloads", "offsets", "ordered")
+
+    def __init__(self, engine_id: str) -> None:
+        self.engine_id = engine_id
+        self.times = array("d")
+        self.seqs = array("Q")
+        self.types = array("I")
+        self.type_codes: Dict[str, int] = {}
+        self.type_names: List[str] = []
+        self.type_rows: List[array] = []
+        self.payloads = bytearray()
+        self.offsets = array("Q", [0])
+        # False once an event arrived with an earlier time than the previous one
+        self.ordered = True
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def append(self, received_at: float, seq: int, event_type: str, payload: bytes) -> bool:
+        """Add one row; return ``True`` if it is the first of its type."""
+        row = len(self.times)
+        new_type = False
+        if row and received_at < self.times[-1]:
+            self.ordered = False
+        code = self.type_codes.get(event_type)
+        if code is None:
+            code = self.type_codes[event_type] = len(self.type_names)
+            self.type_names.append(event_type)
+            self.type_rows.append(array("I"))
+            new_type = True
+        self.times.append(received_at)
+        self.seqs.append(seq)
+        self.types.append(code)
+        self.type_rows[code].append(row)
+        self.payloads += payload
+        self.offsets.append(len(self.payloads))
+        return new_type
+
+    def rows(
+        self, since: float, until: float, event_type: Optional[str], before_seq: Optional[int] = None
+    ) -> Iterable[int]:
+        """Return the rows received in ``[since, until)``, optionally of one type.
+
+        With ``before_seq``, rows received exactly at ``until`` are included
+        too if their sequence number is below ``before_seq``.
+        """
+        times, seqs = self.times, self.seqs
+        if event_type is None:
+            candidates: Any = range(len(times))
+        else:
+            code = self.type_codes.get(event_type)
+            if code is None:
+                return ()
+            candidates = self.type_rows[code]
+        if not self.ordered:
+            return [
+                row
+                for row in candidates
+                if since <= times[row] < until
+                or (before_seq is not None and times[row] == until and seqs[row] < before_seq)
+            ]
+        # Rows and times both ascend, so the range is a slice of the candidates.
+        end = until if before_seq is None else math.nextafter(until, math.inf)
+        lo = bisect_left(candidates, bisect_left(times, since))
+        hi = bisect_left(candidates, bisect_left(times, end))
+        if before_seq is not None:
+            # Rows at ``until`` come last and their sequence numbers ascend.
+            while hi > lo and times[candidates[hi - 1]] == until and seqs[candidates[hi - 1]] >= before_seq:
+                hi -= 1
+        return candidates[lo:hi]
+
+    def event(self, row: int) -> Dict[str, Any]:
+        return {
+            "engine_id": self.engine_id,
+            "received_at": self.times[row],
+            "seq": self.seqs[row],
+            "type": self.type_names[self.types[row]],
+            "data": json.loads(self.payloads[self.offsets[row]:self.offsets[row + 1]]),
+        }
+
+    def nbytes(self) -> int:
+        return (
+            self.times.itemsize * len(self.times)
+            + self.seqs.itemsize * len(self.seqs)
+            + self.types.itemsize * len(self.types)
+            + sum(rows.itemsize * len(rows) for rows in self.type_rows)
+            + len(self.payloads)
+            + self.offsets.itemsize * len(self.offsets)
+        )
+
+
+def event_type_of(data: Any) -> str:
+    value = data.get("type") if isinstance(data, dict) else None
+    return value if isinstance(value, str) else ""
+
+
+class EventStore:
+    """Segments keyed by window start and engine id."""
+
+    def __init__(
+        self,
+        segment_seconds: float = 300.0,
+        retention_seconds: float = 86400.0,
+        max_events: int = 5000000,
+    ) -> None:
+        self.segment_seconds = segment_seconds
+        self.retention_seconds = retention_seconds
+        self.max_events = max_events
+        self._windows: Dict[float, Dict[str, Segment]] = {}
+        self._starts: List[float] = []  # window starts, ascending
+        # window start -> event type -> engines with events of that type
+        self._types: Dict[float, Dict[str, Set[str]]] = {}
+        self._counts: Dict[float, int] = {}
+        self._seq = 0
+        self.events = 0
+        self.metrics = {"appended": 0, "dropped_windows": 0, "dropped_events": 0, "queries": 0}
+
+    def _window(self, received_at: float) -> float:
+        return received_at - received_at % self.segment_seconds
+
+    def append(self, events: Iterable[Dict[str, Any]]) -> int:
+        """Store events shaped ``{"engine_id", "received_at", "data"}``."""
+        added = 0
+        for event in events:
+            received_at = float(event["received_at"])
+            start = self._window(received_at)
+            segments = self._windows.get(start)
+            if segments is None:
+                segments = self._windows[start] = {}
+                self._counts[start] = 0
+                self._types[start] = {}
+                insort(self._starts, start)
+            engine_id = str(event["engine_id"])
+            segment = segments.get(engine_id)
+            if segment is None:
+                segment = segments[engine_id] = Segment(engine_id)
+            data = event.get("data")
+            event_type = event_type_of(data)
+            self._seq += 1
+            payload = json.dumps(data, separators=(",", ":")).encode()
+            if segment.append(received_at, self._seq, event_type, payload):
+                self._types[start].setdefault(event_type, set()).add(engine_id)
+            self._counts[start] += 1
+            added += 1
+        self.events += added
+        self.metrics["appended"] += added
+        self.expire()
+        return added
+
+    def _drop(self, start: float) -> None:
+        del self._windows[start]
+        del self._types[start]
+        self._starts.remove(start)
+        count = self._counts.pop(start)
+        self.events -= count
+        self.metrics["dropped_windows"] += 1
+        self.metrics["dropped_events"] += count
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Drop windows past retention or over the size limit; return how many."""
+        cutoff = (time.time() if now is None else now) - self.retention_seconds
+        dropped = 0
+        while self._starts and (
+            self._starts[0] + self.segment_seconds <= cutoff
+            or (self.events > self.max_events and len(self._starts) > 1)
+        ):
+            self._drop(self._starts[0])
+            dropped += 1
+        return dropped
+
+    def query(
+        self,
+        since: float,
+        until: float,
+        engine_id: Optional[str] = None,
+        event_type: Optional[str] = None,
+        limit: int = 100,
+        before_seq: Optional[int] = None,
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """Return the newest ``limit`` matching events, newest first, and whether more matched.
+
+        Events received at the same time are ordered by ``seq``. To get the
+        next page, pass the last event's ``received_at`` as ``until`` and its
+        ``seq`` as ``before_seq``.
+        """
+        self.metrics["queries"] += 1
+        first = bisect_right(self._starts, self._window(since)) - 1
+        last = bisect_right(self._starts, until) if before_seq is not None else bisect_left(self._starts, until)
+        found: List[Tuple[float, int, int, Segment]] = []
+        for start in reversed(self._starts[max(first, 0):last]):
+            segments = self._windows[start]
+            if engine_id is not None:
+                segment = segments.get(engine_id)
+                selected = [segment] if segment is not None else []
+            elif event_type is not None:
+                selected = [segments[e] for e in self._types[start].get(event_type, ())]
+            else:
+                selected = segments.values()
+            wanted = limit + 1 - len(found)
+            window: List[Tuple[float, int, int, Segment]] = []
+            for segment in selected:
+                times, seqs = segment.times, segment.seqs
+                rows = segment.rows(since, until, event_type, before_seq)
+                if not segment.ordered:
+                    rows = sorted(rows, key=lambda row: (times[row], seqs[row]))
+                # Only the newest rows of each segment can make the cut.
+                window.extend((times[row], seqs[row], row, segment) for row in rows[-wanted:])
+            window.sort(key=lambda item: (item[0], item[1]), reverse=True)
+            found.extend(window)
+            # Earlier windows only hold older events.
+            if len(found) > limit:
+                break
+        return [segment.event(row) for _, _, row, segment in found[:limit]], len(found) > limit
+
+    def clear(self) -> None:
+        for start in list(self._starts):
+            self._drop(start)
+
+    def stats(self) -> Dict[str, Any]:
+        segments = [s for window in self._windows.values() for s in window.values()]
+        return dict(
+            self.metrics,
+            events=self.events,
+            windows=len(self._starts),
+            segments=len(segments),
+            bytes=sum(s.nbytes() for s in segments),
+        )
+
+
+store = EventStore(EVENT_SEGMENT_SECONDS, EVENT_RETENTION_SECONDS, EVENT_STORE_MAX_EVENTS)
+
+
+async def store_sink(events: List[Dict[str, Any]]) -> None:
+    """Event buffer sink adding a batch to :data:`store`."""
+    store.append(events)
@@ -0,0 +1,447 @@
+"""Registry state shared between Engine Control replicas through Redis.
+
+Each persisted registry is a map (engine id -> record, platform -> status,
+...) kept in one Redis hash. Every replica keeps its own in-memory copy of
+each map, so reads never leave the process. A write is applied locally
+first and then queued; one writer task stores queued writes in Redis in
+order. A Lua script stores each write, gives it the next shared version and
+publishes it with its new values in one step, so every replica receives
+the writes in version order and applies exactly those values within one
+pub/sub round trip.
+
+Replacing a whole map (the ``clear_*`` helpers) makes the other replicas
+reload that map. Every replica also reloads all maps after subscribing and
+every ``SHARED_STATE_RESYNC_SECONDS``, to catch up after missed messages.
+Keys with a local write still queued are left alone until it is stored,
+because that write will overwrite Redis anyway. A write that was also
+recorded in the durable store is only stored in Redis once it is on disk
+locally, and is dropped if the log fails to write it.
+
+Items :func:`attach`-ed while a change is applied are handed to the
+:func:`on_sequence` listener with that change's version once every earlier
+version has been applied here. The version counter and its epoch live in
+Redis, so they survive restarts and are the same on every replica.
+
+Shared mode is off until :func:`start` is called; writes are then no-ops.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import secrets
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from ..engine_logger import get_logger
+
+try:
+    import redis.asyncio as redis  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    redis = None  # type: ignore
+
+SHARED_STATE_REDIS_URL = os.getenv("SHARED_STATE_REDIS_URL", "")
+SHARED_STATE_RESYNC_SECONDS = float(os.getenv("SHARED_STATE_RESYNC_SECONDS", "300"))
+SHARED_STATE_WRITE_TIMEOUT_SECONDS = float(os.getenv("SHARED_STATE_WRITE_TIMEOUT_SECONDS", "5"))
+
+KEY_PREFIX = "engine_control:"
+CHANNEL = "engine_control:changes"
+VERSION_KEY = "engine_control:version"
+EPOCH_KEY = "engine_control:epoch"
+
+# Stores the write in ARGV[1] in the hash KEYS[1], bumps the version counter
+# KEYS[2] and publishes the write with its version on channel ARGV[2]. Being
+# one script, versions are published in order and never without the write.
+_STORE = """
+local message = cjson.decode(ARGV[1])
+if message['replace'] then
+    redis.call('del', KEYS[1])
+end
+for key, value in pairs(message['values']) do
+    redis.call('hset', KEYS[1], key, value)
+end
+local version = redis.call('incr', KEYS[2])
+redis.call('publish', ARGV[2], string.sub(ARGV[1], 1, -2) .. ',"version":' .. version .. '}')
+return version
+"""
+
+# Identifies this replica so it skips its own change messages.
+REPLICA_ID = secrets.token_hex(8)
+
+logger = get_logger(__name__)
+
+
+class _Map:
+    __slots__ = ("dump", "load", "apply")
+
+    def __init__(self, dump, load, apply) -> None:
+        self.dump = dump
+        self.load = load
+        self.apply = apply
+
+
+_maps: Dict[str, _Map] = {}
+
+_client = None
+_tasks: List["asyncio.Task"] = []
+# Queued writes: (name, mapping, replace, durable record future, future, write id)
+_queue: Deque[Tuple[str, Dict[str, Any], bool, Optional[Future], "asyncio.Future", int]] = deque()
+_wakeup: Optional[asyncio.Event] = None
+_last_write: Optional["asyncio.Future"] = None
+# Keys, and whole maps, with writes still queued
+_dirty_keys: Counter = Counter()
+_dirty_maps: Counter = Counter()
+_last_resync = 0.0
+# Redis version sequence, and the last version applied here in order
+_epoch: Optional[str] = None
+_version = 0
+_writes = 0
+# Items attached since the last change was queued or applied
+_attached: List[Any] = []
+# Items of this replica's own writes until their message comes back:
+# write id -> [items, version once stored]
+_own: Dict[int, List[Any]] = {}
+_sequence_listener: Optional[Callable[[Optional[str], int, List[Any], bool], None]] = None
+metrics = {"writes": 0, "dropped": 0, "invalidations": 0, "reloads": 0, "resyncs": 0, "failures": 0}
+
+
+def register_map(
+    name: str,
+    dump: Callable[[], Dict[str, Any]],
+    load: Callable[[Dict[str, Any]], None],
+    apply: Callable[[str, Any], None],
+) -> None:
+    """Register a registry map: ``dump`` copies it, ``load`` replaces it, ``apply`` sets one key."""
+    _maps[name] = _Map(dump, load, apply)
+
+
+def on_sequence(callback: Callable[[Optional[str], int, List[Any], bool], None]) -> None:
+    """Call ``callback(epoch, version, items, reset)`` as versions are applied here.
+
+    ``items`` were attached to the change with that version. ``reset`` means
+    the versions up to ``version`` were applied without being reported one
+    by one; ``epoch`` is then ``None`` if shared mode stopped.
+    """
+    global _sequence_listener
+    _sequence_listener = callback
+
+
+def attach(item: Any) -> bool:
+    """Attach ``item`` to the change being applied; return ``False`` outside shared mode."""
+    if _client is None:
+        return False
+    _attached.append(item)
+    return True
+
+
+def _take() -> List[Any]:
+    global _attached
+    items, _attached = _attached, []
+    return items
+
+
+def _sequenced(version: int, items: List[Any], reset: bool = False) -> None:
+    global _version
+    _version = version
+    if _sequence_listener is not None:
+        _sequence_listener(_epoch, version, items, reset)
+
+
+def is_enabled() -> bool:
+    return _client is not None
+
+
+def _hash(name: str) -> str:
+    return f"{KEY_PREFIX}{name}"
+
+
+def _enqueue(name: str, mapping: Dict[str, Any], replace: bool, after: Optional[Future]) -> None:
+    global _last_write, _writes
+    if _client is None:
+        return
+    future = asyncio.get_running_loop().create_future()
+    _writes += 1
+    _own[_writes] = [_take(), None]
+    _queue.append((name, dict(mapping), replace, after, future, _writes))
+    if replace:
+        _dirty_maps[name] += 1
+    else:
+        _dirty_keys.update((name, key) for key in mapping)
+    _last_write = future
+    _wakeup.set()
+
+
+def write(name: str, mapping: Dict[str, Any], after: Optional[Future] = None) -> None:
+    """Store the keys in ``mapping``, already applied locally, for every replica.
+
+    ``after`` is the durable record of the change; the write waits for it.
+    """
+    _enqueue(name, mapping, False, after)
+
+
+def replace(name: str, mapping: Dict[str, Any], after: Optional[Future] = None) -> None:
+    """Replace the whole map ``name``, already replaced locally, for every replica."""
+    _enqueue(name, mapping, True, after)
+
+
+async def committed() -> None:
+    """Wait until every write queued so far is in Redis.
+
+    Raises ``RuntimeError`` if that takes longer than
+    ``SHARED_STATE_WRITE_TIMEOUT_SECONDS``.
+    """
+    if _last_write is None or _last_write.done():
+        return
+    try:
+        await asyncio.wait_for(asyncio.shield(_last_write), SHARED_STATE_WRITE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise RuntimeError("Shared state write timed out") from None
+
+
+def _encode(mapping: Dict[str, Any]) -> Dict[str, str]:
+    return {key: json.dumps(value, separators=(",", ":")) for key, value in mapping.items()}
+
+
+async def _store(name: str, mapping: Dict[str, Any], replace: bool, write: int) -> int:
+    message = {
+        "origin": REPLICA_ID,
+        "write": write,
+        "map": name,
+        "replace": replace,
+        "values": _encode(mapping),
+    }
+    return int(
+        await _client.eval(
+            _STORE, 2, _hash(name), VERSION_KEY, json.dumps(message, separators=(",", ":")), CHANNEL
+        )
+    )
+
+
+def _release(counter: Counter, item: Any) -> None:
+    counter[item] -= 1
+    if counter[item] <= 0:
+        del counter[item]
+
+
+async def _write_loop() -> None:
+    while True:
+        await _wakeup.wait()
+        _wakeup.clear()
+        while _queue:
+            name, mapping, replace, after, future, write = _queue[0]
+            if after is not None:
+                try:
+                    await asyncio.shield(asyncio.wrap_future(after))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:
+                    # Not on disk locally, so never hand it to other replicas.
+                    metrics["dropped"] += 1
+                    logger.info("Shared state write dropped", extra={"map": name, "error": str(exc)})
+                    _own.pop(write, None)
+                    _finish(name, mapping, replace, future)
+                    continue
+                _queue[0] = (name, mapping, replace, None, future, write)
+            try:
+                version = await _store(name, mapping, replace, write)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                # Retried until it succeeds: later writes must not overtake it.
+                metrics["failures"] += 1
+                logger.info("Shared state write failed", extra={"map": name, "error": str(exc)})
+                await asyncio.sleep(1.0)
+                continue
+            metrics["writes"] += 1
+            if write in _own:
+                _own[write][1] = version
+            _finish(name, mapping, replace, future)
+
+
+def _finish(name: str, mapping: Dict[str, Any], replace: bool, future: "asyncio.Future") -> None:
+    _queue.popleft()
+    if replace:
+        _release(_dirty_maps, name)
+    for key in () if replace else mapping:
+        _release(_dirty_keys, (name, key))
+    if not future.done():
+        future.set_result(None)
+
+
+def _reload(name: str, remote: Dict[str, Any]) -> None:
+    if _dirty_maps[name]:
+        return
+    local = _maps[name].dump()
+    # Keep local values that are still on their way to Redis.
+    remote.update((key, value) for key, value in local.items() if (name, key) in _dirty_keys)
+    if set(local) - set(remote):
+        _maps[name].load(remote)
+    else:
+        for key, value in remote.items():
+            if local.get(key) != value:
+                _maps[name].apply(key, value)
+    metrics["reloads"] += 1
+
+
+def _invalidate(name: str, values: Dict[str, Any]) -> None:
+    if _dirty_maps[name]:
+        return
+    for key, value in values.items():
+        if (name, key) not in _dirty_keys:
+            _maps[name].apply(key, value)
+            metrics["invalidations"] += 1
+
+
+async def _resync(reset: bool) -> None:
+    global _epoch, _last_resync
+    names = list(_maps)
+    pipe = _client.pipeline(transaction=True)
+    pipe.set(EPOCH_KEY, secrets.token_hex(8), nx=True)
+    pipe.get(EPOCH_KEY)
+    pipe.get(VERSION_KEY)
+    for name in names:
+        pipe.hgetall(_hash(name))
+    _, epoch, version, *hashes = await pipe.execute()
+    version = int(version or 0)
+    for name, raw in zip(names, hashes):
+        _reload(name, {key: json.loads(value) for key, value in raw.items()})
+    _last_resync = time.monotonic()
+    metrics["resyncs"] += 1
+    # Changes found by the reload have no version of their own, and messages
+    # may have been missed: start again from the version read with the maps.
+    if _take() or reset or epoch != _epoch or version < _version:
+        _epoch = epoch
+        for write, (_, stored) in list(_own.items()):
+            if stored is not None and stored <= version:
+                del _own[write]
+        _sequenced(version, [], reset=True)
+
+
+async def resync() -> None:
+    """Reload every map from Redis."""
+    await _resync(reset=False)
+
+
+async def _handle(data: Any) -> None:
+    message = json.loads(data.decode() if isinstance(data, bytes) else data)
+    version = message["version"]
+    own = message.get("origin") == REPLICA_ID
+    items = _own.pop(message.get("write"), [[]])[0] if own else []
+    if version <= _version:
+        return
+    if version > _version + 1:
+        await _resync(reset=True)
+        return
+    name = message.get("map")
+    if not own and name in _maps:
+        values = {key: json.loads(value) for key, value in message["values"].items()}
+        if message["replace"]:
+            _reload(name, values)
+        else:
+            _invalidate(name, values)
+        items = _take()
+    _sequenced(version, items)
+
+
+async def _close(pubsub) -> None:
+    try:
+        await pubsub.unsubscribe(CHANNEL)
+        close = getattr(pubsub, "aclose", None) or pubsub.close
+        await close()
+    except Exception:  # pragma: no cover - connection already gone
+        pass
+
+
+async def _listen(ready: "asyncio.Future") -> None:
+    while True:
+        try:
+            pubsub = _client.pubsub()
+            await pubsub.subscribe(CHANNEL)
+            try:
+                # Subscribed first so nothing published during the reload is lost.
+                await _resync(reset=True)
+                if not ready.done():
+                    ready.set_result(None)
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=1.0
+                    )
+                    if message and message.get("type") == "message":
+                        await _handle(message["data"])
+                    if time.monotonic() - _last_resync >= SHARED_STATE_RESYNC_SECONDS:
+                        await resync()
+            finally:
+                await _close(pubsub)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            metrics["failures"] += 1
+            logger.info("Shared state listener error", extra={"error": str(exc)})
+            if not ready.done():
+                ready.set_exception(RuntimeError("Shared state unavailable"))
+            await asyncio.sleep(1.0)
+
+
+async def start(client=None) -> None:
+    """Load the shared maps and keep them in sync until :func:`stop`.
+
+    Connects to ``SHARED_STATE_REDIS_URL`` unless a ``client`` is given.
+    Raises ``RuntimeError`` when Redis cannot be reached.
+    """
+    global _client, _wakeup
+    if _client is not None:
+        return
+    if client is None:
+        if not redis:
+            raise RuntimeError("Redis package is not installed")
+        client = redis.from_url(SHARED_STATE_REDIS_URL, decode_responses=True)
+    _client = client
+    _wakeup = asyncio.Event()
+    ready = asyncio.get_running_loop().create_future()
+    _tasks.append(asyncio.create_task(_listen(ready)))
+    _tasks.append(asyncio.create_task(_write_loop()))
+    try:
+        await ready
+    except RuntimeError:
+        await stop()
+        raise
+
+
+async def stop() -> None:
+    """Store queued writes, then stop the listener and writer tasks."""
+    global _client, _last_write, _epoch
+    if _client is not None and _last_write is not None:
+        try:
+            await committed()
+        except RuntimeError:
+            logger.info("Shared state writes dropped on shutdown", extra={"queued": len(_queue)})
+    tasks = list(_tasks)
+    _tasks.clear()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _client = None
+    _last_write = None
+    _queue.clear()
+    _dirty_keys.clear()
+    _dirty_maps.clear()
+    _attached.clear()
+    _own.clear()
+    if _epoch is not None:
+        _epoch = None
+        _sequenced(_version, [], reset=True)
+
+
+def stats() -> Dict[str, Any]:
+    """Return write and invalidation counters."""
+    return dict(
+        metrics,
+        enabled=_client is not None,
+        queued=len(_queue),
+        replica=REPLICA_ID,
+        epoch=_epoch,
+        version=_version,
+    )
@@ -0,0 +1,40 @@
+"""Atomic snapshots of the Engine Control state.
+
+A snapshot is one JSON document holding the state of every persisted
+registry and the sequence number of the last log record it includes. It is
+written to a temporary file, flushed to disk and renamed over the previous
+snapshot, so a crash leaves either the old or the new snapshot in place.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, Optional
+
+from .wal import fsync_directory
+
+SNAPSHOT_NAME = "snapshot.json"
+
+
+def write_snapshot(directory: str, lsn: int, state: Dict[str, Any]) -> str:
+    """Write ``state`` as of ``lsn`` and return the snapshot path."""
+    path = os.path.join(directory, SNAPSHOT_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(json.dumps({"lsn": lsn, "state": state}, separators=(",", ":")).encode())
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+    fsync_directory(directory)
+    return path
+
+
+def read_snapshot(directory: str) -> Optional[Dict[str, Any]]:
+    """Return ``{"lsn", "state"}`` of the latest snapshot, or ``None``."""
+    path = os.path.join(directory, SNAPSHOT_NAME)
+    try:
+        with open(path, "rb") as handle:
+            return json.loads(handle.read())
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,200 @@
+"""Append-only write-ahead log with group-committed ``fsync``.
+
+Records are JSON lines. :meth:`WriteAheadLog.append` only queues the line
+and returns a future shared by every record in the same batch; a background
+thread writes the whole batch with one ``write`` and one ``fsync`` and then
+resolves the future. Many writers arriving together therefore cost a single
+disk flush, and callers that need durability wait on the future while the
+event loop keeps running.
+
+The log is split into segment files named after the sequence number of
+their first record, so segments made redundant by a snapshot can be
+deleted whole.
+
+A failed write stops the log: the failing batch and everything queued after
+it resolve with the error, and :meth:`WriteAheadLog.append` refuses new
+records. Nothing is ever written after a partial line, so the damage is
+confined to a torn tail that the next startup cuts off.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+SEGMENT_PREFIX = "wal-"
+SEGMENT_SUFFIX = ".log"
+
+
+def segment_name(first_lsn: int) -> str:
+    return f"{SEGMENT_PREFIX}{first_lsn:020d}{SEGMENT_SUFFIX}"
+
+
+def list_segments(directory: str) -> List[Tuple[int, str]]:
+    """Return ``(first_lsn, path)`` of every segment in ``directory``, oldest first."""
+    segments = []
+    for name in os.listdir(directory):
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+            first = int(name[len(SEGMENT_PREFIX) : -len(SEGMENT_SUFFIX)])
+            segments.append((first, os.path.join(directory, name)))
+    return sorted(segments)
+
+
+def scan_segment(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield ``(end_offset, record)`` for each record of a segment, stopping at a torn line."""
+    offset = 0
+    with open(path, "rb") as handle:
+        for line in handle:
+            if not line.endswith(b"\n"):
+                return
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return
+            offset += len(line)
+            yield offset, record
+
+
+def read_segment(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield the records of a segment, stopping at a torn line."""
+    for _, record in scan_segment(path):
+        yield record
+
+
+def truncate_segment(path: str, length: int) -> None:
+    """Cut a segment back to its first ``length`` bytes, durably."""
+    with open(path, "r+b") as handle:
+        handle.truncate(length)
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def fsync_directory(directory: str) -> None:
+    """Make renames and new files in ``directory`` durable."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:  # pragma: no cover - platforms without directory fds
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class _Rotate:
+    __slots__ = ("path",)
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+
+class WriteAheadLog:
+    """Segmented JSON-lines log written by one group-commit thread."""
+
+    def __init__(self, path: str, commit_delay: float = 0.0) -> None:
+        self.path = path
+        self.commit_delay = commit_delay
+        self._file = open(path, "ab")
+        fsync_directory(os.path.dirname(path) or ".")
+        self._cond = threading.Condition()
+        self._pending: List[Union[bytes, _Rotate]] = []
+        self._batch: Optional[Future] = None
+        self._last_batch: Future = Future()
+        self._last_batch.set_result(0)
+        self._closing = False
+        self.failed: Optional[BaseException] = None
+        self.metrics = {"records": 0, "batches": 0, "bytes": 0, "failed_batches": 0}
+        self._thread = threading.Thread(target=self._run, name="wal-commit", daemon=True)
+        self._thread.start()
+
+    def append(self, record: Dict[str, Any]) -> Future:
+        """Queue ``record``; the returned future resolves once it is on disk."""
+        line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+        return self._enqueue(line)
+
+    def rotate(self, path: str) -> Future:
+        """Continue in a new segment at ``path`` after the queued records."""
+        return self._enqueue(_Rotate(path))
+
+    def _enqueue(self, item: Union[bytes, _Rotate]) -> Future:
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("Write-ahead log is closed")
+            if self.failed is not None:
+                raise RuntimeError(f"Write-ahead log failed: {self.failed}")
+            self._pending.append(item)
+            if self._batch is None:
+                self._batch = self._last_batch = Future()
+            self._cond.notify()
+            return self._batch
+
+    def committed(self) -> Future:
+        """Return a future resolving once everything queued so far is on disk."""
+        with self._cond:
+            return self._last_batch
+
+    def _write(self, items: List[Union[bytes, _Rotate]]) -> int:
+        records = 0
+        chunk: List[bytes] = []
+        for item in items + [None]:
+            if isinstance(item, bytes):
+                chunk.append(item)
+                continue
+            if chunk:
+                data = b"".join(chunk)
+                self._file.write(data)
+                self.metrics["bytes"] += len(data)
+                records += len(chunk)
+                chunk = []
+            if isinstance(item, _Rotate):
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = open(item.path, "ab")
+                self.path = item.path
+                fsync_directory(os.path.dirname(item.path) or ".")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return records
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closing:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+            if self.commit_delay:
+                # Give concurrent writers a moment to join this batch.
+                time.sleep(self.commit_delay)
+            with self._cond:
+                items, batch = self._pending, self._batch
+                self._pending, self._batch = [], None
+            if self.failed is not None:
+                # Queued before the failure was seen; never write past it.
+                self.metrics["failed_batches"] += 1
+                batch.set_exception(RuntimeError(f"Write-ahead log failed: {self.failed}"))
+                continue
+            try:
+                records = self._write(items)
+            except Exception as exc:
+                with self._cond:
+                    self.failed = exc
+                self.metrics["failed_batches"] += 1
+                batch.set_exception(exc)
+                continue
+            self.metrics["records"] += records
+            self.metrics["batches"] += 1
+            batch.set_result(records)
+
+    def close(self) -> None:
+        """Write everything queued, then close the file."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self._thread.join()
+        self._file.close()
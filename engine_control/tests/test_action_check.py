@@ -16,3 +16,17 @@ async def test_action_check_denied_when_platform_down():
     assert result.content["allowed"] is False
     assert result.content["platform_status"] == "maintenance"
 
+
+
+@pytest.mark.asyncio
+async def test_action_checks_are_counted_in_metrics():
+    engine_registry.clear_engines()
+    platform_registry.clear_platforms()
+    token_resp = await main.register_engine_endpoint({"engine_id": "e3", "permissions": {"gmail": {"send": []}}}, x_engine_id="local", x_engine_key="local-key")
+    token = token_resp.content["engine_key"]
+    before = main.permission_checks_total.labels("allowed").value
+    await main.actions_check_endpoint({"engine_id": "e3", "platform": "gmail", "action_type": "send"}, x_engine_id="e3", x_engine_key=token)
+    assert main.permission_checks_total.labels("allowed").value == before + 1
+    text = (await main.metrics_endpoint()).content
+    assert "engine_control_registered_engines 1" in text
+    assert 'engine_control_permission_checks_total{result="allowed"}' in text
@@ -0,0 +1,28 @@
+import importlib
+
+import pytest
+
+main = importlib.import_module("engine_control.engine_api")
+from engine_control import engine_registry, platform_registry
+from shared import capability
+
+
+@pytest.mark.asyncio
+async def test_issued_capability_reflects_current_policy():
+    engine_registry.clear_engines()
+    platform_registry.clear_platforms()
+    key = engine_registry.register_engine("e1", {"gmail": {"send": ["mail.send"]}})
+    platform_registry.set_platform_status("slack", "maintenance")
+
+    resp = await main.issue_capability_endpoint(None, x_engine_id="e1", x_engine_key=key)
+    cap = capability.verify(resp.content["token"], main.CAPABILITY_SECRET)
+    assert cap.expires_at == resp.content["expires_at"]
+    for platform, action_type in [("gmail", "send"), ("gmail", "delete"), ("slack", "post")]:
+        expected = (
+            await main.actions_check_endpoint(
+                {"engine_id": "e1", "platform": platform, "action_type": action_type},
+                x_engine_id="e1",
+                x_engine_key=key,
+            )
+        ).content
+        assert cap.check(platform, action_type) == expected
@@ -0,0 +1,104 @@
+import asyncio
+import importlib
+from collections import deque
+
+import pytest
+
+main = importlib.import_module("engine_control.engine_api")
+from action_engine.auth.policy_replica import PolicyReplica
+from engine_control import change_feed, engine_registry, platform_registry
+
+HEADERS = {"x_engine_id": "local", "x_engine_key": "local-key"}
+
+
+def _reset():
+    engine_registry.clear_engines()
+    platform_registry.clear_platforms()
+
+
+@pytest.mark.asyncio
+async def test_deltas_after_a_version_and_full_snapshot_otherwise():
+    _reset()
+    engine_registry.register_engine("e1", {"gmail": {"send": []}})
+    full = (await main.policy_snapshot_endpoint(**HEADERS)).content
+    assert full["full"] is True
+    assert full["engines"]["e1"] == [["gmail", "send", [], False]]
+
+    platform_registry.set_platform_status("gmail", "maintenance")
+    # Re-registering with the same rules is not a change.
+    engine_registry.register_engine("e1", {"gmail": {"send": []}})
+    delta = (
+        await main.policy_snapshot_endpoint(since=full["version"], epoch=full["epoch"], **HEADERS)
+    ).content
+    assert delta["full"] is False
+    assert delta["changes"] == [
+        {"version": full["version"] + 1, "type": "platform", "id": "gmail", "value": "maintenance"}
+    ]
+
+    other_epoch = await main.policy_snapshot_endpoint(since=full["version"], epoch="old", **HEADERS)
+    assert other_epoch.content["full"] is True
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_full_snapshot_when_log_was_trimmed(monkeypatch):
+    _reset()
+    monkeypatch.setattr(change_feed, "_changes", deque(maxlen=2))
+    start = change_feed.current_version()
+    for i in range(5):
+        engine_registry.register_engine(f"e{i}", {"gmail": {"send": []}})
+    resp = await main.policy_snapshot_endpoint(since=start, epoch=change_feed.epoch(), **HEADERS)
+    assert resp.content["full"] is True
+    assert len(resp.content["engines"]) == 5
+
+
+@pytest.mark.asyncio
+async def test_long_poll_returns_on_change_or_timeout():
+    _reset()
+    version = change_feed.current_version()
+    empty = await main.policy_snapshot_endpoint(
+        since=version, epoch=change_feed.epoch(), wait=0.01, **HEADERS
+    )
+    assert empty.content["changes"] == []
+
+    async def change_later():
+        await asyncio.sleep(0.02)
+        platform_registry.set_platform_status("slack", "deprecated")
+
+    task = asyncio.create_task(change_later())
+    resp = await main.policy_snapshot_endpoint(
+        since=version, epoch=change_feed.epoch(), wait=5, **HEADERS
+    )
+    await task
+    assert [c["id"] for c in resp.content["changes"]] == ["slack"]
+
+
+@pytest.mark.asyncio
+async def test_action_engine_replica_follows_engine_control():
+    _reset()
+
+    async def fetch(since, epoch, wait):
+        resp = await main.policy_snapshot_endpoint(since=since, epoch=epoch, wait=wait, **HEADERS)
+        return resp.content
+
+    replica = PolicyReplica(wait_seconds=1.0, fetch=fetch)
+    engine_registry.register_engine("action", {"gmail": {"*": ["mail.all"]}})
+    replica.start()
+    try:
+        await asyncio.sleep(0.01)
+        assert replica.check("action", "gmail", "send_email")["allowed"] is True
+
+        platform_registry.set_platform_status("gmail", "maintenance")
+        engine_registry.register_engine("action", {"gmail": {"*": []}, "notion": {"create_task": []}})
+        await asyncio.sleep(0.01)
+        for platform, action_type in [("gmail", "send_email"), ("notion", "create_task"), ("zapier", "x")]:
+            expected = (
+                await main.actions_check_endpoint(
+                    {"engine_id": "action", "platform": platform, "action_type": action_type},
+                    **HEADERS,
+                )
+            ).content
+            assert replica.check("action", platform, action_type) == expected
+        assert replica.metrics["full_syncs"] == 1
+        assert replica.metrics["changes"] == 2
+    finally:
+        await replica.stop()
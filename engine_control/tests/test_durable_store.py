@@ -0,0 +1,287 @@
+import asyncio
+import importlib
+import os
+import threading
+
+import pytest
+
+from action_engine.tests.conftest import DummyHTTPException
+
+from engine_control import config, engine_config, engine_registry, permission_checker, platform_registry
+from engine_control.store import durable
+from engine_control.store.snapshot import read_snapshot
+from engine_control.store.wal import WriteAheadLog, list_segments, read_segment, segment_name
+
+
+engine_api = importlib.import_module("engine_control.engine_api")
+
+HEADERS = {"x_engine_id": "local", "x_engine_key": "local-key"}
+
+
+def _reset_memory():
+    engine_registry.clear_engines()
+    platform_registry.clear_platforms()
+    engine_config.clear_engine_configs()
+    config.clear_global_config()
+
+
+def _crash():
+    """Stop logging without the checkpoint a clean shutdown would write."""
+    durable._store.wal.close()
+    durable._store = None
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    _reset_memory()
+    yield str(tmp_path)
+    if durable.is_open():
+        durable.close_store()
+    _reset_memory()
+
+
+def test_state_survives_restart_from_log_only(data_dir):
+    durable.open_store(data_dir)
+    token = engine_registry.register_engine("e1", {"gmail": {"send": ["mail.send"]}}, ["e0"], ["slack.*"])
+    platform_registry.set_platform_status("gmail", "maintenance")
+    engine_config.set_engine_config("e1", {"retries": 3})
+    config.set_global_config({"feature_flags": {"beta": True}})
+    durable._store.wal.committed().result()
+    _crash()
+    _reset_memory()
+
+    restored = durable.open_store(data_dir)
+
+    assert restored["snapshot_lsn"] == 0
+    assert restored["replayed"] == 4
+    assert engine_registry.validate_engine("e1", token)
+    assert engine_registry.get_engine("e1")["depends_on"] == ["e0"]
+    assert platform_registry.get_platform_status("gmail") == "maintenance"
+    assert engine_config.get_engine_config("e1") == {"retries": 3}
+    assert config.get_global_config()["feature_flags"] == {"beta": True}
+    assert permission_checker.check("e1", "gmail", "send").platform_status == "maintenance"
+    platform_registry.set_platform_status("gmail", "active")
+    assert permission_checker.check("e1", "gmail", "send").allowed
+    assert not permission_checker.check("e1", "slack", "post").allowed
+
+
+def test_startup_loads_snapshot_and_replays_only_the_tail(data_dir):
+    durable.open_store(data_dir)
+    engine_registry.register_engine("e1", {"gmail": {"send": []}})
+    engine_registry.register_engine("e2", {"slack": {"post": []}})
+    assert durable.checkpoint() == 2
+    engine_registry.register_engine("e3", {"notion": {"create": []}})
+    durable._store.wal.committed().result()
+    _crash()
+    _reset_memory()
+
+    restored = durable.open_store(data_dir)
+
+    assert restored["snapshot_lsn"] == 2
+    assert restored["replayed"] == 1
+    assert set(engine_registry.list_engines()) == {"e1", "e2", "e3"}
+
+
+def test_checkpoint_removes_segments_it_covers(data_dir):
+    durable.open_store(data_dir)
+    for i in range(3):
+        engine_registry.register_engine(f"e{i}", {})
+    old_segments = list_segments(data_dir)
+    durable.checkpoint()
+
+    remaining = list_segments(data_dir)
+    assert read_snapshot(data_dir)["lsn"] == 3
+    assert [first for first, _ in remaining] == [4]
+    assert not set(old_segments) & set(remaining)
+
+
+def test_torn_final_record_is_ignored(data_dir):
+    durable.open_store(data_dir)
+    engine_registry.register_engine("e1", {})
+    durable._store.wal.committed().result()
+    path = durable._store.wal.path
+    _crash()
+    with open(path, "ab") as handle:
+        handle.write(b'{"lsn":2,"op":"engine.register","da')
+    _reset_memory()
+
+    restored = durable.open_store(data_dir)
+
+    assert restored["replayed"] == 1
+    assert restored["truncated_segments"] == 1
+    assert list(engine_registry.list_engines()) == ["e1"]
+    with open(path, "rb") as handle:
+        assert handle.read().endswith(b"}\n")
+
+
+def test_records_after_a_torn_only_segment_survive(data_dir):
+    durable.open_store(data_dir)
+    engine_registry.register_engine("a", {})
+    durable.checkpoint()
+    _crash()
+    # The next segment holds nothing but a torn first record; the reopened
+    # log continues in that same file.
+    torn = os.path.join(data_dir, segment_name(2))
+    with open(torn, "wb") as handle:
+        handle.write(b'{"lsn":2,"op":"engine.reg')
+    _reset_memory()
+    durable.open_store(data_dir)
+    assert durable._store.wal.path == torn
+    engine_registry.register_engine("b", {})
+    durable._store.wal.committed().result()
+    _crash()
+    _reset_memory()
+
+    restored = durable.open_store(data_dir)
+
+    assert restored["replayed"] == 1
+    assert set(engine_registry.list_engines()) == {"a", "b"}
+
+
+def test_gap_in_log_fails_startup(data_dir):
+    durable.open_store(data_dir)
+    for engine_id in ("e1", "e2", "e3"):
+        engine_registry.register_engine(engine_id, {})
+    durable._store.wal.committed().result()
+    path = durable._store.wal.path
+    _crash()
+    with open(path, "rb") as handle:
+        lines = handle.readlines()
+    with open(path, "wb") as handle:
+        handle.writelines([lines[0], lines[2]])
+    _reset_memory()
+
+    with pytest.raises(RuntimeError, match="missing records 2 to 2"):
+        durable.open_store(data_dir)
+
+
+def test_clean_shutdown_writes_a_snapshot(data_dir):
+    durable.open_store(data_dir)
+    engine_registry.register_engine("e1", {})
+    durable.close_store()
+    _reset_memory()
+
+    restored = durable.open_store(data_dir)
+
+    assert restored["replayed"] == 0
+    assert engine_registry.get_engine("e1") is not None
+
+
+def test_group_commit_shares_one_fsync_per_batch(tmp_path):
+    wal = WriteAheadLog(os.path.join(str(tmp_path), "wal.log"), commit_delay=0.05)
+    futures = [wal.append({"lsn": i}) for i in range(100)]
+    assert all(f.result(timeout=5) for f in futures)
+    wal.close()
+
+    assert wal.metrics["records"] == 100
+    assert wal.metrics["batches"] < 100
+    assert [r["lsn"] for r in read_segment(wal.path)] == list(range(100))
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_taken_in_background_after_threshold(data_dir, monkeypatch):
+    monkeypatch.setattr(durable, "STORE_SNAPSHOT_EVERY", 5)
+    durable.open_store(data_dir)
+    for i in range(5):
+        engine_registry.register_engine(f"e{i}", {})
+    await durable.committed()
+    for _ in range(100):
+        if not durable._store.checkpointing:
+            break
+        await asyncio.sleep(0.01)
+
+    assert durable.stats()["snapshot_lsn"] == 5
+    assert len(read_snapshot(data_dir)["state"]["engines"]) == 5
+
+
+def test_write_failure_stops_the_log(tmp_path):
+    wal = WriteAheadLog(os.path.join(str(tmp_path), "wal.log"))
+    assert wal.append({"lsn": 1}).result(timeout=5) == 1
+    write = wal._write
+
+    def fail_once(items):
+        wal._write = write
+        wal._file.write(b'{"lsn":2,"op"')
+        raise OSError("disk full")
+
+    wal._write = fail_once
+    with pytest.raises(OSError):
+        wal.append({"lsn": 2}).result(timeout=5)
+    with pytest.raises(RuntimeError, match="disk full"):
+        wal.append({"lsn": 3})
+    wal.close()
+
+    with open(wal.path, "rb") as handle:
+        assert handle.read() == b'{"lsn":1}\n{"lsn":2,"op"'
+    assert wal.metrics["failed_batches"] == 1
+
+
+@pytest.mark.asyncio
+async def test_registration_rolled_back_and_refused_after_write_failure(data_dir):
+    durable.open_store(data_dir)
+    resp = await engine_api.register_engine_endpoint(
+        {"engine_id": "a", "permissions": {"gmail": {"send": []}}}, **HEADERS
+    )
+    key = resp.content["engine_key"]
+
+    def fail(items):
+        raise OSError("disk full")
+
+    durable._store.wal._write = fail
+    with pytest.raises(DummyHTTPException) as exc:
+        await engine_api.register_engine_endpoint(
+            {"engine_id": "b", "permissions": {"slack": {"post": []}}, "depends_on": ["a"]}, **HEADERS
+        )
+    assert exc.value.status_code == 503
+    assert engine_registry.get_engine("b") is None
+    assert not permission_checker.check("b", "slack", "post").allowed
+
+    with pytest.raises(DummyHTTPException) as exc:
+        await engine_api.register_engine_endpoint({"engine_id": "a", "permissions": {}}, **HEADERS)
+    assert exc.value.status_code == 503
+    assert engine_registry.validate_engine("a", key)
+    assert not durable.stats()["writable"]
+
+    durable.close_store()
+    _reset_memory()
+    durable.open_store(data_dir)
+    assert list(engine_registry.list_engines()) == ["a"]
+    assert engine_registry.validate_engine("a", key)
+
+
+@pytest.mark.asyncio
+async def test_registration_waits_only_for_its_own_record(data_dir):
+    durable.open_store(data_dir)
+    wal = durable._store.wal
+    write = wal._write
+    release = threading.Event()
+    batches = []
+
+    def first_commits_second_fails(items):
+        batches.append(items)
+        if len(batches) == 1:
+            release.wait(5)
+            return write(items)
+        raise OSError("disk full")
+
+    wal._write = first_commits_second_fails
+    first = asyncio.ensure_future(
+        engine_api.register_engine_endpoint({"engine_id": "a", "permissions": {}}, **HEADERS)
+    )
+    await asyncio.sleep(0.02)
+    # Queued while the first batch is being written, so it lands in the next one.
+    _, second = engine_registry.register_engine_recorded("b", {})
+    release.set()
+
+    resp = await asyncio.wait_for(first, 5)
+    key = resp.content["engine_key"]
+    with pytest.raises(OSError):
+        await durable.stored(second)
+    with pytest.raises(OSError):
+        await durable.committed()
+
+    durable.close_store()
+    _reset_memory()
+    durable.open_store(data_dir)
+    assert list(engine_registry.list_engines()) == ["a"]
+    assert engine_registry.validate_engine("a", key)
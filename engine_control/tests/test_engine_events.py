@@ -0,0 +1,131 @@
+import asyncio
+import importlib
+import json
+
+import pytest
+
+main = importlib.import_module("engine_control.engine_api")
+from action_engine.tests.conftest import DummyRequest
+from engine_control import event_buffer
+from engine_control.event_buffer import EventBuffer, file_sink
+
+HEADERS = {"x_engine_id": "local", "x_engine_key": "local-key"}
+
+
+class Collector:
+    def __init__(self):
+        self.batches = []
+
+    async def __call__(self, events):
+        self.batches.append(list(events))
+
+
+@pytest.fixture
+def collector(monkeypatch):
+    sink = Collector()
+    monkeypatch.setattr(event_buffer, "buffer", EventBuffer(capacity=5, batch_size=2, sink=sink))
+    return sink
+
+
+@pytest.mark.asyncio
+async def test_json_array_and_ndjson_are_queued(collector):
+    body = json.dumps([{"type": "a"}, {"type": "b"}]).encode()
+    resp = await main.log_engine_events_endpoint(DummyRequest(body), **HEADERS)
+    assert resp.status_code == 202
+    assert resp.content == {"accepted": 2}
+
+    ndjson = b'{"type": "c"}\n\n{"type": "d"}\n'
+    request = DummyRequest(ndjson, {"Content-Type": "application/x-ndjson"})
+    assert (await main.log_engine_events_endpoint(request, **HEADERS)).content == {"accepted": 2}
+
+    assert await event_buffer.buffer.flush() == 4
+    assert collector.batches[0][0]["engine_id"] == "local"
+    assert [[e["data"]["type"] for e in batch] for batch in collector.batches] == [["a", "b"], ["c", "d"]]
+
+
+@pytest.mark.asyncio
+async def test_invalid_payloads_are_rejected(collector, monkeypatch):
+    for body in (b'{"type": "a"}', b"[1, 2]", b"not json"):
+        with pytest.raises(Exception) as exc:
+            await main.log_engine_events_endpoint(DummyRequest(body), **HEADERS)
+        assert exc.value.status_code == 400
+
+    monkeypatch.setattr(main, "ENGINE_EVENTS_MAX_BATCH", 1)
+    with pytest.raises(Exception) as exc:
+        await main.log_engine_events_endpoint(DummyRequest(b"[{}, {}]"), **HEADERS)
+    assert exc.value.status_code == 413
+    assert len(event_buffer.buffer) == 0
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_answers_429_with_retry_after(collector):
+    await main.log_engine_events_endpoint(DummyRequest(b"[{}, {}, {}, {}]"), **HEADERS)
+    with pytest.raises(Exception) as exc:
+        await main.log_engine_events_endpoint(DummyRequest(b"[{}, {}]"), **HEADERS)
+    assert exc.value.status_code == 429
+    assert exc.value.headers == {"Retry-After": "1"}
+    # Nothing from a refused request is kept.
+    assert len(event_buffer.buffer) == 4
+    assert (await main.log_engine_event_endpoint({"one": 1}, **HEADERS)).content == {"status": "logged"}
+
+
+@pytest.mark.asyncio
+async def test_background_flush_retries_failed_batches_in_order():
+    delivered, failures = [], []
+
+    async def flaky(events):
+        if not failures:
+            failures.append(1)
+            raise IOError("sink down")
+        delivered.extend(e["n"] for e in events)
+
+    buffer = EventBuffer(capacity=100, batch_size=3, flush_seconds=0.01, sink=flaky, retry_seconds=0.01)
+    buffer.start()
+    assert buffer.offer([{"n": i} for i in range(7)])
+    for _ in range(200):
+        if len(delivered) == 7:
+            break
+        await asyncio.sleep(0.005)
+    await buffer.stop()
+
+    assert delivered == list(range(7))
+    assert buffer.stats()["failures"] == 1
+    assert buffer.stats()["batches"] == 3
+
+
+@pytest.mark.asyncio
+async def test_sinks_that_succeeded_do_not_get_a_retried_batch_again(monkeypatch):
+    received = {"first": [], "second": []}
+    failures = []
+
+    async def first(events):
+        received["first"].extend(e["n"] for e in events)
+
+    async def second(events):
+        if not failures:
+            failures.append(1)
+            raise IOError("sink down")
+        received["second"].extend(e["n"] for e in events)
+
+    monkeypatch.setitem(event_buffer._SINKS, "first", lambda: first)
+    monkeypatch.setitem(event_buffer._SINKS, "second", lambda: second)
+    buffer = EventBuffer(capacity=100, batch_size=10, sink=event_buffer.make_sink("first,second"))
+    buffer.offer([{"n": 0}, {"n": 1}])
+    with pytest.raises(IOError):
+        await buffer.flush()
+    buffer.offer([{"n": 2}])
+    await buffer.flush()
+    buffer.offer([{"n": 3}])
+    await buffer.flush()
+
+    assert received == {"first": [0, 1, 2, 3], "second": [0, 1, 2, 3]}
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_to_file_sink(tmp_path):
+    path = tmp_path / "events.jsonl"
+    buffer = EventBuffer(capacity=10, batch_size=10, flush_seconds=60, sink=file_sink(str(path)))
+    buffer.start()
+    buffer.offer([{"n": 1}, {"n": 2}])
+    await buffer.stop()
+    assert [json.loads(line) for line in path.read_text().splitlines()] == [{"n": 1}, {"n": 2}]
@@ -0,0 +1,125 @@
+import importlib
+import json
+import time
+
+import pytest
+
+main = importlib.import_module("engine_control.engine_api")
+from action_engine.tests.conftest import DummyRequest
+from engine_control import event_buffer
+from engine_control.store import event_store
+from engine_control.store.event_store import EventStore
+
+HEADERS = {"x_engine_id": "local", "x_engine_key": "local-key"}
+T0 = time.time() // 60 * 60
+
+
+def _events(engine_id, times, event_type="action"):
+    return [
+        {"engine_id": engine_id, "received_at": t, "data": {"type": event_type, "n": i}}
+        for i, t in enumerate(times)
+    ]
+
+
+def test_query_filters_by_time_engine_and_type():
+    store = EventStore(segment_seconds=60, retention_seconds=1e12)
+    store.append(_events("a", [T0 + i for i in range(0, 300, 10)]))
+    store.append(_events("b", [T0 + i for i in range(5, 300, 10)], "error"))
+
+    events, more = store.query(T0 + 50, T0 + 130, limit=100)
+    assert [e["received_at"] - T0 for e in events] == list(range(125, 45, -5))
+    assert not more
+
+    events, _ = store.query(T0, T0 + 300, engine_id="b", limit=100)
+    assert {e["engine_id"] for e in events} == {"b"} and len(events) == 30
+    events, _ = store.query(T0, T0 + 300, event_type="error", limit=100)
+    assert {e["type"] for e in events} == {"error"} and len(events) == 30
+    assert store.query(T0, T0 + 300, engine_id="a", event_type="error")[0] == []
+    assert store.query(T0, T0 + 300, event_type="missing")[0] == []
+
+    newest, more = store.query(T0, T0 + 300, engine_id="a", limit=3)
+    assert [e["data"]["n"] for e in newest] == [29, 28, 27]
+    assert more
+
+
+def test_out_of_order_events_are_still_found():
+    store = EventStore(segment_seconds=60, retention_seconds=1e12)
+    store.append(_events("a", [T0 + 5, T0 + 1, T0 + 3]))
+    events, _ = store.query(T0 + 2, T0 + 10)
+    assert [e["received_at"] - T0 for e in events] == [5, 3]
+
+
+def test_expired_windows_are_dropped_whole():
+    store = EventStore(segment_seconds=60, retention_seconds=120, max_events=1000)
+    store.append(_events("a", [T0 + i for i in range(0, 300, 30)]))
+    windows = store.stats()["windows"]
+
+    assert store.expire(now=T0 + 300) == 3
+    assert store.stats()["windows"] == windows - 3
+    assert min(e["received_at"] for e in store.query(T0, T0 + 300)[0]) == T0 + 180
+
+    small = EventStore(segment_seconds=60, retention_seconds=1e12, max_events=4)
+    small.append(_events("a", [T0 + i for i in range(0, 180, 30)]))
+    assert small.events == 4
+    assert small.stats()["dropped_windows"] == 1
+
+
+@pytest.mark.asyncio
+async def test_ingested_events_are_queryable(monkeypatch):
+    store = EventStore(segment_seconds=60, retention_seconds=3600)
+    monkeypatch.setattr(event_store, "store", store)
+    monkeypatch.setattr(
+        event_buffer, "buffer", event_buffer.EventBuffer(sink=event_buffer.make_sink("log,store"))
+    )
+    body = json.dumps([{"type": "action.completed", "id": 1}, {"type": "error", "id": 2}]).encode()
+    await main.log_engine_events_endpoint(DummyRequest(body), **HEADERS)
+    await event_buffer.buffer.flush()
+
+    resp = await main.log_events_query_endpoint(engine_id="local", type="error", **HEADERS)
+    assert [e["data"] for e in resp.content["events"]] == [{"type": "error", "id": 2}]
+    assert resp.content["more"] is False
+
+    with pytest.raises(Exception) as exc:
+        await main.log_events_query_endpoint(limit=0, **HEADERS)
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_paging_returns_events_sharing_a_timestamp_once(monkeypatch):
+    store = EventStore(segment_seconds=60, retention_seconds=1e12)
+    monkeypatch.setattr(event_store, "store", store)
+    store.append(_events("a", [T0 + 1] * 10 + [T0]))
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        resp = await main.log_events_query_endpoint(since=T0, until=T0 + 2, limit=4, cursor=cursor, **HEADERS)
+        seen += [e["data"]["n"] for e in resp.content["events"]]
+        pages += 1
+        cursor = resp.content["cursor"]
+        if not resp.content["more"]:
+            assert cursor is None
+            break
+    assert seen == list(range(9, -1, -1)) + [10]
+    assert pages == 3
+
+    with pytest.raises(Exception) as exc:
+        await main.log_events_query_endpoint(cursor="not a cursor", **HEADERS)
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_paging_a_default_query_keeps_its_window(monkeypatch):
+    store = EventStore(segment_seconds=60, retention_seconds=1e12)
+    monkeypatch.setattr(event_store, "store", store)
+    now = time.time()
+    # One event just outside the default ten minutes, five inside it.
+    store.append(_events("a", [now - 900] + [now - 590 + i for i in range(5)]))
+
+    seen, cursor = [], None
+    while True:
+        resp = await main.log_events_query_endpoint(limit=2, cursor=cursor, **HEADERS)
+        seen += [e["data"]["n"] for e in resp.content["events"]]
+        cursor = resp.content["cursor"]
+        if not resp.content["more"]:
+            break
+    assert seen == [5, 4, 3, 2, 1]
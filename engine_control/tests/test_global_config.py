@@ -1,4 +1,6 @@
 import importlib
+import json
+
 import pytest
 
 main = importlib.import_module("engine_control.engine_api")
@@ -10,5 +12,5 @@ async def test_global_config_endpoint():
     config.set_global_config({"feature_flags": {"x": True}})
     resp = await main.global_config_endpoint(x_engine_id="local", x_engine_key="local-key")
     assert resp.status_code == 200
-    assert resp.content["feature_flags"] == {"x": True}
+    assert json.loads(resp.content)["feature_flags"] == {"x": True}
 
@@ -0,0 +1,78 @@
+import importlib
+
+import pytest
+from fastapi import HTTPException
+
+main = importlib.import_module("engine_control.engine_api")
+from engine_control import engine_registry, permission_checker, platform_registry
+
+
+def _reset():
+    engine_registry.clear_engines()
+    platform_registry.clear_platforms()
+
+
+def test_index_is_recompiled_only_on_changes():
+    _reset()
+    engine_registry.register_engine("a", {"gmail": {"send": ["mail.send"]}})
+    engine_registry.register_engine("b", {"slack": {"post": []}})
+    compiles = permission_checker.stats()["compiles"]
+
+    # Re-registering with identical permissions keeps the compiled entry.
+    engine_registry.register_engine("a", {"gmail": {"send": ["mail.send"]}})
+    platform_registry.set_platform_status("gmail", "active")
+    assert permission_checker.stats()["compiles"] == compiles
+
+    # A status change only recompiles engines with grants on that platform.
+    platform_registry.set_platform_status("gmail", "maintenance")
+    assert permission_checker.stats()["compiles"] == compiles + 1
+    assert permission_checker.is_action_allowed("a", "gmail", "send") == {
+        "allowed": False,
+        "required_scopes": [],
+        "platform_status": "maintenance",
+    }
+    platform_registry.clear_platforms()
+    assert permission_checker.check("a", "gmail", "send").allowed is True
+
+
+def test_compiled_entries_are_read_only():
+    _reset()
+    permissions = {"gmail": {"send": ["mail.send"]}}
+    engine_registry.register_engine("a", permissions)
+    permissions["gmail"]["delete"] = []
+    assert permission_checker.check("a", "gmail", "delete").allowed is False
+    with pytest.raises(TypeError):
+        permission_checker._engines["a"].decisions[("gmail", "x")] = None
+
+
+@pytest.mark.asyncio
+async def test_check_batch_returns_results_in_order():
+    _reset()
+    engine_registry.register_engine("a", {"gmail": {"send": ["mail.send"]}, "slack": {"post": []}})
+    platform_registry.set_platform_status("slack", "deprecated")
+    checks = [
+        {"engine_id": "a", "platform": "gmail", "action_type": "send"},
+        {"engine_id": "a", "platform": "slack", "action_type": "post"},
+        {"engine_id": "missing", "platform": "gmail", "action_type": "send"},
+        {"engine_id": "a", "platform": "gmail"},
+    ] + [{"engine_id": "a", "platform": "gmail", "action_type": "send"}] * 300
+    resp = await main.actions_check_batch_endpoint(
+        {"checks": checks}, x_engine_id="local", x_engine_key="local-key"
+    )
+    results = resp.content["results"]
+    assert len(results) == len(checks)
+    assert results[0] == {"allowed": True, "required_scopes": ["mail.send"], "platform_status": "active"}
+    assert results[1] == {"allowed": False, "required_scopes": [], "platform_status": "deprecated"}
+    assert results[2]["allowed"] is False
+    assert results[3] == {"error": "Invalid payload"}
+    assert all(r == results[0] for r in results[4:])
+
+
+@pytest.mark.asyncio
+async def test_check_batch_rejects_oversized_batches(monkeypatch):
+    monkeypatch.setattr(main, "CHECK_BATCH_MAX", 2)
+    with pytest.raises(HTTPException) as exc:
+        await main.actions_check_batch_endpoint(
+            {"checks": [{}] * 3}, x_engine_id="local", x_engine_key="local-key"
+        )
+    assert exc.value.status_code == 413
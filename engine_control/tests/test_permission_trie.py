@@ -0,0 +1,85 @@
+import importlib
+
+import pytest
+from fastapi import HTTPException
+
+main = importlib.import_module("engine_control.engine_api")
+from engine_control import engine_registry, permission_checker, platform_registry
+from shared.permission_trie import PermissionTrie
+
+
+def test_most_specific_allow_rule_provides_scopes():
+    trie = PermissionTrie.build(
+        {
+            "*": {"read_*": ["any.read"]},
+            "gmail": {"*": ["mail.all"], "read_*": ["mail.read"], "read_inbox": ["mail.inbox"]},
+        }
+    )
+    assert trie.match("gmail", "read_inbox").scopes == ("mail.inbox",)
+    assert trie.match("gmail", "read_labels").scopes == ("mail.read",)
+    assert trie.match("gmail", "send").scopes == ("mail.all",)
+    assert trie.match("slack", "read_channel").scopes == ("any.read",)
+    assert trie.match("slack", "post") is None
+
+
+def test_deny_overrides_more_specific_allow():
+    trie = PermissionTrie.build({"gmail": {"delete_all": ["x"], "*": []}}, deny=["*.delete_*"])
+    assert trie.match("gmail", "delete_all").deny is True
+    assert trie.match("gmail", "send").deny is False
+
+
+@pytest.mark.parametrize("deny", [["gmail"], ["gm*il.send"]])
+def test_malformed_patterns_are_rejected(deny):
+    with pytest.raises(ValueError):
+        PermissionTrie.build({}, deny=deny)
+
+
+@pytest.mark.asyncio
+async def test_wildcard_grants_through_check_endpoint():
+    engine_registry.clear_engines()
+    platform_registry.clear_platforms()
+    await main.register_engine_endpoint(
+        {
+            "engine_id": "w",
+            "permissions": {"gmail": {"*": ["mail.all"]}},
+            "deny": ["gmail.delete_*"],
+        },
+        x_engine_id="local",
+        x_engine_key="local-key",
+    )
+
+    async def _check(action_type):
+        resp = await main.actions_check_endpoint(
+            {"engine_id": "w", "platform": "gmail", "action_type": action_type},
+            x_engine_id="local",
+            x_engine_key="local-key",
+        )
+        return resp.content
+
+    assert await _check("send_email") == {
+        "allowed": True,
+        "required_scopes": ["mail.all"],
+        "platform_status": "active",
+    }
+    assert (await _check("delete_thread"))["allowed"] is False
+    platform_registry.set_platform_status("gmail", "maintenance")
+    assert await _check("send_email") == {
+        "allowed": False,
+        "required_scopes": [],
+        "platform_status": "maintenance",
+    }
+
+
+@pytest.mark.asyncio
+async def test_register_rejects_bad_patterns_and_keeps_index():
+    engine_registry.clear_engines()
+    platform_registry.clear_platforms()
+    engine_registry.register_engine("w", {"gmail": {"send": []}})
+    with pytest.raises(HTTPException) as exc:
+        await main.register_engine_endpoint(
+            {"engine_id": "w", "permissions": {"gm*il": {"send": []}}},
+            x_engine_id="local",
+            x_engine_key="local-key",
+        )
+    assert exc.value.status_code == 400
+    assert permission_checker.check("w", "gmail", "send").allowed is True
@@ -1,4 +1,6 @@
 import importlib
+import json
+
 import pytest
 
 main = importlib.import_module("engine_control.engine_api")
@@ -11,5 +13,5 @@ async def test_platforms_list_endpoint():
     platform_registry.set_platform_status("slack", "maintenance")
     resp = await main.platforms_list_endpoint(x_engine_id="local", x_engine_key="local-key")
     assert resp.status_code == 200
-    assert resp.content == {"platforms": {"gmail": "active", "slack": "maintenance"}}
+    assert json.loads(resp.content) == {"platforms": {"gmail": "active", "slack": "maintenance"}}
 
@@ -0,0 +1,97 @@
+import importlib
+
+import pytest
+
+main = importlib.import_module("engine_control.engine_api")
+from engine_control import dependency_graph, engine_registry, platform_registry
+
+HEADERS = {"x_engine_id": "local", "x_engine_key": "local-key"}
+
+
+@pytest.fixture(autouse=True)
+def _reset():
+    engine_registry.clear_engines()
+    platform_registry.clear_platforms()
+    yield
+    engine_registry.clear_engines()
+    platform_registry.clear_platforms()
+
+
+def _ready(engine_id):
+    return dependency_graph.readiness(engine_id)["ready"]
+
+
+def test_readiness_follows_dependencies_and_platforms():
+    engine_registry.register_engine("app", {"slack": {"post": []}}, depends_on=["vault", "action"])
+    engine_registry.register_engine("action", {"gmail": {"send": []}}, depends_on=["vault"])
+    assert dependency_graph.readiness("app")["waiting_on"] == ["action", "vault"]
+    assert dependency_graph.readiness("vault")["registered"] is False
+
+    engine_registry.register_engine("vault", {})
+    assert _ready("vault") and _ready("action") and _ready("app")
+
+    platform_registry.set_platform_status("gmail", "maintenance")
+    assert not _ready("action") and not _ready("app") and _ready("vault")
+    assert dependency_graph.readiness("action")["unavailable_platforms"] == {"gmail": "maintenance"}
+    assert dependency_graph.readiness("app")["waiting_on"] == ["action"]
+
+    platform_registry.set_platform_status("gmail", "active")
+    assert _ready("app")
+
+    # Re-registering without the dependency drops it.
+    engine_registry.register_engine("vault", {"gmail": {"read": []}})
+    platform_registry.set_platform_status("gmail", "deprecated")
+    engine_registry.register_engine("app", {"slack": {"post": []}})
+    assert _ready("app") and not _ready("vault")
+
+
+def test_cycles_are_refused():
+    engine_registry.register_engine("a", {}, depends_on=["b"])
+    engine_registry.register_engine("b", {}, depends_on=["c"])
+    with pytest.raises(ValueError, match="c -> a -> b -> c"):
+        engine_registry.register_engine("c", {}, depends_on=["a"])
+    with pytest.raises(ValueError):
+        engine_registry.register_engine("d", {}, depends_on=["d"])
+    assert engine_registry.get_engine("c") is None
+    assert dependency_graph.readiness("c")["registered"] is False
+
+
+def test_changes_touch_only_the_affected_subgraph():
+    engine_registry.register_engine("root", {"gmail": {"send": []}})
+    for i in range(100):
+        engine_registry.register_engine(f"chain{i}", {}, depends_on=[f"chain{i - 1}" if i else "root"])
+    for i in range(1000):
+        engine_registry.register_engine(f"other{i}", {"slack": {"post": []}})
+    assert _ready("chain99")
+
+    before = dependency_graph.stats()["touched"]
+    platform_registry.set_platform_status("gmail", "maintenance")
+    assert not _ready("chain99")
+    assert dependency_graph.stats()["touched"] - before == 101
+
+    before = dependency_graph.stats()["touched"]
+    engine_registry.register_engine("chain50", {}, depends_on=["chain49"])
+    # Its readiness did not change, so nothing past it is revisited.
+    assert dependency_graph.stats()["touched"] - before == 1
+
+
+@pytest.mark.asyncio
+async def test_readiness_endpoint():
+    resp = await main.register_engine_endpoint(
+        {"engine_id": "app", "depends_on": ["vault"]}, **HEADERS
+    )
+    assert resp.status_code == 200
+    resp = await main.engine_readiness_endpoint("app", **HEADERS)
+    assert resp.content == {
+        "engine_id": "app",
+        "ready": False,
+        "registered": True,
+        "unavailable_platforms": {},
+        "waiting_on": ["vault"],
+    }
+    with pytest.raises(Exception) as exc:
+        await main.register_engine_endpoint({"engine_id": "vault", "depends_on": ["app"]}, **HEADERS)
+    assert exc.value.status_code == 400
+    with pytest.raises(Exception) as exc:
+        await main.engine_readiness_endpoint("nobody", **HEADERS)
+    assert exc.value.status_code == 404
@@ -0,0 +1,214 @@
+import asyncio
+import importlib
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from engine_control.tests.conftest import DummyRedis
+
+HEADERS = {"x_engine_id": "local", "x_engine_key": "local-key"}
+
+
+def _is_engine_control(name):
+    return name == "engine_control" or name.startswith("engine_control.")
+
+
+def _load_replica():
+    """Import a separate copy of engine_control, standing in for another process."""
+    saved = {name: module for name, module in sys.modules.items() if _is_engine_control(name)}
+    for name in saved:
+        del sys.modules[name]
+    try:
+        for name in ("engine_api", "engine_config"):
+            importlib.import_module(f"engine_control.{name}")
+        modules = {name: module for name, module in sys.modules.items() if _is_engine_control(name)}
+    finally:
+        for name in [name for name in sys.modules if _is_engine_control(name)]:
+            del sys.modules[name]
+        sys.modules.update(saved)
+    return SimpleNamespace(
+        **{name.rsplit(".", 1)[-1]: module for name, module in modules.items() if name.count(".") <= 2}
+    )
+
+
+async def _until(condition, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "change did not reach the replica"
+        await asyncio.sleep(0.002)
+
+
+@pytest.mark.asyncio
+async def test_writes_reach_every_replica():
+    redis = DummyRedis()
+    a, b = _load_replica(), _load_replica()
+    await a.shared.start(redis)
+    await b.shared.start(redis)
+    try:
+        resp = await a.engine_api.register_engine_endpoint(
+            {"engine_id": "mailer", "permissions": {"gmail": {"send": ["mail.send"]}}}, **HEADERS
+        )
+        key = resp.content["engine_key"]
+        # Stored in Redis before the key is returned.
+        assert "mailer" in redis.store["engine_control:engines"]
+
+        await _until(lambda: b.engine_registry.validate_engine("mailer", key))
+        assert b.permission_checker.check("mailer", "gmail", "send").allowed
+
+        b.platform_registry.set_platform_status("gmail", "maintenance")
+        b.config.set_global_config({"feature_flags": {"beta": True}})
+        b.engine_config.set_engine_config("mailer", {"retries": 2})
+        await _until(lambda: a.platform_registry.get_platform_status("gmail") == "maintenance")
+        await _until(lambda: a.engine_config.get_engine_config("mailer") == {"retries": 2})
+        assert a.config.get_global_config()["feature_flags"] == {"beta": True}
+        assert not a.permission_checker.check("mailer", "gmail", "send").allowed
+
+        a.engine_registry.clear_engines()
+        await _until(lambda: b.engine_registry.get_engine("mailer") is None)
+        assert not b.permission_checker.check("mailer", "gmail", "send").allowed
+    finally:
+        await a.shared.stop()
+        await b.shared.stop()
+
+
+@pytest.mark.asyncio
+async def test_new_replica_loads_existing_state():
+    redis = DummyRedis()
+    a, c = _load_replica(), _load_replica()
+    await a.shared.start(redis)
+    try:
+        token = a.engine_registry.register_engine("e1", {"slack": {"*": []}})
+        a.platform_registry.set_platform_status("slack", "deprecated")
+        await a.shared.committed()
+
+        await c.shared.start(redis)
+        assert c.engine_registry.validate_engine("e1", token)
+        assert c.permission_checker.check("e1", "slack", "post").platform_status == "deprecated"
+        # Reads are answered from the local copy.
+        redis.store.clear()
+        assert c.engine_registry.validate_engine("e1", token)
+    finally:
+        await a.shared.stop()
+        await c.shared.stop()
+
+
+@pytest.mark.asyncio
+async def test_resync_restores_missed_changes_but_keeps_queued_writes():
+    redis = DummyRedis()
+    a, b = _load_replica(), _load_replica()
+    await a.shared.start(redis)
+    await b.shared.start(redis)
+    try:
+        # Written behind the replicas' back, so no change message is sent.
+        await redis.hset("engine_control:platforms", "notion", '"maintenance"')
+        b.platform_registry.set_platform_status("gmail", "deprecated")
+        await b.shared.resync()
+        await b.shared.committed()
+
+        assert b.platform_registry.list_platforms() == {"notion": "maintenance", "gmail": "deprecated"}
+        await _until(lambda: a.platform_registry.get_platform_status("gmail") == "deprecated")
+    finally:
+        await a.shared.stop()
+        await b.shared.stop()
+
+
+@pytest.mark.asyncio
+async def test_register_fails_when_redis_write_does_not_finish(monkeypatch):
+    class FailingRedis(DummyRedis):
+        async def hset(self, *args, **kwargs):
+            raise ConnectionError("down")
+
+    a = _load_replica()
+    monkeypatch.setattr(a.shared, "SHARED_STATE_WRITE_TIMEOUT_SECONDS", 0.05)
+    await a.shared.start(FailingRedis())
+    try:
+        with pytest.raises(Exception) as exc:
+            await a.engine_api.register_engine_endpoint({"engine_id": "e1"}, **HEADERS)
+        assert exc.value.status_code == 503
+    finally:
+        await a.shared.stop()
+
+
+@pytest.mark.asyncio
+async def test_change_the_log_failed_to_write_is_not_shared(tmp_path):
+    redis = DummyRedis()
+    a = _load_replica()
+    await a.shared.start(redis)
+    a.durable.open_store(str(tmp_path))
+    try:
+        a.engine_registry.register_engine("kept", {})
+        await a.durable.committed()
+
+        def fail(items):
+            raise OSError("disk full")
+
+        a.durable._store.wal._write = fail
+        a.engine_registry.register_engine("lost", {})
+        await a.shared.committed()
+        assert "kept" in redis.store["engine_control:engines"]
+        assert "lost" not in redis.store["engine_control:engines"]
+        assert a.shared.stats()["dropped"] == 1
+    finally:
+        a.durable.close_store()
+        await a.shared.stop()
+
+
+@pytest.mark.asyncio
+async def test_policy_versions_are_the_same_on_every_replica():
+    redis = DummyRedis()
+    a, b = _load_replica(), _load_replica()
+    await a.shared.start(redis)
+    await b.shared.start(redis)
+    try:
+        a.engine_registry.register_engine("e1", {"gmail": {"send": []}})
+        await _until(lambda: a.change_feed.current_version() == b.change_feed.current_version() == 1)
+        full = (await a.engine_api.policy_snapshot_endpoint(**HEADERS)).content
+        assert full["epoch"] == b.change_feed.epoch()
+
+        b.platform_registry.set_platform_status("gmail", "maintenance")
+        await _until(lambda: a.change_feed.current_version() == b.change_feed.current_version() == 2)
+        for replica in (a, b):
+            delta = await replica.engine_api.policy_snapshot_endpoint(
+                since=full["version"], epoch=full["epoch"], **HEADERS
+            )
+            assert delta.content["changes"] == [
+                {"version": 2, "type": "platform", "id": "gmail", "value": "maintenance"}
+            ]
+
+        # A replica started later, as after a restart, continues the same sequence.
+        c = _load_replica()
+        await c.shared.start(redis)
+        try:
+            resp = await c.engine_api.policy_snapshot_endpoint(since=2, epoch=full["epoch"], **HEADERS)
+            assert resp.content == {"epoch": full["epoch"], "version": 2, "full": False, "changes": []}
+        finally:
+            await c.shared.stop()
+    finally:
+        await a.shared.stop()
+        await b.shared.stop()
+
+
+@pytest.mark.asyncio
+async def test_replica_that_missed_a_version_serves_full_snapshots():
+    redis = DummyRedis()
+    a, b = _load_replica(), _load_replica()
+    await a.shared.start(redis)
+    await b.shared.start(redis)
+    try:
+        a.platform_registry.set_platform_status("slack", "maintenance")
+        await _until(lambda: b.change_feed.current_version() == 1)
+        # A version b never hears about, as when a message is lost.
+        await redis.incr("engine_control:version")
+        a.platform_registry.set_platform_status("gmail", "deprecated")
+        await _until(lambda: b.change_feed.current_version() == 3)
+
+        resp = await b.engine_api.policy_snapshot_endpoint(
+            since=1, epoch=b.change_feed.epoch(), **HEADERS
+        )
+        assert resp.content["full"] is True
+        assert resp.content["platforms"] == {"slack": "maintenance", "gmail": "deprecated"}
+    finally:
+        await a.shared.stop()
+        await b.shared.stop()
@@ -0,0 +1,94 @@
+import asyncio
+import importlib
+import json
+import time
+
+import pytest
+
+main = importlib.import_module("engine_control.engine_api")
+from engine_control import config, platform_registry
+from engine_control.versioned import VersionedResource, etag_matches
+
+HEADERS = {"x_engine_id": "local", "x_engine_key": "local-key"}
+
+
+@pytest.mark.asyncio
+async def test_etag_and_not_modified():
+    config.clear_global_config()
+    first = await main.global_config_endpoint(**HEADERS)
+    etag = first.headers["ETag"]
+    assert first.media_type == "application/json"
+
+    again = await main.global_config_endpoint(if_none_match=etag, **HEADERS)
+    assert again.status_code == 304
+    assert again.content is None
+    assert again.headers["ETag"] == etag
+    weak = await main.global_config_endpoint(if_none_match=f'"other", W/{etag}', **HEADERS)
+    assert weak.status_code == 304
+
+    config.set_global_config({"feature_flags": {"beta": True}})
+    changed = await main.global_config_endpoint(if_none_match=etag, **HEADERS)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert json.loads(changed.content)["feature_flags"] == {"beta": True}
+
+
+def test_body_is_serialized_once_per_change():
+    calls = []
+    resource = VersionedResource(lambda: calls.append(1) or {"a": 1})
+    etag, body = resource.current()
+    assert resource.current() == (etag, body)
+    assert len(calls) == 1
+    resource.bump()
+    # Same content gives the same ETag, on this replica or any other.
+    assert resource.current()[0] == etag
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_watch_returns_when_resource_changes():
+    platform_registry.clear_platforms()
+    etag = (await main.platforms_list_endpoint(**HEADERS)).headers["ETag"]
+
+    watch = asyncio.ensure_future(
+        main.watch_endpoint("platforms/list", wait=5, if_none_match=etag, **HEADERS)
+    )
+    await asyncio.sleep(0.01)
+    # A change that leaves the body as it was does not end the watch.
+    platform_registry.clear_platforms()
+    await asyncio.sleep(0.01)
+    assert not watch.done()
+
+    platform_registry.set_platform_status("gmail", "maintenance")
+    resp = await asyncio.wait_for(watch, 1)
+    assert resp.status_code == 200
+    assert json.loads(resp.content) == {"platforms": {"gmail": "maintenance"}}
+    platform_registry.clear_platforms()
+
+
+@pytest.mark.asyncio
+async def test_watch_times_out_with_not_modified():
+    etag = (await main.platforms_list_endpoint(**HEADERS)).headers["ETag"]
+    resp = await main.watch_endpoint("platforms/list", wait=0.01, if_none_match=etag, **HEADERS)
+    assert resp.status_code == 304
+
+    stale = await main.watch_endpoint("platforms/list", wait=5, if_none_match='"old"', **HEADERS)
+    assert stale.status_code == 200
+
+    # Any current ETag in a list, or "*", keeps the watch waiting.
+    for header in (f'"old", W/{etag}', "*"):
+        started = time.monotonic()
+        resp = await main.watch_endpoint("platforms/list", wait=0.05, if_none_match=header, **HEADERS)
+        assert resp.status_code == 304
+        assert time.monotonic() - started >= 0.04
+
+    with pytest.raises(Exception) as exc:
+        await main.watch_endpoint("engines", **HEADERS)
+    assert exc.value.status_code == 404
+
+
+def test_etag_matches():
+    assert etag_matches("*", '"a"')
+    assert etag_matches('"b", "a"', '"a"')
+    assert not etag_matches(None, '"a"')
+    assert not etag_matches('"b"', '"a"')
@@ -0,0 +1,78 @@
+"""Pre-serialized, versioned read resources for polling clients.
+
+A :class:`VersionedResource` wraps a function returning a JSON-serializable
+value. Registries call :meth:`~VersionedResource.bump` whenever the value may
+have changed. The value is serialized once per version, and its ETag is a
+hash of those bytes, so replicas holding the same data hand out the same
+ETag. A poll that presents the current ETag can then be answered with
+``304`` and no body, and :meth:`~VersionedResource.wait` lets a long-poll
+block until the ETag changes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from typing import Any, Callable, Optional, Set, Tuple
+
+
+class VersionedResource:
+    """Cached JSON body and ETag of a value that rarely changes."""
+
+    def __init__(self, render: Callable[[], Any]) -> None:
+        self._render = render
+        self.version = 0
+        self._cached: Optional[Tuple[str, bytes]] = None
+        self._waiters: Set["asyncio.Future"] = set()
+
+    def bump(self) -> None:
+        """Drop the cached body and wake watchers; call after every change."""
+        self.version += 1
+        self._cached = None
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters.clear()
+
+    def current(self) -> Tuple[str, bytes]:
+        """Return ``(etag, body)`` for the current value."""
+        cached = self._cached
+        if cached is None:
+            body = json.dumps(self._render(), sort_keys=True, separators=(",", ":")).encode()
+            etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+            cached = self._cached = (etag, body)
+        return cached
+
+    async def wait(self, if_none_match: Optional[str], timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for the ETag to leave ``if_none_match``.
+
+        ``if_none_match`` is read like the header: a list of ETags, or ``*``.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while etag_matches(if_none_match, self.current()[0]):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            waiter = loop.create_future()
+            self._waiters.add(waiter)
+            try:
+                # A bump does not always change the body, so check again after it.
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                self._waiters.discard(waiter)
+        return True
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Return ``True`` if an ``If-None-Match`` header covers ``etag``."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
@@ -0,0 +1 @@
+"""Code shared by the Action Engine, Engine Control and Vault services."""
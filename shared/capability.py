@@ -0,0 +1,103 @@
+"""Signed capability tokens for checking engine permissions locally.
+
+Engine Control issues a short-lived token listing an engine's allow and deny
+rules and the platforms that are not ``active``. The token is
+``b64url(claims_json) + "." + b64url(hmac_sha256(claims))`` signed with a
+secret shared with the engines. An engine verifies it once, compiles the
+rules into a :class:`~shared.permission_trie.PermissionTrie` and then answers
+permission checks in memory with the same response Engine Control's
+``/actions/check`` would give.
+
+A token reflects the policy at the time it was issued. Changes to an
+engine's rules or to platform statuses reach the engine when it fetches its
+next token, so the token lifetime bounds how stale a local decision can be.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from shared.permission_trie import PermissionTrie
+
+ACTIVE = "active"
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(secret: str, body: str) -> str:
+    return _b64encode(hmac.new(secret.encode(), body.encode(), hashlib.sha256).digest())
+
+
+def issue(
+    engine_id: str,
+    trie: PermissionTrie,
+    statuses: Mapping[str, str],
+    secret: str,
+    ttl: float,
+    now: Optional[float] = None,
+) -> Tuple[str, float]:
+    """Return a token for ``engine_id`` and its expiry time."""
+    now = time.time() if now is None else now
+    claims = {
+        "sub": engine_id,
+        "iat": now,
+        "exp": now + ttl,
+        "rules": trie.to_json(),
+        "statuses": {p: s for p, s in statuses.items() if s != ACTIVE},
+    }
+    body = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{body}.{_sign(secret, body)}", claims["exp"]
+
+
+def evaluate(
+    trie: PermissionTrie, statuses: Mapping[str, str], platform: str, action_type: str
+) -> Dict[str, Any]:
+    """Decide an action the way Engine Control's ``/actions/check`` does."""
+    status = statuses.get(platform, ACTIVE)
+    rule = trie.match(platform, action_type)
+    if rule is None or rule.deny or status != ACTIVE:
+        return {"allowed": False, "required_scopes": [], "platform_status": status}
+    return {"allowed": True, "required_scopes": list(rule.scopes), "platform_status": status}
+
+
+class Capability:
+    """Verified contents of a capability token."""
+
+    def __init__(self, claims: Dict[str, Any]) -> None:
+        self.engine_id: str = claims["sub"]
+        self.issued_at: float = claims["iat"]
+        self.expires_at: float = claims["exp"]
+        self.statuses: Dict[str, str] = dict(claims.get("statuses") or {})
+        self.trie = PermissionTrie.from_json(claims.get("rules", []))
+
+    def expired(self, now: Optional[float] = None) -> bool:
+        return (time.time() if now is None else now) >= self.expires_at
+
+    def check(self, platform: str, action_type: str) -> Dict[str, Any]:
+        """Return ``{allowed, required_scopes, platform_status}`` for an action."""
+        return evaluate(self.trie, self.statuses, platform, action_type)
+
+
+def verify(token: str, secret: str, now: Optional[float] = None) -> Optional[Capability]:
+    """Return the :class:`Capability` in ``token`` or ``None`` if it is invalid or expired."""
+    try:
+        body, signature = token.split(".")
+        if not hmac.compare_digest(signature, _sign(secret, body)):
+            return None
+        capability = Capability(json.loads(_b64decode(body)))
+    except Exception:
+        return None
+    if capability.expired(now):
+        return None
+    return capability
@@ -0,0 +1,237 @@
+"""Non-blocking JSON logging backend shared by all services.
+
+Loggers returned by the services' ``get_logger`` helpers hand records to a
+:class:`QueueLogHandler`. The handler only puts the record on a bounded
+queue; a background thread formats it with :class:`JsonFormatter` and writes
+it to the sink (``stderr`` by default). No JSON encoding or stream I/O
+happens on the event loop thread.
+
+When the sink cannot keep up and the queue is full, records are dropped
+according to ``LOG_DROP_POLICY`` (``drop_new`` or ``drop_oldest``) and
+counted in :func:`stats`, so a slow sink never stalls requests.
+
+``extra`` fields are serialized by the formatter in the background thread,
+and only for records whose level is enabled. Values whose JSON encoding is
+longer than ``LOG_MAX_FIELD_CHARS`` are cut and marked as truncated. Action
+payloads, adapter parameters and results are written as a summary of their
+keys and encoded size rather than their values. Fields named like
+credentials (tokens, secrets, passwords, keys) are written as ``***``.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "1024"))
+LOG_DROP_POLICY = os.getenv("LOG_DROP_POLICY", "drop_new")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Attributes every LogRecord has; anything else came from ``extra``
+_RESERVED = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__
+) | {"message", "asctime", "taskName"}
+
+
+# ``extra`` fields holding action payloads, adapter parameters or results are
+# logged as a summary; fields whose name contains a credential fragment are
+# never logged.
+_SUMMARIZED_FIELDS = frozenset({"payload", "params", "body", "result", "results"})
+_REDACTED_PARTS = ("token", "secret", "password", "authorization", "credential", "_key")
+REDACTED = "***"
+
+
+def _redacted(key: str) -> bool:
+    key = key.lower()
+    return any(part in key for part in _REDACTED_PARTS)
+
+
+def _encode(value: Any) -> str:
+    try:
+        return value if isinstance(value, str) else json.dumps(value, default=str)
+    except Exception:
+        return repr(value)
+
+
+def _summarize(value: Any, limit: int) -> Any:
+    """Return the keys (or item count) and encoded size of ``value``, not its contents."""
+    if value is None:
+        return None
+    summary: Dict[str, Any] = {"size": len(_encode(value))}
+    if isinstance(value, dict):
+        summary["keys"] = sorted(str(key) for key in value)
+    elif isinstance(value, (list, tuple)):
+        summary["items"] = len(value)
+    else:
+        summary["type"] = type(value).__name__
+    return _truncate(summary, limit)
+
+
+def _truncate(value: Any, limit: int) -> Any:
+    """Return ``value`` if its JSON form fits ``limit`` characters, else a summary."""
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    encoded = _encode(value)
+    if len(encoded) <= limit:
+        return value
+    summary = f"{encoded[:limit]}...<truncated {len(encoded) - limit} chars>"
+    if isinstance(value, dict):
+        return {"_summary": f"dict with {len(value)} keys", "_preview": summary}
+    if isinstance(value, (list, tuple)):
+        return {"_summary": f"list with {len(value)} items", "_preview": summary}
+    return summary
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatter that outputs logs as JSON strings.
+
+    The timestamp is the time the record was created, not the time it was
+    written, so records formatted late by the background thread keep their
+    original time.
+    """
+
+    def __init__(self, max_field_chars: Optional[int] = None) -> None:
+        super().__init__()
+        self.max_field_chars = max_field_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        limit = self.max_field_chars or LOG_MAX_FIELD_CHARS
+        log_record: Dict[str, Any] = {
+            "level": record.levelname,
+            "name": record.name,
+            "message": record.getMessage(),
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+        }
+        if record.exc_info:
+            log_record["exception"] = self.formatException(record.exc_info)
+        for key, value in record.__dict__.items():
+            if key in _RESERVED or key in log_record:
+                continue
+            if key == "request_id" and value is None:
+                continue
+            if _redacted(key):
+                log_record[key] = REDACTED
+            elif key.lower() in _SUMMARIZED_FIELDS:
+                log_record[key] = _summarize(value, limit)
+            else:
+                log_record[key] = _truncate(value, limit)
+        return json.dumps(log_record, default=str)
+
+
+class _Pipeline:
+    """Bounded queue drained by one daemon thread into the sink handler."""
+
+    def __init__(self, maxsize: int, drop_policy: str) -> None:
+        self.queue: "queue.Queue[Optional[logging.LogRecord]]" = queue.Queue(maxsize)
+        self.drop_policy = drop_policy
+        self.sink: logging.Handler = logging.StreamHandler()
+        self.sink.setFormatter(JsonFormatter())
+        self.counters = {"enqueued": 0, "dropped": 0, "written": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(
+                        target=self._run, name="log-pipeline", daemon=True
+                    )
+                    self._thread.start()
+
+    def put(self, record: logging.LogRecord) -> None:
+        self._ensure_thread()
+        try:
+            self.queue.put_nowait(record)
+            self.counters["enqueued"] += 1
+            return
+        except queue.Full:
+            pass
+        if self.drop_policy == "drop_oldest":
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(record)
+                self.counters["enqueued"] += 1
+            except queue.Full:
+                pass
+        # Either the new record or the oldest queued one was discarded.
+        self.counters["dropped"] += 1
+
+    def _run(self) -> None:
+        while True:
+            record = self.queue.get()
+            try:
+                if record is not None:
+                    self.sink.handle(record)
+                    self.counters["written"] += 1
+            except Exception:
+                self.counters["errors"] += 1
+            finally:
+                self.queue.task_done()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until queued records are written; return ``False`` on timeout."""
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.001)
+        try:
+            self.sink.flush()
+        except Exception:  # pragma: no cover - sink already closed
+            pass
+        return True
+
+
+_pipeline = _Pipeline(LOG_QUEUE_SIZE, LOG_DROP_POLICY)
+atexit.register(_pipeline.flush, 1.0)
+
+
+class QueueLogHandler(logging.Handler):
+    """Handler that defers formatting and I/O to the background thread."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        _pipeline.put(record)
+
+
+_handler = QueueLogHandler()
+
+
+def configure_logger(logger: logging.Logger, *filters: logging.Filter) -> logging.Logger:
+    """Attach the shared queue handler and ``filters`` to ``logger`` once."""
+    if not logger.handlers:
+        logger.addHandler(_handler)
+        for log_filter in filters:
+            logger.addFilter(log_filter)
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+    return logger
+
+
+def set_sink(handler: logging.Handler) -> logging.Handler:
+    """Replace the handler records are written to and return the previous one."""
+    _pipeline.flush()
+    previous, _pipeline.sink = _pipeline.sink, handler
+    return previous
+
+
+def flush(timeout: float = 5.0) -> bool:
+    """Block until all queued records have been written."""
+    return _pipeline.flush(timeout)
+
+
+def stats() -> Dict[str, int]:
+    """Return counters of the pipeline and the current queue depth."""
+    return dict(_pipeline.counters, queued=_pipeline.queue.qsize())
@@ -0,0 +1,174 @@
+"""Sampling and rate limiting of log records before they are formatted.
+
+:class:`SamplingFilter` is attached to a logger ahead of every other filter
+and decides from the record's level, logger name and *unformatted* message
+template whether to keep it, so dropped records cost no formatting work.
+
+* Records at ``WARNING`` or above are always kept.
+* A rule with ``every=N`` keeps the first and then every N-th record of each
+  ``(logger, message)`` pair.
+* A rule with ``rate``/``burst`` applies a token bucket per distinct record,
+  keyed by logger, message and the record's ``error`` extra, so a flood of
+  identical validation errors is cut down while new errors still appear.
+* Records no rule matches are kept.
+
+Suppressed records are counted; every ``summary_interval`` seconds one
+summary record lists how many lines of each kind were dropped. A daemon
+thread, started with the first suppressed record, writes the summary when
+its window ends, even if no other record is logged after it.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+from shared.log_pipeline import configure_logger
+
+_summary_logger = configure_logger(logging.getLogger("shared.log_sampling"))
+
+# Bound on the per-key state kept for counters and token buckets
+MAX_TRACKED_KEYS = 4096
+
+
+@dataclass(frozen=True)
+class SamplingRule:
+    """Sampling policy for records whose logger and message match the globs."""
+
+    logger: str = "*"
+    message: str = "*"
+    every: int = 1
+    rate: Optional[float] = None
+    burst: float = 1.0
+
+    def matches(self, logger_name: str, message: str) -> bool:
+        return fnmatch.fnmatchcase(logger_name, self.logger) and fnmatch.fnmatchcase(
+            message, self.message
+        )
+
+
+class _Bounded(OrderedDict):
+    """LRU dict dropping the oldest keys beyond ``MAX_TRACKED_KEYS``."""
+
+    def touch(self, key: Hashable, default: Callable[[], object]):
+        value = self.get(key)
+        if value is None:
+            value = self[key] = default()
+            if len(self) > MAX_TRACKED_KEYS:
+                self.popitem(last=False)
+        else:
+            self.move_to_end(key)
+        return value
+
+
+class SamplingFilter(logging.Filter):
+    """Drop sampled or rate-limited records and report what was dropped."""
+
+    def __init__(
+        self,
+        rules: Sequence[SamplingRule],
+        summary_interval: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__()
+        self.rules = tuple(rules)
+        self.summary_interval = summary_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._rule_for: Dict[Tuple[str, str], Optional[SamplingRule]] = {}
+        self._seen: _Bounded = _Bounded()
+        self._buckets: _Bounded = _Bounded()
+        self._suppressed: Dict[str, int] = {}
+        self._window_start = clock()
+        self._timer: Optional[threading.Thread] = None
+        self.totals = {"kept": 0, "suppressed": 0}
+
+    def _rule(self, logger_name: str, message: str) -> Optional[SamplingRule]:
+        key = (logger_name, message)
+        try:
+            return self._rule_for[key]
+        except KeyError:
+            pass
+        rule = next((r for r in self.rules if r.matches(logger_name, message)), None)
+        if len(self._rule_for) < MAX_TRACKED_KEYS:
+            self._rule_for[key] = rule
+        return rule
+
+    def _allow(self, rule: SamplingRule, record: logging.LogRecord, message: str, now: float) -> bool:
+        if rule.rate is not None:
+            key = (record.name, message, str(getattr(record, "error", "")))
+            bucket = self._buckets.touch(key, lambda: [rule.burst, now])
+            tokens = min(rule.burst, bucket[0] + (now - bucket[1]) * rule.rate)
+            bucket[1] = now
+            if tokens < 1.0:
+                bucket[0] = tokens
+                return False
+            bucket[0] = tokens - 1.0
+            return True
+        if rule.every > 1:
+            counter = self._seen.touch((record.name, message), lambda: [0])
+            counter[0] += 1
+            return (counter[0] - 1) % rule.every == 0
+        return True
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        message = record.msg if isinstance(record.msg, str) else str(record.msg)
+        with self._lock:
+            now = self._clock()
+            summary = None
+            if now - self._window_start >= self.summary_interval:
+                summary = self._take_summary(now)
+            rule = self._rule(record.name, message)
+            keep = rule is None or self._allow(rule, record, message, now)
+            if keep:
+                self.totals["kept"] += 1
+            else:
+                self.totals["suppressed"] += 1
+                label = f"{record.name}: {message}"
+                self._suppressed[label] = self._suppressed.get(label, 0) + 1
+                if self._timer is None:
+                    self._timer = threading.Thread(
+                        target=self._run_timer, name="log-sampling-summary", daemon=True
+                    )
+                    self._timer.start()
+        if summary:
+            _summary_logger.info("Suppressed log lines", extra=summary)
+        return keep
+
+    def _run_timer(self) -> None:
+        while True:
+            with self._lock:
+                now = self._clock()
+                delay = self._window_start + self.summary_interval - now
+                summary = self._take_summary(now) if delay <= 0 else None
+            if delay > 0:
+                time.sleep(min(delay, self.summary_interval))
+            elif summary:
+                _summary_logger.info("Suppressed log lines", extra=summary)
+
+    def _take_summary(self, now: float) -> Optional[dict]:
+        window = now - self._window_start
+        self._window_start = now
+        if not self._suppressed:
+            return None
+        suppressed, self._suppressed = self._suppressed, {}
+        return {
+            "suppressed": suppressed,
+            "suppressed_total": sum(suppressed.values()),
+            "window_seconds": round(window, 3),
+        }
+
+    def flush_summary(self) -> Optional[dict]:
+        """Emit the summary for the current window now and return it."""
+        with self._lock:
+            summary = self._take_summary(self._clock())
+        if summary:
+            _summary_logger.info("Suppressed log lines", extra=summary)
+        return summary
@@ -0,0 +1,148 @@
+"""Prefix trie matching ``platform.action_type`` rules with wildcards.
+
+Used by Engine Control to answer permission checks and by engines that
+check capability tokens locally, so both sides decide identically.
+
+A rule pattern has a platform part and an action part. Each part is either
+literal (``gmail``), a prefix ending in ``*`` (``read_*``) or ``*`` alone.
+Rules are stored in a two-level character trie: the platform trie leads to
+action tries, and each node keeps the rules that end there exactly and the
+rules whose pattern ends there in ``*``. Matching walks the platform once and
+each reached action trie once, so its cost depends on the length of the
+names, not on the number of rules.
+
+Deny rules win over any allow rule. Among allow rules, the one with the most
+literal characters wins, and an exact pattern beats a prefix of the same
+length.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+
+class Rule(NamedTuple):
+    platform: str
+    action_type: str
+    scopes: Tuple[str, ...]
+    deny: bool
+    specificity: Tuple[int, int]
+
+
+class _Node:
+    __slots__ = ("children", "exact", "prefix")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node"] = {}
+        self.exact = None
+        self.prefix = None
+
+
+def is_pattern(part: str) -> bool:
+    return part.endswith("*")
+
+
+def _validate(part: str) -> None:
+    if not isinstance(part, str) or not part or "*" in part[:-1]:
+        raise ValueError(f"Unsupported pattern {part!r}: '*' may only end a name")
+
+
+def _insert(root: _Node, part: str, factory):
+    node = root
+    pattern = is_pattern(part)
+    for char in part[:-1] if pattern else part:
+        child = node.children.get(char)
+        if child is None:
+            child = node.children[char] = _Node()
+        node = child
+    slot = "prefix" if pattern else "exact"
+    if getattr(node, slot) is None:
+        setattr(node, slot, factory())
+    return getattr(node, slot)
+
+
+def _walk(root: _Node, key: str) -> Iterator:
+    """Yield the values of every pattern in ``root`` that matches ``key``."""
+    node = root
+    if node.prefix is not None:
+        yield node.prefix
+    for char in key:
+        node = node.children.get(char)
+        if node is None:
+            return
+        if node.prefix is not None:
+            yield node.prefix
+    if node.exact is not None:
+        yield node.exact
+
+
+class PermissionTrie:
+    """Compiled allow/deny rules of one engine; not modified after building."""
+
+    def __init__(self, rules: Sequence[Rule]) -> None:
+        self._root = _Node()
+        self.rules = tuple(rules)
+        for rule in self.rules:
+            _insert(
+                _insert(self._root, rule.platform, _Node), rule.action_type, list
+            ).append(rule)
+
+    @classmethod
+    def build(
+        cls, permissions: Mapping, deny: Sequence[str] = ()
+    ) -> "PermissionTrie":
+        """Compile a ``platform -> action_type -> scopes`` map and deny patterns.
+
+        Raises ``ValueError`` for malformed patterns.
+        """
+        rules: List[Rule] = []
+        for platform, actions in (permissions or {}).items():
+            if not isinstance(actions, Mapping):
+                continue
+            for action_type, scopes in actions.items():
+                if scopes is None:
+                    continue
+                rules.append(
+                    make_rule(
+                        platform,
+                        action_type,
+                        tuple(scopes) if isinstance(scopes, (list, tuple)) else (),
+                        False,
+                    )
+                )
+        for pattern in deny or ():
+            platform, sep, action_type = str(pattern).partition(".")
+            if not sep:
+                raise ValueError(f"Deny rule {pattern!r} must look like 'platform.action_type'")
+            rules.append(make_rule(platform, action_type, (), True))
+        return cls(rules)
+
+    def to_json(self) -> List[list]:
+        """Return the rules as ``[platform, action_type, scopes, deny]`` lists."""
+        return [[r.platform, r.action_type, list(r.scopes), r.deny] for r in self.rules]
+
+    @classmethod
+    def from_json(cls, data: Sequence[Sequence]) -> "PermissionTrie":
+        """Rebuild a trie from the output of :meth:`to_json`."""
+        return cls([make_rule(p, a, scopes, bool(deny)) for p, a, scopes, deny in data])
+
+    def match(self, platform: str, action_type: str) -> Optional[Rule]:
+        """Return the deciding rule for an action, or ``None`` if nothing matches."""
+        best: Optional[Rule] = None
+        for actions in _walk(self._root, platform):
+            for rules in _walk(actions, action_type):
+                for rule in rules:
+                    if rule.deny:
+                        return rule
+                    if best is None or rule.specificity > best.specificity:
+                        best = rule
+        return best
+
+
+def make_rule(platform: str, action_type: str, scopes: Sequence[str], deny: bool) -> Rule:
+    """Return a validated :class:`Rule`; raises ``ValueError`` for bad patterns."""
+    _validate(platform)
+    _validate(action_type)
+    literal = len(platform.rstrip("*")) + len(action_type.rstrip("*"))
+    exact = (not is_pattern(platform)) + (not is_pattern(action_type))
+    return Rule(platform, action_type, tuple(scopes), deny, (literal, exact))
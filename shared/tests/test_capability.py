@@ -0,0 +1,36 @@
+from shared import capability
+from shared.permission_trie import PermissionTrie
+
+SECRET = "s3cret"
+
+
+def _token(ttl=60, now=None, statuses=None):
+    trie = PermissionTrie.build({"gmail": {"*": ["mail.all"]}}, deny=["gmail.delete_*"])
+    return capability.issue("e1", trie, statuses or {}, SECRET, ttl, now=now)
+
+
+def test_round_trip_matches_rules_and_statuses():
+    token, _ = _token(statuses={"slack": "maintenance", "gmail": "active"})
+    cap = capability.verify(token, SECRET)
+    assert cap.engine_id == "e1"
+    assert cap.check("gmail", "send") == {
+        "allowed": True,
+        "required_scopes": ["mail.all"],
+        "platform_status": "active",
+    }
+    assert cap.check("gmail", "delete_thread")["allowed"] is False
+    assert cap.check("slack", "post") == {
+        "allowed": False,
+        "required_scopes": [],
+        "platform_status": "maintenance",
+    }
+
+
+def test_tampered_wrongly_signed_and_expired_tokens_are_rejected():
+    token, expires_at = _token(ttl=10, now=1000.0)
+    body, signature = token.split(".")
+    assert capability.verify(token, SECRET, now=1005.0) is not None
+    assert capability.verify(token, SECRET, now=expires_at) is None
+    assert capability.verify(token, "other", now=1005.0) is None
+    assert capability.verify(body[:-2] + "xx." + signature, SECRET, now=1005.0) is None
+    assert capability.verify("garbage", SECRET) is None
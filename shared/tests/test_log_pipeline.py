@@ -0,0 +1,120 @@
+import io
+import json
+import logging
+import threading
+
+from shared import log_pipeline
+from shared.log_pipeline import JsonFormatter
+
+
+def _capture():
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter(max_field_chars=50))
+    return stream, handler
+
+
+def test_records_are_written_by_background_thread():
+    stream, handler = _capture()
+    threads = []
+
+    class RecordingHandler(logging.StreamHandler):
+        def emit(self, record):
+            threads.append(threading.current_thread().name)
+            super().emit(record)
+
+    sink = RecordingHandler(stream)
+    sink.setFormatter(handler.formatter)
+    previous = log_pipeline.set_sink(sink)
+    try:
+        logger = log_pipeline.configure_logger(logging.getLogger("pipeline_test"))
+        logger.info("hello %s", "world", extra={"user_id": "u1", "request_id": None})
+        assert log_pipeline.flush()
+    finally:
+        log_pipeline.set_sink(previous)
+    data = json.loads(stream.getvalue())
+    assert data["message"] == "hello world"
+    assert data["user_id"] == "u1"
+    assert "request_id" not in data
+    assert threads == ["log-pipeline"]
+
+
+def test_large_extras_are_truncated():
+    formatter = JsonFormatter(max_field_chars=50)
+    record = logging.LogRecord("x", logging.INFO, __file__, 1, "msg", (), None)
+    record.details = {"body": "x" * 500}
+    record.note = "y" * 500
+    record.count = 3
+    data = json.loads(formatter.format(record))
+    assert data["details"]["_summary"] == "dict with 1 keys"
+    assert len(data["details"]["_preview"]) < 100
+    assert data["note"].startswith("y" * 50) and data["note"].endswith("chars>")
+    assert data["count"] == 3
+
+
+def test_credentials_are_redacted():
+    formatter = JsonFormatter()
+    record = logging.LogRecord("x", logging.INFO, __file__, 1, "msg", (), None)
+    record.access_token = "ya29.secret"
+    record.engine_key = "k"
+    record.client_secret = "s"
+    record.user_id = "u1"
+    data = json.loads(formatter.format(record))
+    for field in ("access_token", "engine_key", "client_secret"):
+        assert data[field] == "***"
+    assert data["user_id"] == "u1"
+
+
+def test_payloads_are_summarized_without_values():
+    formatter = JsonFormatter()
+    record = logging.LogRecord("x", logging.INFO, __file__, 1, "msg", (), None)
+    record.payload = {"to": "a@example.com", "subject": "hi"}
+    record.results = [{"id": 1}, {"id": 2}]
+    record.data = {"kind": "ping"}
+    data = json.loads(formatter.format(record))
+    assert data["payload"] == {
+        "size": len(json.dumps(record.payload)),
+        "keys": ["subject", "to"],
+    }
+    assert "a@example.com" not in json.dumps(data)
+    assert data["results"] == {"size": len(json.dumps(record.results)), "items": 2}
+    assert data["data"] == {"kind": "ping"}
+
+
+def test_disabled_levels_are_not_serialized():
+    class Exploding:
+        def __str__(self):
+            raise AssertionError("serialized")
+
+    logger = log_pipeline.configure_logger(logging.getLogger("pipeline_level_test"))
+    before = log_pipeline.stats()["enqueued"]
+    logger.debug("skipped", extra={"payload": Exploding()})
+    assert log_pipeline.stats()["enqueued"] == before
+
+
+def test_full_queue_drops_instead_of_blocking():
+    pipeline = log_pipeline._Pipeline(maxsize=2, drop_policy="drop_new")
+    gate = threading.Event()
+
+    class SlowSink(logging.Handler):
+        def emit(self, record):
+            gate.wait(5)
+
+    pipeline.sink = SlowSink()
+    for i in range(10):
+        pipeline.put(logging.LogRecord("x", logging.INFO, __file__, 1, f"m{i}", (), None))
+    assert pipeline.counters["dropped"] >= 7
+    gate.set()
+    assert pipeline.flush()
+    assert pipeline.counters["written"] + pipeline.counters["dropped"] == 10
+
+
+def test_drop_oldest_keeps_newest_records():
+    pipeline = log_pipeline._Pipeline(maxsize=3, drop_policy="drop_oldest")
+    # No worker thread: records stay queued.
+    pipeline._ensure_thread = lambda: None
+    for i in range(5):
+        pipeline.put(logging.LogRecord("x", logging.INFO, __file__, 1, f"m{i}", (), None))
+    queued = [pipeline.queue.get_nowait().msg for _ in range(3)]
+    assert queued == ["m2", "m3", "m4"]
+    assert pipeline.counters["dropped"] == 2
@@ -0,0 +1,96 @@
+import logging
+import time
+
+from shared import log_sampling
+from shared.log_sampling import SamplingFilter, SamplingRule
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _record(msg, level=logging.INFO, name="svc.router", **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, (), None)
+    record.__dict__.update(extra)
+    return record
+
+
+def _kept(sampler, records):
+    return [r.getMessage() for r in records if sampler.filter(r)]
+
+
+def test_success_lines_sampled_one_in_n_and_errors_kept():
+    sampler = SamplingFilter([SamplingRule("svc.*", every=5)], clock=FakeClock())
+    kept = _kept(sampler, [_record("Routing action") for _ in range(20)])
+    assert len(kept) == 4
+    errors = [_record("Routing action", level=logging.ERROR) for _ in range(5)]
+    assert len(_kept(sampler, errors)) == 5
+    # Loggers without a rule are untouched.
+    assert len(_kept(sampler, [_record("x", name="other") for _ in range(5)])) == 5
+
+
+def test_identical_validation_errors_are_rate_limited():
+    clock = FakeClock()
+    rule = SamplingRule("svc.router", "Validation error", rate=1.0, burst=3)
+    sampler = SamplingFilter([rule], clock=clock)
+    same = [_record("Validation error", error="Missing field: to") for _ in range(10)]
+    assert len(_kept(sampler, same)) == 3
+    # A different error has its own bucket.
+    assert sampler.filter(_record("Validation error", error="Missing field: subject"))
+    clock.now += 2
+    assert len(_kept(sampler, [_record("Validation error", error="Missing field: to") for _ in range(5)])) == 2
+
+
+def test_first_matching_rule_wins():
+    sampler = SamplingFilter(
+        [SamplingRule("svc.router", "Execution error"), SamplingRule("svc.router", every=100)],
+        clock=FakeClock(),
+    )
+    assert len(_kept(sampler, [_record("Execution error") for _ in range(10)])) == 10
+
+
+def test_periodic_summary_reports_suppressed_lines(monkeypatch):
+    emitted = []
+    monkeypatch.setattr(
+        log_sampling._summary_logger, "info", lambda msg, extra: emitted.append((msg, extra))
+    )
+    clock = FakeClock()
+    sampler = SamplingFilter([SamplingRule("svc.*", every=10)], summary_interval=60, clock=clock)
+    _kept(sampler, [_record("Adapter executed") for _ in range(25)])
+    assert emitted == []
+    clock.now = 61
+    sampler.filter(_record("Adapter executed"))
+    assert emitted[0][0] == "Suppressed log lines"
+    assert emitted[0][1]["suppressed"] == {"svc.router: Adapter executed": 22}
+    assert emitted[0][1]["suppressed_total"] == 22
+    assert sampler.totals == {"kept": 3, "suppressed": 23}
+
+
+def test_summary_is_written_when_no_record_follows(monkeypatch):
+    emitted = []
+    monkeypatch.setattr(
+        log_sampling._summary_logger, "info", lambda msg, extra: emitted.append((msg, extra))
+    )
+    sampler = SamplingFilter([SamplingRule("svc.*", every=10)], summary_interval=0.05)
+    _kept(sampler, [_record("Adapter executed") for _ in range(5)])
+    for _ in range(100):
+        if emitted:
+            break
+        time.sleep(0.01)
+    assert emitted[0][1]["suppressed"] == {"svc.router: Adapter executed": 4}
+
+
+def test_sampling_happens_before_formatting():
+    class Exploding:
+        def __str__(self):
+            raise AssertionError("formatted")
+
+    sampler = SamplingFilter([SamplingRule("svc.*", every=2)], clock=FakeClock())
+    record = _record("value %s", args=None)
+    record.args = (Exploding(),)
+    assert sampler.filter(record)
+    assert not sampler.filter(_record("value %s"))
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from shared import metrics
+
+
+def test_registry_renders_prometheus_text():
+    registry = metrics.Registry()
+    counter = registry.counter("jobs_total", "Jobs", ("queue",))
+    hist = registry.histogram("latency_seconds", "Latency", ("op",), buckets=(0.1, 1.0))
+    registry.gauge("depth", "Queue depth", function=lambda: 7)
+    counter.labels("a\"b").inc(2)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        hist.labels("get").observe(value)
+
+    text = registry.render()
+    assert "# TYPE jobs_total counter" in text
+    assert 'jobs_total{queue="a\\"b"} 2' in text
+    assert 'latency_seconds_bucket{op="get",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{op="get",le="1"} 3' in text
+    assert 'latency_seconds_bucket{op="get",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{op="get"} 4' in text
+    assert "depth 7" in text
+    assert registry.counter("jobs_total", "Jobs", ("queue",)) is counter
+    with pytest.raises(ValueError):
+        counter.labels("a", "b")
+
+
+async def _endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 204})
+
+
+def test_middleware_records_requests_on_its_registry():
+    registry = metrics.Registry()
+    middleware = metrics.MetricsMiddleware(_endpoint, registry=registry)
+    asyncio.run(middleware({"type": "http", "method": "GET", "endpoint": _endpoint}, None, _ignore))
+
+    text = registry.render()
+    assert 'http_requests_total{method="GET",handler="_endpoint",status="204"} 1' in text
+    assert 'http_request_duration_seconds_count{method="GET",handler="_endpoint"} 1' in text
+    assert "http_requests_in_flight 0" in text
+    assert metrics.Registry().get("http_requests_total") is None
+
+
+async def _ignore(message):
+    pass
@@ -0,0 +1,109 @@
+"""Compare fetching tokens one pair at a time with one bulk fetch.
+
+Stores ``--users`` users with ``--platforms`` tokens each, a tenth of them
+expired, then reads every token twice. The first pass makes one
+:func:`refresh_if_needed` call per pair, as a worker calling ``/get_token``
+in a loop does. The second pass makes one :func:`refresh_many_if_needed`
+call, which is what ``/get_tokens`` does. Every Redis command, and every
+pipeline as a whole, waits ``--latency-ms`` first to model the network round
+trip.
+
+Uses the Redis at ``VAULT_REDIS_URL`` when the ``redis`` package can reach
+it. Otherwise it falls back to the in-memory Redis used by the test suite.
+
+Run with::
+
+    python -m vault_engine.benchmarks.bench_get_tokens --users 100 --latency-ms 0.5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from vault_engine import token_refresher, vault_storage
+
+PLATFORMS = ["google", "slack", "notion", "github", "jira"]
+
+
+class _Delayed:
+    """Proxy waiting a fixed delay before every command and pipeline execute."""
+
+    def __init__(self, target, delay: float, counts=None) -> None:
+        self._target = target
+        self._delay = delay
+        self.counts = counts if counts is not None else {"round_trips": 0}
+
+    def pipeline(self, transaction: bool = True):
+        return _Delayed(self._target.pipeline(transaction=transaction), self._delay, self.counts)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        # Commands queued on a pipeline are plain calls; only execute() is sent.
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            self.counts["round_trips"] += 1
+            await asyncio.sleep(self._delay)
+            return await attr(*args, **kwargs)
+
+        return call
+
+
+async def _client():
+    try:
+        client = vault_storage.redis.from_url(vault_storage.REDIS_URL, decode_responses=True)
+        await client.ping()
+        return client, vault_storage.REDIS_URL
+    except Exception:
+        from action_engine.tests.conftest import DummyRedis
+
+        return DummyRedis(), "in-memory"
+
+
+async def main(users: int, platforms: int, latency_ms: float) -> None:
+    client, backend = await _client()
+    pairs = [(f"bench-u{u}", p) for u in range(users) for p in PLATFORMS[:platforms]]
+    await vault_storage.init_redis(client)
+    for i, (user_id, platform) in enumerate(pairs):
+        expires_at = 0 if i % 10 == 0 else time.time() + 3600
+        await vault_storage.store_token(
+            user_id,
+            platform,
+            {"access_token": "ya29." + "x" * 120, "refresh_token": "1//" + "y" * 90, "expires_at": expires_at},
+        )
+    print(f"{len(pairs)} tokens, backend {backend}, {latency_ms} ms per round trip")
+
+    for label in ("one by one", "bulk"):
+        # Expire the same tokens again so both passes refresh the same amount.
+        for i, (user_id, platform) in enumerate(pairs):
+            if i % 10 == 0:
+                await vault_storage.store_token(
+                    user_id, platform, {"access_token": "old", "refresh_token": "r", "expires_at": 0}
+                )
+        delayed = _Delayed(client, latency_ms / 1000)
+        await vault_storage.init_redis(delayed)
+        start = time.perf_counter()
+        if label == "bulk":
+            tokens = await token_refresher.refresh_many_if_needed(pairs)
+        else:
+            tokens = {pair: await token_refresher.refresh_if_needed(*pair) for pair in pairs}
+        elapsed = time.perf_counter() - start
+        await vault_storage.init_redis(client)
+        assert len(tokens) == len(pairs)
+        print(f"{label:<11} {elapsed * 1000:9.1f} ms   {delayed.counts['round_trips']:6d} round trips")
+
+    if backend != "in-memory":
+        await client.delete(*(vault_storage._user_key(f"bench-u{u}") for u in range(users)))
+        await client.zrem(vault_storage.EXPIRY_INDEX, *(vault_storage.index_member(*p) for p in pairs))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--platforms", type=int, default=5, choices=range(1, len(PLATFORMS) + 1))
+    parser.add_argument("--latency-ms", type=float, default=0.5)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.platforms, args.latency_ms))
@@ -0,0 +1,96 @@
+"""Compare the in-process AES engine with the previous openssl subprocess path.
+
+For each implementation the script reports encrypt+decrypt round trips per
+second and how long the event loop was stalled while an async handler ran
+those round trips back to back (measured by a 1 ms ticker task).
+
+Run with::
+
+    python -m vault_engine.benchmarks.bench_token_encryptor --ops 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import subprocess
+import time
+
+from vault_engine import token_encryptor
+
+
+def _openssl(text: str, decrypt: bool = False) -> str:
+    args = ["openssl", "enc"] + (["-d"] if decrypt else []) + [
+        "-aes-256-cbc",
+        "-base64",
+        "-A",
+        "-K",
+        token_encryptor._KEY.hex(),
+        "-iv",
+        token_encryptor._IV.hex(),
+        "-nosalt",
+    ]
+    result = subprocess.run(
+        args, input=text.encode(), stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+    )
+    return result.stdout.decode()
+
+
+def subprocess_roundtrip(text: str) -> str:
+    return _openssl(_openssl(text), decrypt=True)
+
+
+def inprocess_roundtrip(text: str) -> str:
+    return token_encryptor.decrypt(token_encryptor.encrypt(text))
+
+
+async def _measure(label: str, roundtrip, text: str, ops: int) -> None:
+    stalls = []
+    done = False
+
+    async def ticker() -> None:
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            stalls.append(now - last - 0.001)
+            last = now
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    for _ in range(ops):
+        assert roundtrip(text) == text
+        # Handlers await Redis between token operations.
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    done = True
+    await tick
+    stalls.sort()
+    print(
+        f"{label:<11} {ops / elapsed:>10.0f} roundtrips/s   "
+        f"max loop stall {stalls[-1] * 1000:7.2f} ms   "
+        f"p99 stall {stalls[int(len(stalls) * 0.99) - 1] * 1000:7.2f} ms"
+    )
+
+
+async def main(ops: int) -> None:
+    text = json.dumps(
+        {
+            "access_token": "ya29." + "x" * 120,
+            "refresh_token": "1//" + "y" * 90,
+            "expires_at": time.time() + 3600,
+            "scopes": ["https://www.googleapis.com/auth/gmail.send"],
+        }
+    )
+    print(f"token size {len(text)} bytes")
+    await _measure("subprocess", subprocess_roundtrip, text, ops)
+    await _measure("in-process", inprocess_roundtrip, text, ops * 10)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.ops))
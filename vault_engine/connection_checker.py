@@ -2,14 +2,15 @@
 import time
 from typing import Dict
 
-from .vault_storage import retrieve_token, list_platforms
+from .vault_storage import retrieve_user_tokens, list_platforms
 
 
 async def get_status(user_id: str) -> Dict[str, str]:
     statuses: Dict[str, str] = {}
     platforms = await list_platforms()
+    tokens = await retrieve_user_tokens(user_id, platforms)
     for platform in platforms:
-        token = await retrieve_token(user_id, platform)
+        token = tokens.get(platform)
         if not token:
             statuses[platform] = "not_connected"
             continue
@@ -0,0 +1,144 @@
+import asyncio
+import importlib
+import time
+
+import pytest
+
+from action_engine.tests.conftest import DummyRedis, DummyHTTPException
+from vault_engine import token_refresher, vault_storage
+from vault_engine.token_encryptor import encrypt
+
+vault_api = importlib.import_module("vault_engine.vault_api")
+
+HEADERS = {"x_engine_id": "local", "x_engine_key": "local-key"}
+
+
+class CountingRedis(DummyRedis):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def pipeline(self, transaction=True):
+        self.calls.append("pipeline")
+        return super().pipeline(transaction)
+
+    async def get(self, key):
+        self.calls.append("get")
+        return await super().get(key)
+
+    async def hget(self, name, key):
+        self.calls.append("hget")
+        return await super().hget(name, key)
+
+    async def mget(self, keys, *args):
+        self.calls.append("mget")
+        return [await DummyRedis.get(self, key) for key in list(keys) + list(args)]
+
+
+@pytest.mark.asyncio
+async def test_get_tokens_reports_each_pair_in_order():
+    await vault_storage.init_redis(DummyRedis())
+    await vault_storage.store_token("u1", "google", {"access_token": "g1"})
+    await vault_storage.store_token("u1", "slack", {"access_token": "s1", "expires_at": time.time() - 1})
+    await vault_storage.store_token(
+        "u2", "google", {"access_token": "old", "refresh_token": "r2", "expires_at": 0}
+    )
+    body = {
+        "tokens": [
+            {"user_id": "u2", "platform": "google"},
+            {"user_id": "u1", "platform": "notion"},
+            {"user_id": "u1", "platform": "slack"},
+            {"user_id": "u1"},
+            {"user_id": "u1", "platform": "google"},
+        ]
+    }
+    resp = await vault_api.get_tokens_endpoint(body, **HEADERS)
+    assert resp.status_code == 200
+    refreshed, missing, expired, invalid, ok = resp.content["results"]
+    assert refreshed["status"] == "ok"
+    assert refreshed["token"]["access_token"] == "refreshed-r2"
+    assert missing == {"user_id": "u1", "platform": "notion", "status": "missing"}
+    assert expired == {"user_id": "u1", "platform": "slack", "status": "expired"}
+    assert invalid == {"error": "Invalid payload"}
+    assert ok["token"] == {"access_token": "g1"}
+    stored = await vault_storage.retrieve_token("u2", "google")
+    assert stored["access_token"] == "refreshed-r2"
+
+
+@pytest.mark.asyncio
+async def test_retrieve_tokens_uses_one_pipeline():
+    redis = CountingRedis()
+    await vault_storage.init_redis(redis)
+    pairs = []
+    for user in range(20):
+        for platform in ("google", "slack"):
+            await vault_storage.store_token(f"u{user}", platform, {"access_token": f"{user}-{platform}"})
+            pairs.append((f"u{user}", platform))
+    redis.calls.clear()
+    tokens = await vault_storage.retrieve_tokens(pairs + pairs[:3])
+    assert len(tokens) == 40
+    assert tokens[("u7", "slack")] == {"access_token": "7-slack"}
+    assert redis.calls == ["pipeline"]
+
+
+@pytest.mark.asyncio
+async def test_retrieve_tokens_migrates_legacy_keys_with_one_mget():
+    redis = CountingRedis()
+    await vault_storage.init_redis(redis)
+    await redis.set("u1:google", encrypt('{"access_token": "legacy"}'))
+    await redis.set("u1:slack", encrypt('{"access_token": "s", "refresh_token": "r", "expires_at": 5}'))
+    await redis.set("u2:google", encrypt('{"access_token": "g2"}'))
+    tokens = await vault_storage.retrieve_tokens(
+        [("u1", "google"), ("u1", "slack"), ("u2", "google"), ("u2", "slack")]
+    )
+    assert tokens[("u1", "google")] == {"access_token": "legacy"}
+    assert tokens[("u2", "google")] == {"access_token": "g2"}
+    assert set(tokens) == {("u1", "google"), ("u1", "slack"), ("u2", "google")}
+    # The values the MGET returned are moved without reading them again.
+    assert redis.calls == ["pipeline", "mget", "pipeline", "pipeline"]
+    assert not {"u1:google", "u1:slack", "u2:google"} & set(redis.store)
+    assert redis.store[vault_storage.EXPIRY_INDEX] == {vault_storage.index_member("u1", "slack"): 5.0}
+
+
+@pytest.mark.asyncio
+async def test_refreshes_run_concurrently_and_failures_stay_expired(monkeypatch):
+    await vault_storage.init_redis(DummyRedis())
+    for user in range(6):
+        await vault_storage.store_token(
+            f"u{user}", "google", {"access_token": "old", "refresh_token": f"r{user}", "expires_at": 0}
+        )
+    in_flight = peak = 0
+    exchange = token_refresher._exchange_refresh_token
+
+    async def slow_exchange(platform, token):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if token["refresh_token"] == "r3":
+                raise RuntimeError("provider down")
+            return await exchange(platform, token)
+        finally:
+            in_flight -= 1
+
+    monkeypatch.setattr(token_refresher, "_exchange_refresh_token", slow_exchange)
+    tokens = await token_refresher.refresh_many_if_needed(
+        [(f"u{user}", "google") for user in range(6)], concurrency=4
+    )
+    assert peak == 4
+    assert tokens[("u3", "google")]["access_token"] == "old"
+    assert tokens[("u5", "google")]["access_token"] == "refreshed-r5"
+
+
+@pytest.mark.asyncio
+async def test_get_tokens_rejects_bad_requests(monkeypatch):
+    await vault_storage.init_redis(DummyRedis())
+    with pytest.raises(DummyHTTPException) as exc:
+        await vault_api.get_tokens_endpoint({"tokens": "u1"}, **HEADERS)
+    assert exc.value.status_code == 400
+    monkeypatch.setattr(vault_api, "GET_TOKENS_MAX_BATCH", 2)
+    items = [{"user_id": "u1", "platform": "google"}] * 3
+    with pytest.raises(DummyHTTPException) as exc:
+        await vault_api.get_tokens_endpoint({"tokens": items}, **HEADERS)
+    assert exc.value.status_code == 413
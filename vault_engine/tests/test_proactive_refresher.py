@@ -0,0 +1,151 @@
+import time
+import pytest
+
+from action_engine.tests.conftest import DummyRedis
+from vault_engine import token_refresher, vault_storage
+
+
+def _token(expires_at, refresh_token="ref"):
+    return {
+        "access_token": "old",
+        "refresh_token": refresh_token,
+        "expires_at": expires_at,
+        "scopes": [],
+    }
+
+
+@pytest.mark.asyncio
+async def test_store_token_maintains_expiry_index():
+    redis = DummyRedis()
+    await vault_storage.init_redis(redis)
+    await vault_storage.store_token("u1", "gmail", _token(100.0))
+    await vault_storage.store_token("u1", "slack", _token(None))
+    await vault_storage.store_token("u2", "gmail", _token(50.0, refresh_token=None))
+    due = await vault_storage.expiring_tokens(1000.0, 10)
+    assert due == [(vault_storage.index_member("u1", "gmail"), 100.0)]
+
+    await vault_storage.store_token("u1", "gmail", _token(None))
+    assert await vault_storage.expiring_tokens(1000.0, 10) == []
+
+
+@pytest.mark.asyncio
+async def test_run_once_refreshes_tokens_inside_horizon():
+    await vault_storage.init_redis(DummyRedis())
+    now = time.time()
+    await vault_storage.store_token("u1", "gmail", _token(now + 10))
+    await vault_storage.store_token("u2", "gmail", _token(now - 5))
+    await vault_storage.store_token("u3", "gmail", _token(now + 3600))
+
+    refresher = token_refresher.ProactiveRefresher(horizon=60, batch_size=10, concurrency=2)
+    assert await refresher.run_once() == 2
+    for user in ("u1", "u2"):
+        token = await vault_storage.retrieve_token(user, "gmail")
+        assert token["access_token"] == "refreshed-ref"
+    assert (await vault_storage.retrieve_token("u3", "gmail"))["access_token"] == "old"
+    assert refresher.metrics["refreshed"] == 2
+    assert refresher.metrics["last_lag_seconds"] >= 5
+
+    # Refreshed tokens moved out of the horizon.
+    assert await refresher.run_once() == 0
+    assert refresher.metrics["last_batch_size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_size_limits_work_per_pass():
+    await vault_storage.init_redis(DummyRedis())
+    for i in range(5):
+        await vault_storage.store_token(f"u{i}", "gmail", _token(time.time() + i))
+    refresher = token_refresher.ProactiveRefresher(horizon=60, batch_size=2)
+    assert await refresher.run_once() == 2
+    assert await refresher.run_once() == 2
+    assert await refresher.run_once() == 1
+
+
+@pytest.mark.asyncio
+async def test_lease_prevents_double_refresh_across_replicas(monkeypatch):
+    await vault_storage.init_redis(DummyRedis())
+    calls = []
+
+    async def fake_exchange(platform, token):
+        calls.append(platform)
+        return {"access_token": "new", "refresh_token": "ref", "expires_at": time.time() + 3600}
+
+    monkeypatch.setattr(token_refresher, "_exchange_refresh_token", fake_exchange)
+    await vault_storage.store_token("u1", "gmail", _token(time.time()))
+    first = token_refresher.ProactiveRefresher(horizon=60)
+    second = token_refresher.ProactiveRefresher(horizon=60)
+    client = await vault_storage._get_redis()
+    member = vault_storage.index_member("u1", "gmail")
+    await client.set(f"vault:refresh_lease:{member}", first.replica_id, nx=True, ex=30)
+    assert await second.run_once() == 0
+    assert second.metrics["skipped"] == 1
+    assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_failing_tokens_do_not_starve_the_rest(monkeypatch):
+    redis = DummyRedis()
+    await vault_storage.init_redis(redis)
+    exchange = token_refresher._exchange_refresh_token
+
+    async def flaky_exchange(platform, token):
+        if token["refresh_token"] == "bad":
+            raise RuntimeError("provider down")
+        return await exchange(platform, token)
+
+    monkeypatch.setattr(token_refresher, "_exchange_refresh_token", flaky_exchange)
+    now = time.time()
+    # The failing tokens sit at the head of the index.
+    await vault_storage.store_token("bad1", "gmail", _token(now - 20, refresh_token="bad"))
+    await vault_storage.store_token("bad2", "gmail", _token(now - 10, refresh_token="bad"))
+    for i in range(4):
+        await vault_storage.store_token(f"ok{i}", "gmail", _token(now + i))
+    refresher = token_refresher.ProactiveRefresher(horizon=60, batch_size=2, retry_after=30)
+
+    refreshed = [await refresher.run_once() for _ in range(4)]
+
+    assert refreshed == [0, 2, 2, 0]
+    assert refresher.metrics["failures"] == 2
+    for i in range(4):
+        assert (await vault_storage.retrieve_token(f"ok{i}", "gmail"))["access_token"] == "refreshed-ref"
+    # Failed tokens wait outside the horizon for their back-off.
+    due = dict(await vault_storage.expiring_tokens(float("inf"), 10))
+    for user in ("bad1", "bad2"):
+        assert due[vault_storage.index_member(user, "gmail")] >= now + 60 + 30
+
+
+@pytest.mark.asyncio
+async def test_backoff_doubles_per_consecutive_failure_and_resets(monkeypatch):
+    redis = DummyRedis()
+    await vault_storage.init_redis(redis)
+    refresher = token_refresher.ProactiveRefresher(horizon=60, retry_after=30, max_retry_after=100)
+    assert [refresher.backoff(n) for n in (1, 2, 3, 4)] == [30, 60, 100, 100]
+
+    async def failing_exchange(platform, token):
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr(token_refresher, "_exchange_refresh_token", failing_exchange)
+    member = vault_storage.index_member("u1", "gmail")
+    for failures in (1, 2):
+        await vault_storage.store_token("u1", "gmail", _token(time.time()))
+        await redis.delete(f"vault:refresh_lease:{member}")
+        start = time.time()
+        assert await refresher.run_once() == 0
+        [(_, score)] = await vault_storage.expiring_tokens(float("inf"), 10)
+        assert score >= start + 60 + refresher.backoff(failures)
+
+    monkeypatch.undo()
+    await redis.delete(f"vault:refresh_lease:{member}")
+    await vault_storage.schedule_refresh("u1", "gmail", time.time())
+    assert await refresher.run_once() == 1
+    assert member not in redis.store.get(token_refresher.FAILURES_KEY, {})
+
+
+@pytest.mark.asyncio
+async def test_stale_index_entries_are_dropped():
+    redis = DummyRedis()
+    await vault_storage.init_redis(redis)
+    await vault_storage.schedule_refresh("ghost", "gmail", time.time())
+    refresher = token_refresher.ProactiveRefresher(horizon=60)
+    assert await refresher.run_once() == 0
+    assert await vault_storage.expiring_tokens(time.time() + 60, 10) == []
@@ -0,0 +1,63 @@
+import shutil
+import subprocess
+
+import pytest
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from vault_engine import token_encryptor
+
+
+def _openssl(text: str, decrypt: bool = False) -> str:
+    args = ["openssl", "enc"] + (["-d"] if decrypt else []) + [
+        "-aes-256-cbc",
+        "-base64",
+        "-A",
+        "-K",
+        token_encryptor._KEY.hex(),
+        "-iv",
+        token_encryptor._IV.hex(),
+        "-nosalt",
+    ]
+    return subprocess.run(args, input=text.encode(), stdout=subprocess.PIPE, check=True).stdout.decode()
+
+
+def test_aes256_known_answer(monkeypatch):
+    # FIPS-197 appendix C.3, as the first CBC block under a zero IV
+    cipher = Cipher(algorithms.AES(bytes(range(32))), modes.CBC(bytes(16)))
+    monkeypatch.setattr(token_encryptor, "_CIPHER", cipher)
+    block = bytes.fromhex("00112233445566778899aabbccddeeff")
+    encrypted = token_encryptor._encrypt_bytes(block)
+    assert encrypted[:16].hex() == "8ea2b7ca516745bfeafc49904b496089"
+    assert token_encryptor._decrypt_bytes(encrypted) == block
+
+
+def test_keys_are_fitted_like_openssl():
+    assert token_encryptor._fit(b"short", 32) == b"short" + bytes(27)
+    assert token_encryptor._fit(b"k" * 40, 32) == b"k" * 32
+
+
+def test_roundtrip_and_bulk():
+    values = ["", "a", "x" * 16, '{"access_token": "tok", "scopes": ["מייל"]}']
+    encrypted = token_encryptor.encrypt_many(values)
+    assert encrypted == [token_encryptor.encrypt(v) for v in values]
+    assert token_encryptor.decrypt_many(encrypted) == values
+
+
+@pytest.mark.asyncio
+async def test_async_bulk_roundtrip():
+    values = [f'{{"access_token": "t{i}"}}' for i in range(100)]
+    encrypted = await token_encryptor.encrypt_many_async(values)
+    assert await token_encryptor.decrypt_many_async(encrypted) == values
+
+
+@pytest.mark.skipif(shutil.which("openssl") is None, reason="openssl CLI not available")
+def test_compatible_with_openssl_ciphertext():
+    text = '{"access_token": "tok", "refresh_token": "ref", "expires_at": null}'
+    assert token_encryptor.encrypt(text) == _openssl(text)
+    assert token_encryptor.decrypt(_openssl(text)) == text
+    assert _openssl(token_encryptor.encrypt(text), decrypt=True) == text
+
+
+def test_decrypt_rejects_garbage():
+    with pytest.raises(ValueError):
+        token_encryptor.decrypt(token_encryptor.encrypt("abc")[:-4] + "AAA=")
@@ -21,3 +21,12 @@ async def test_refresh_expired_token():
     resp = await vault_api.get_token_endpoint("u2", "google", x_engine_id="local", x_engine_key="local-key")
     assert resp.status_code == 200
     assert resp.content["access_token"].startswith("refreshed-")
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exposes_refresh_counters():
+    await vault_storage.init_redis(DummyRedis())
+    await vault_api.get_token_endpoint("nobody", "google", x_engine_id="local", x_engine_key="local-key")
+    text = (await vault_api.metrics_endpoint()).content
+    assert 'vault_tokens_served_total{result="missing"}' in text
+    assert "# TYPE vault_proactive_refresh_refreshed_total counter" in text
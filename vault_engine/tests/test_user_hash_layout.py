@@ -0,0 +1,88 @@
+import time
+import pytest
+
+from action_engine.tests.conftest import DummyRedis
+from vault_engine import connection_checker, vault_storage
+from vault_engine.token_encryptor import encrypt
+
+
+class CountingRedis(DummyRedis):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def get(self, key):
+        self.calls.append("get")
+        return await super().get(key)
+
+    async def hget(self, name, key):
+        self.calls.append("hget")
+        return await super().hget(name, key)
+
+    async def hgetall(self, name):
+        self.calls.append("hgetall")
+        return await super().hgetall(name)
+
+
+@pytest.mark.asyncio
+async def test_tokens_stored_in_per_user_hash():
+    redis = DummyRedis()
+    await vault_storage.init_redis(redis)
+    await vault_storage.store_token("u1", "google", {"access_token": "g"})
+    await vault_storage.store_token("u1", "slack", {"access_token": "s"})
+    assert set(redis.store) == {"vault:tokens:u1"}
+    assert set(redis.store["vault:tokens:u1"]) == {"google", "slack"}
+    assert await vault_storage.retrieve_token("u1", "slack") == {"access_token": "s"}
+
+
+@pytest.mark.asyncio
+async def test_legacy_key_is_migrated_on_read():
+    redis = DummyRedis()
+    await vault_storage.init_redis(redis)
+    await redis.set("u1:google", encrypt('{"access_token": "legacy"}'))
+    assert await vault_storage.retrieve_token("u1", "google") == {"access_token": "legacy"}
+    assert "u1:google" not in redis.store
+    assert "google" in redis.store["vault:tokens:u1"]
+
+
+@pytest.mark.asyncio
+async def test_status_reads_hash_once():
+    redis = CountingRedis()
+    await vault_storage.init_redis(redis)
+    await vault_storage.store_token("u1", "google", {"access_token": "g"})
+    await vault_storage.store_token("u1", "notion", {"access_token": "n", "expires_at": time.time() - 1})
+    await vault_storage.store_token("u1", "slack", {"access_token": "s"})
+    redis.calls.clear()
+    statuses = await connection_checker.get_status("u1")
+    assert statuses == {"google": "active", "notion": "token_expired", "slack": "active"}
+    assert redis.calls == ["hgetall"]
+
+
+@pytest.mark.asyncio
+async def test_migrate_legacy_keys():
+    redis = DummyRedis()
+    await vault_storage.init_redis(redis)
+    await redis.set("u1:google", encrypt('{"access_token": "a"}'))
+    await redis.set("u2:slack", encrypt('{"access_token": "b"}'))
+    await vault_storage.store_token("u3", "notion", {"access_token": "c"})
+    assert await vault_storage.migrate_legacy_keys() == 2
+    assert set(redis.store) == {"vault:tokens:u1", "vault:tokens:u2", "vault:tokens:u3"}
+    assert await vault_storage.retrieve_user_tokens("u2") == {"slack": {"access_token": "b"}}
+    assert await vault_storage.migrate_legacy_keys() == 0
+
+
+@pytest.mark.asyncio
+async def test_migrate_legacy_keys_leaves_other_keys_alone():
+    redis = DummyRedis()
+    await vault_storage.init_redis(redis)
+    await redis.set("revoked:abc123", "1")
+    await redis.set("idem:u1:key", '{"status": "done"}')
+    await redis.set("cache:google", "not a token")
+    await redis.hset("sessions:slack", "a", "b")
+    await redis.set("u1:google", encrypt('{"access_token": "a"}'))
+    assert await vault_storage.migrate_legacy_keys() == 1
+    assert await redis.get("revoked:abc123") == "1"
+    assert await redis.get("idem:u1:key") == '{"status": "done"}'
+    assert await redis.get("cache:google") == "not a token"
+    assert redis.store["sessions:slack"] == {"a": "b"}
+    assert set(k for k in redis.store if k.startswith("vault:tokens:")) == {"vault:tokens:u1"}
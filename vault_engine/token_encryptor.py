@@ -1,57 +1,95 @@
-import os
+"""AES-256-CBC token encryption performed in-process.
+
+Ciphertext is byte-for-byte what ``openssl enc -aes-256-cbc -base64 -A
+-nosalt`` produced with the same key and IV, so tokens stored by earlier
+versions decrypt without a migration.  The cipher comes from the
+``cryptography`` package, which is a required dependency of the vault.
+"""
+import asyncio
 import base64
-import subprocess
+import os
+from typing import Iterable, List
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+
+def _fit(value: bytes, size: int) -> bytes:
+    """Zero-pad or truncate ``value`` to ``size`` bytes, as ``openssl enc -K/-iv`` does."""
+    return value[:size].ljust(size, b"\0")
+
+
+_KEY = _fit(os.getenv("VAULT_ENCRYPTION_KEY", "0" * 32).encode(), 32)
+_IV = _fit(os.getenv("VAULT_ENCRYPTION_IV", "1" * 16).encode(), 16)
+
+# Key schedule and mode are set up once; each call only opens a new
+# encryptor or decryptor context on it.
+_CIPHER = Cipher(algorithms.AES(_KEY), modes.CBC(_IV))
+
+# Number of tokens processed between event loop yields in the async bulk API
+_ASYNC_CHUNK = 32
+
+
+def _pad(data: bytes) -> bytes:
+    n = 16 - len(data) % 16
+    return data + bytes([n]) * n
 
-_KEY = os.getenv("VAULT_ENCRYPTION_KEY", "0" * 32).encode()
-_IV = os.getenv("VAULT_ENCRYPTION_IV", "1" * 16).encode()
 
+def _unpad(data: bytes) -> bytes:
+    n = data[-1] if data else 0
+    if not 1 <= n <= 16 or data[-n:] != bytes([n]) * n:
+        raise ValueError("Bad decrypt")
+    return data[:-n]
 
-def _hex(b: bytes) -> str:
-    return b.hex()
+
+def _encrypt_bytes(data: bytes) -> bytes:
+    encryptor = _CIPHER.encryptor()
+    return encryptor.update(_pad(data)) + encryptor.finalize()
+
+
+def _decrypt_bytes(data: bytes) -> bytes:
+    if not data or len(data) % 16:
+        raise ValueError("Bad decrypt")
+    decryptor = _CIPHER.decryptor()
+    return _unpad(decryptor.update(data) + decryptor.finalize())
 
 
 def encrypt(text: str) -> str:
-    """Encrypt ``text`` using AES-256-CBC via OpenSSL."""
-    result = subprocess.run(
-        [
-            "openssl",
-            "enc",
-            "-aes-256-cbc",
-            "-base64",
-            "-A",
-            "-K",
-            _hex(_KEY),
-            "-iv",
-            _hex(_IV),
-            "-nosalt",
-        ],
-        input=text.encode(),
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        check=True,
-    )
-    return result.stdout.decode()
+    """Encrypt ``text`` using AES-256-CBC and return it base64 encoded."""
+    return base64.b64encode(_encrypt_bytes(text.encode())).decode()
 
 
 def decrypt(token: str) -> str:
     """Decrypt token produced by :func:`encrypt`."""
-    result = subprocess.run(
-        [
-            "openssl",
-            "enc",
-            "-d",
-            "-aes-256-cbc",
-            "-base64",
-            "-A",
-            "-K",
-            _hex(_KEY),
-            "-iv",
-            _hex(_IV),
-            "-nosalt",
-        ],
-        input=token.encode(),
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        check=True,
-    )
-    return result.stdout.decode()
+    return _decrypt_bytes(base64.b64decode(token)).decode()
+
+
+def encrypt_many(texts: Iterable[str]) -> List[str]:
+    """Encrypt several values in one call."""
+    return [encrypt(t) for t in texts]
+
+
+def decrypt_many(tokens: Iterable[str]) -> List[str]:
+    """Decrypt several values in one call."""
+    return [decrypt(t) for t in tokens]
+
+
+async def encrypt_many_async(texts: Iterable[str]) -> List[str]:
+    """Encrypt several values, yielding to the event loop between chunks."""
+    texts = list(texts)
+    result: List[str] = []
+    for start in range(0, len(texts), _ASYNC_CHUNK):
+        if start:
+            await asyncio.sleep(0)
+        result.extend(encrypt_many(texts[start : start + _ASYNC_CHUNK]))
+    return result
+
+
+async def decrypt_many_async(tokens: Iterable[str]) -> List[str]:
+    """Decrypt several values, yielding to the event loop between chunks."""
+    tokens = list(tokens)
+    result: List[str] = []
+    for start in range(0, len(tokens), _ASYNC_CHUNK):
+        if start:
+            await asyncio.sleep(0)
+        result.extend(decrypt_many(tokens[start : start + _ASYNC_CHUNK]))
+    return result
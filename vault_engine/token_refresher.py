@@ -1,28 +1,252 @@
-"""Token refresh utilities."""
+"""Token refresh utilities.
+
+Besides refreshing on the read path, :class:`ProactiveRefresher` walks the
+expiry index maintained by :func:`vault_storage.store_token` and refreshes
+tokens shortly before they expire.
+"""
+import asyncio
+import os
+import secrets
 import time
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, List, Tuple
 
-from .vault_storage import retrieve_token, store_token
+from .vault_storage import (
+    KEY_NAMESPACE,
+    _get_redis,
+    expiring_tokens,
+    parse_index_member,
+    retrieve_token,
+    retrieve_tokens,
+    schedule_refresh,
+    store_token,
+)
+from .vault_logger import get_logger
 
+REFRESH_ENABLED = os.getenv("VAULT_REFRESH_ENABLED", "true").lower() != "false"
+REFRESH_HORIZON_SECONDS = float(os.getenv("VAULT_REFRESH_HORIZON_SECONDS", "300"))
+REFRESH_INTERVAL_SECONDS = float(os.getenv("VAULT_REFRESH_INTERVAL_SECONDS", "5"))
+REFRESH_BATCH_SIZE = int(os.getenv("VAULT_REFRESH_BATCH_SIZE", "100"))
+REFRESH_CONCURRENCY = int(os.getenv("VAULT_REFRESH_CONCURRENCY", "10"))
+REFRESH_RETRY_SECONDS = float(os.getenv("VAULT_REFRESH_RETRY_SECONDS", "30"))
+REFRESH_MAX_RETRY_SECONDS = float(os.getenv("VAULT_REFRESH_MAX_RETRY_SECONDS", "3600"))
 
-async def refresh_if_needed(user_id: str, platform: str) -> Optional[Dict[str, Any]]:
-    token = await retrieve_token(user_id, platform)
-    if not token:
-        return None
+# Hash of index member -> consecutive failed proactive refreshes
+FAILURES_KEY = f"{KEY_NAMESPACE}refresh_failures"
 
-    expires_at = token.get("expires_at")
-    if expires_at is None or time.time() < float(expires_at):
-        return token
+logger = get_logger(__name__)
 
-    refresh_token = token.get("refresh_token")
-    if not refresh_token:
-        return token
 
-    new_data = {
+async def _exchange_refresh_token(platform: str, token: Dict[str, Any]) -> Dict[str, Any]:
+    """Exchange the token's ``refresh_token`` with the provider."""
+    refresh_token = token["refresh_token"]
+    return {
         "access_token": f"refreshed-{refresh_token}",
         "refresh_token": refresh_token,
         "expires_at": time.time() + 3600,
         "scopes": token.get("scopes", []),
     }
+
+
+async def refresh_token(user_id: str, platform: str, token: Dict[str, Any]) -> Dict[str, Any]:
+    """Refresh ``token`` and store the result."""
+    new_data = await _exchange_refresh_token(platform, token)
     await store_token(user_id, platform, new_data)
     return new_data
+
+
+async def refresh_if_needed(user_id: str, platform: str) -> Optional[Dict[str, Any]]:
+    token = await retrieve_token(user_id, platform)
+    if not token:
+        return None
+
+    if not is_expired(token):
+        return token
+
+    refresh_token_value = token.get("refresh_token")
+    if not refresh_token_value:
+        return token
+
+    return await refresh_token(user_id, platform, token)
+
+
+def is_expired(token: Dict[str, Any], now: Optional[float] = None) -> bool:
+    """Return ``True`` once ``token`` is past its ``expires_at``."""
+    expires_at = token.get("expires_at")
+    return expires_at is not None and (time.time() if now is None else now) >= float(expires_at)
+
+
+async def refresh_many_if_needed(
+    pairs: Iterable[Tuple[str, str]], concurrency: int = REFRESH_CONCURRENCY
+) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Bulk :func:`refresh_if_needed` for ``(user_id, platform)`` pairs.
+
+    Tokens are read with :func:`retrieve_tokens`, and expired ones are
+    refreshed with at most ``concurrency`` refreshes in flight. A token that
+    cannot be refreshed is returned as stored, still expired. Pairs without a
+    token are left out.
+    """
+    tokens = await retrieve_tokens(pairs)
+    now = time.time()
+    due = [pair for pair, token in tokens.items() if is_expired(token, now) and token.get("refresh_token")]
+    if not due:
+        return tokens
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _refresh(user_id: str, platform: str) -> None:
+        async with semaphore:
+            try:
+                tokens[(user_id, platform)] = await refresh_token(
+                    user_id, platform, tokens[(user_id, platform)]
+                )
+            except Exception as exc:
+                logger.info(
+                    "Token refresh failed",
+                    extra={"user_id": user_id, "platform": platform, "error": str(exc)},
+                )
+
+    await asyncio.gather(*(_refresh(user_id, platform) for user_id, platform in due))
+    return tokens
+
+
+class ProactiveRefresher:
+    """Background task refreshing tokens before they expire.
+
+    Every ``interval`` seconds it pulls batches of up to ``batch_size``
+    tokens expiring within ``horizon`` seconds from the expiry index and
+    refreshes them with at most ``concurrency`` refreshes in flight. A
+    short Redis lease per token keeps several vault replicas from
+    refreshing the same token.
+
+    A token that fails to refresh is moved out of the horizon and retried
+    after ``retry_after`` seconds, doubling with every consecutive failure up
+    to ``max_retry_after``. Failing tokens therefore never occupy the head of
+    the index, and the tokens queued behind them keep being refreshed.
+    """
+
+    def __init__(
+        self,
+        horizon: float = REFRESH_HORIZON_SECONDS,
+        interval: float = REFRESH_INTERVAL_SECONDS,
+        batch_size: int = REFRESH_BATCH_SIZE,
+        concurrency: int = REFRESH_CONCURRENCY,
+        retry_after: float = REFRESH_RETRY_SECONDS,
+        max_retry_after: float = REFRESH_MAX_RETRY_SECONDS,
+    ) -> None:
+        self.horizon = horizon
+        self.interval = interval
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.retry_after = retry_after
+        self.max_retry_after = max(retry_after, max_retry_after)
+        self.replica_id = secrets.token_hex(8)
+        self.metrics: Dict[str, float] = {
+            "batches": 0,
+            "last_batch_size": 0,
+            "refreshed": 0,
+            "skipped": 0,
+            "failures": 0,
+            "last_lag_seconds": 0.0,
+            "max_lag_seconds": 0.0,
+        }
+        self._task: Optional["asyncio.Task"] = None
+
+    async def run_once(self) -> int:
+        """Process one batch and return the number of refreshed tokens."""
+        now = time.time()
+        due: List[Tuple[str, float]] = await expiring_tokens(now + self.horizon, self.batch_size)
+        self.metrics["batches"] += 1
+        self.metrics["last_batch_size"] = len(due)
+        if not due:
+            self.metrics["last_lag_seconds"] = 0.0
+            return 0
+
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+
+        async def _guarded(member: str) -> Optional[float]:
+            async with semaphore:
+                return await self._refresh_member(member)
+
+        lags = await asyncio.gather(*(_guarded(member) for member, _ in due))
+        done = [lag for lag in lags if lag is not None]
+        if done:
+            self.metrics["last_lag_seconds"] = max(done)
+            self.metrics["max_lag_seconds"] = max(self.metrics["max_lag_seconds"], max(done))
+        return len(done)
+
+    async def _refresh_member(self, member: str) -> Optional[float]:
+        """Refresh one indexed token and return how late it was refreshed."""
+        user_id, platform = parse_index_member(member)
+        client = await _get_redis()
+        lease_key = f"{KEY_NAMESPACE}refresh_lease:{member}"
+        if not await client.set(lease_key, self.replica_id, nx=True, ex=max(1, int(self.retry_after))):
+            self.metrics["skipped"] += 1
+            return None
+        try:
+            token = await retrieve_token(user_id, platform)
+            if not token or token.get("expires_at") is None or not token.get("refresh_token"):
+                await schedule_refresh(user_id, platform, None)
+                await client.hdel(FAILURES_KEY, member)
+                self.metrics["skipped"] += 1
+                return None
+            expires_at = float(token["expires_at"])
+            if expires_at > time.time() + self.horizon:
+                # Already refreshed elsewhere; fix a stale index entry.
+                await schedule_refresh(user_id, platform, expires_at)
+                self.metrics["skipped"] += 1
+                return None
+            await refresh_token(user_id, platform, token)
+        except Exception as exc:
+            self.metrics["failures"] += 1
+            logger.info(
+                "Proactive token refresh failed",
+                extra={"user_id": user_id, "platform": platform, "error": str(exc)},
+            )
+            # Keep the lease so other replicas also back off, and move the
+            # entry past the horizon so it does not block the head of the
+            # index until the back-off is over.
+            try:
+                failures = await client.hincrby(FAILURES_KEY, member, 1)
+                await schedule_refresh(
+                    user_id, platform, time.time() + self.horizon + self.backoff(failures)
+                )
+            except Exception:  # pragma: no cover - Redis unavailable
+                pass
+            return None
+        await client.delete(lease_key)
+        await client.hdel(FAILURES_KEY, member)
+        self.metrics["refreshed"] += 1
+        return max(0.0, time.time() - expires_at)
+
+    def backoff(self, failures: int) -> float:
+        """Seconds to wait before retrying after ``failures`` consecutive failures."""
+        return min(self.max_retry_after, self.retry_after * 2 ** min(max(failures, 1) - 1, 30))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                refreshed = await self.run_once()
+            except Exception as exc:  # pragma: no cover - Redis unavailable
+                logger.info("Proactive refresh batch failed", extra={"error": str(exc)})
+                refreshed = 0
+            # Keep draining while batches come back full.
+            if refreshed < self.batch_size:
+                await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start the background loop on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the background loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+refresher = ProactiveRefresher()
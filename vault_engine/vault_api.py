@@ -1,17 +1,70 @@
 from fastapi import FastAPI, Header, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+import os
 import time
 
 from .auth_middleware import verify_engine
 from .vault_storage import store_token, retrieve_token
-from .token_refresher import refresh_if_needed
+from .token_refresher import (
+    REFRESH_ENABLED,
+    is_expired,
+    refresh_if_needed,
+    refresh_many_if_needed,
+    refresher,
+)
 from .connection_checker import get_status
 from .vault_logger import get_logger, RequestIdMiddleware, get_request_id
+from . import vault_metrics
 
 app = FastAPI()
 app.add_middleware(RequestIdMiddleware)
+app.add_middleware(vault_metrics.MetricsMiddleware, registry=vault_metrics.REGISTRY)
 logger = get_logger(__name__)
 
+GET_TOKENS_MAX_BATCH = int(os.getenv("VAULT_GET_TOKENS_MAX_BATCH", "500"))
+
+
+tokens_served_total = vault_metrics.REGISTRY.counter(
+    "vault_tokens_served_total", "Token reads answered by /get_token and /get_tokens", ("result",)
+)
+for _name, _help in (
+    ("refreshed", "Tokens refreshed ahead of expiry"),
+    ("failures", "Proactive refreshes that failed"),
+    ("skipped", "Indexed tokens skipped by the proactive refresher"),
+):
+    vault_metrics.REGISTRY.counter(
+        f"vault_proactive_refresh_{_name}_total",
+        _help,
+        function=lambda name=_name: refresher.metrics[name],
+    )
+vault_metrics.REGISTRY.gauge(
+    "vault_proactive_refresh_lag_seconds",
+    "How late the last proactive refresh batch ran past token expiry",
+    function=lambda: refresher.metrics["last_lag_seconds"],
+)
+vault_metrics.REGISTRY.gauge(
+    "vault_proactive_refresh_last_batch_size",
+    "Tokens pulled from the expiry index by the last proactive refresh pass",
+    function=lambda: refresher.metrics["last_batch_size"],
+)
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Expose in-process metrics in the Prometheus text format."""
+    return Response(content=vault_metrics.REGISTRY.render(), media_type=vault_metrics.CONTENT_TYPE)
+
+
+@app.on_event("startup")
+async def start_refresher() -> None:
+    if REFRESH_ENABLED:
+        refresher.start()
+
+
+@app.on_event("shutdown")
+async def stop_refresher() -> None:
+    await refresher.stop()
+
 
 @app.post("/store_token")
 async def store_token_endpoint(
@@ -63,7 +116,9 @@ async def get_token_endpoint(
     verify_engine(x_engine_id, x_engine_key)
     token = await refresh_if_needed(user_id, platform)
     if not token:
+        tokens_served_total.labels("missing").inc()
         return JSONResponse({"error": "Token not found"}, status_code=404)
+    tokens_served_total.labels("found").inc()
     logger.info(
         "Token retrieved",
         extra={"user_id": user_id, "platform": platform, "request_id": get_request_id()},
@@ -71,6 +126,65 @@ async def get_token_endpoint(
     return JSONResponse(token)
 
 
+@app.post("/get_tokens")
+async def get_tokens_endpoint(
+    data: dict,
+    x_engine_id: str = Header(None),
+    x_engine_key: str = Header(None),
+):
+    """Return the tokens of many ``{"user_id", "platform"}`` pairs at once.
+
+    Results follow the order of ``tokens``. Each has a ``status`` of ``ok``
+    (with ``token``), ``missing`` or ``expired`` (stored token expired and
+    could not be refreshed); malformed items get ``{"error": ...}``.
+    """
+    verify_engine(x_engine_id, x_engine_key)
+    items = data.get("tokens") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Invalid payload")
+    if len(items) > GET_TOKENS_MAX_BATCH:
+        raise HTTPException(
+            status_code=413, detail=f"At most {GET_TOKENS_MAX_BATCH} tokens per request"
+        )
+    pairs = [
+        (item["user_id"], item["platform"])
+        if isinstance(item, dict)
+        and all(isinstance(item.get(k), str) and item.get(k) for k in ("user_id", "platform"))
+        else None
+        for item in items
+    ]
+    tokens = await refresh_many_if_needed(pair for pair in pairs if pair is not None)
+
+    now = time.time()
+    results = []
+    counts = {"found": 0, "missing": 0, "expired": 0}
+    for pair in pairs:
+        if pair is None:
+            results.append({"error": "Invalid payload"})
+            continue
+        result = {"user_id": pair[0], "platform": pair[1]}
+        token = tokens.get(pair)
+        if token is None:
+            result["status"] = "missing"
+            counts["missing"] += 1
+        elif is_expired(token, now):
+            result["status"] = "expired"
+            counts["expired"] += 1
+        else:
+            result["status"] = "ok"
+            result["token"] = token
+            counts["found"] += 1
+        results.append(result)
+    for name, count in counts.items():
+        if count:
+            tokens_served_total.labels(name).inc(count)
+    logger.info(
+        "Tokens retrieved",
+        extra={"requested": len(pairs), **counts, "request_id": get_request_id()},
+    )
+    return JSONResponse({"results": results})
+
+
 @app.post("/status")
 async def status_endpoint(
     user_id: str,
@@ -1,7 +1,16 @@
-"""Async token storage using Redis with encryption."""
+"""Async token storage using Redis with encryption.
+
+All of a user's platform tokens live in one Redis hash
+(``vault:tokens:<user_id>`` mapping ``platform -> ciphertext``), so per-user
+reads are a single HGETALL, and tokens of many users are read with one
+pipelined HMGET per user in a single round trip. Tokens written by earlier versions under plain
+``<user_id>:<platform>`` string keys are still found and moved into the hash
+on first read, or in bulk by :func:`migrate_legacy_keys`.
+"""
 import json
 import os
-from typing import Optional, Dict, Any, List
+import re
+from typing import Optional, Dict, Any, Hashable, Iterable, List, Tuple, TypeVar
 
 try:
     import redis.asyncio as redis  # type: ignore
@@ -10,9 +19,64 @@ except Exception:  # pragma: no cover - optional dependency
 
 _redis_client: Optional["redis.Redis"] = None
 
-from .token_encryptor import encrypt, decrypt
+from .token_encryptor import encrypt, decrypt, decrypt_many_async
 
 REDIS_URL = os.getenv("VAULT_REDIS_URL", "redis://localhost:6379")
+# Look up pre-hash ``user_id:platform`` keys when a token is not in the hash.
+# Can be disabled once :func:`migrate_legacy_keys` has run.
+LEGACY_KEY_FALLBACK = os.getenv("VAULT_LEGACY_KEY_FALLBACK", "true").lower() != "false"
+
+# Every key written by the vault lives under this namespace
+KEY_NAMESPACE = "vault:"
+_TOKENS_PREFIX = f"{KEY_NAMESPACE}tokens:"
+# Sorted set of refreshable tokens scored by when they should be refreshed
+EXPIRY_INDEX = f"{KEY_NAMESPACE}expiry"
+
+
+def _user_key(user_id: str) -> str:
+    return f"{_TOKENS_PREFIX}{user_id}"
+
+
+def _legacy_key(user_id: str, platform: str) -> str:
+    return f"{user_id}:{platform}"
+
+
+def index_member(user_id: str, platform: str) -> str:
+    """Return the expiry index member for ``user_id``/``platform``."""
+    return json.dumps([user_id, platform])
+
+
+def parse_index_member(member: str) -> Tuple[str, str]:
+    """Inverse of :func:`index_member`."""
+    user_id, platform = json.loads(member)
+    return user_id, platform
+
+
+def _decode(raw: str) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(decrypt(raw))
+    except Exception:  # pragma: no cover - bad data
+        return None
+
+
+_K = TypeVar("_K", bound=Hashable)
+
+
+async def _decode_many(raw_tokens: Dict[_K, str]) -> Dict[_K, Dict[str, Any]]:
+    """Decrypt ``raw_tokens`` in bulk, leaving out values that do not decode."""
+    names = list(raw_tokens)
+    try:
+        decrypted = await decrypt_many_async(raw_tokens[n] for n in names)
+    except Exception:  # pragma: no cover - bad data, decode one by one
+        decoded = {n: _decode(raw_tokens[n]) for n in names}
+        return {n: t for n, t in decoded.items() if t is not None}
+    tokens: Dict[_K, Dict[str, Any]] = {}
+    for name, text in zip(names, decrypted):
+        try:
+            tokens[name] = json.loads(text)
+        except Exception:  # pragma: no cover - bad data
+            continue
+    return tokens
 
 
 async def init_redis(client: "redis.Redis") -> None:
@@ -38,19 +102,189 @@ async def _get_redis() -> "redis.Redis":
 async def store_token(user_id: str, platform: str, data: Dict[str, Any]) -> None:
     client = await _get_redis()
     encoded = encrypt(json.dumps(data))
-    await client.set(f"{user_id}:{platform}", encoded)
+    await client.hset(_user_key(user_id), platform, encoded)
+    if LEGACY_KEY_FALLBACK:
+        await client.delete(_legacy_key(user_id, platform))
+    member = index_member(user_id, platform)
+    expires_at = data.get("expires_at")
+    if expires_at is not None and data.get("refresh_token"):
+        await client.zadd(EXPIRY_INDEX, {member: float(expires_at)})
+    else:
+        await client.zrem(EXPIRY_INDEX, member)
+
+
+async def _migrate_legacy_values(
+    client: "redis.Redis", values: Dict[Tuple[str, str], str]
+) -> Dict[Tuple[str, str], str]:
+    """Move legacy tokens, already read, into the users' hashes.
+
+    ``values`` maps ``(user_id, platform)`` to the value of its legacy key.
+    A value that does not decrypt to a token is left untouched. Returns the
+    value each moved pair now holds in its hash. All pairs are moved in one
+    pipeline; a second one indexes them and reads back tokens written to the
+    hash in the meantime.
+    """
+    decoded = {pair: _decode(raw) for pair, raw in values.items()}
+    pairs = [pair for pair, data in decoded.items() if isinstance(data, dict)]
+    if not pairs:
+        return {}
+    pipe = client.pipeline(transaction=False)
+    for user_id, platform in pairs:
+        # Never overwrite a token written to the hash in the meantime.
+        pipe.hsetnx(_user_key(user_id), platform, values[(user_id, platform)])
+        pipe.delete(_legacy_key(user_id, platform))
+    replies = await pipe.execute()
+
+    moved: Dict[Tuple[str, str], str] = {}
+    due: Dict[str, float] = {}
+    lost: List[Tuple[str, str]] = []
+    for pair, created in zip(pairs, replies[::2]):
+        data = decoded[pair]
+        if not created:
+            lost.append(pair)
+            continue
+        moved[pair] = values[pair]
+        if data.get("expires_at") is not None and data.get("refresh_token"):
+            due[index_member(*pair)] = float(data["expires_at"])
+    if due or lost:
+        pipe = client.pipeline(transaction=False)
+        if due:
+            pipe.zadd(EXPIRY_INDEX, due)
+        for user_id, platform in lost:
+            pipe.hget(_user_key(user_id), platform)
+        replies = await pipe.execute()
+        for pair, raw in zip(lost, replies[1:] if due else replies):
+            if raw is not None:
+                moved[pair] = raw
+    return moved
+
+
+async def _migrate_legacy(client: "redis.Redis", user_id: str, platform: str) -> Optional[str]:
+    """Move a legacy string key into the user's hash and return its value.
+
+    A key whose value does not decrypt to a token is left untouched.
+    """
+    raw = await client.get(_legacy_key(user_id, platform))
+    if raw is None:
+        return None
+    moved = await _migrate_legacy_values(client, {(user_id, platform): raw})
+    return moved.get((user_id, platform))
 
 
 async def retrieve_token(user_id: str, platform: str) -> Optional[Dict[str, Any]]:
     client = await _get_redis()
-    raw = await client.get(f"{user_id}:{platform}")
+    raw = await client.hget(_user_key(user_id), platform)
+    if raw is None and LEGACY_KEY_FALLBACK:
+        raw = await _migrate_legacy(client, user_id, platform)
     if raw is None:
         return None
-    try:
-        decrypted = decrypt(raw)
-        return json.loads(decrypted)
-    except Exception:  # pragma: no cover - bad data
-        return None
+    return _decode(raw)
+
+
+async def retrieve_user_tokens(
+    user_id: str, platforms: Optional[Iterable[str]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Return every stored token of ``user_id`` keyed by platform.
+
+    The hash is read with one HGETALL and all values are decrypted in bulk.
+    When legacy fallback is enabled, ``platforms`` missing from the hash are
+    looked up under their old keys with a single MGET and moved in bulk.
+    """
+    client = await _get_redis()
+    raw_tokens: Dict[str, str] = dict(await client.hgetall(_user_key(user_id)))
+    if LEGACY_KEY_FALLBACK and platforms is not None:
+        missing = [p for p in platforms if p not in raw_tokens]
+        if missing:
+            values = await client.mget([_legacy_key(user_id, p) for p in missing])
+            found = {(user_id, p): raw for p, raw in zip(missing, values) if raw is not None}
+            if found:
+                moved = await _migrate_legacy_values(client, found)
+                raw_tokens.update((platform, raw) for (_, platform), raw in moved.items())
+
+    return await _decode_many(raw_tokens)
+
+
+async def retrieve_tokens(
+    pairs: Iterable[Tuple[str, str]]
+) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Return the stored tokens of several ``(user_id, platform)`` pairs.
+
+    One HMGET per user is sent in a single pipeline and all values are
+    decrypted in bulk. Pairs without a token are left out. When legacy
+    fallback is enabled, pairs missing from the hashes are looked up under
+    their old keys with a single MGET and moved in bulk.
+    """
+    client = await _get_redis()
+    by_user: Dict[str, Dict[str, None]] = {}
+    for user_id, platform in pairs:
+        by_user.setdefault(user_id, {})[platform] = None
+    if not by_user:
+        return {}
+    pipe = client.pipeline(transaction=False)
+    for user_id, platforms in by_user.items():
+        pipe.hmget(_user_key(user_id), list(platforms))
+    replies = await pipe.execute()
+
+    raw_tokens: Dict[Tuple[str, str], str] = {}
+    missing: List[Tuple[str, str]] = []
+    for (user_id, platforms), values in zip(by_user.items(), replies):
+        for platform, raw in zip(platforms, values):
+            if raw is None:
+                missing.append((user_id, platform))
+            else:
+                raw_tokens[(user_id, platform)] = raw
+    if LEGACY_KEY_FALLBACK and missing:
+        values = await client.mget([_legacy_key(u, p) for u, p in missing])
+        found = {pair: raw for pair, raw in zip(missing, values) if raw is not None}
+        if found:
+            raw_tokens.update(await _migrate_legacy_values(client, found))
+    return await _decode_many(raw_tokens)
+
+
+async def expiring_tokens(until: float, limit: int) -> List[Tuple[str, float]]:
+    """Return up to ``limit`` index members due at or before ``until``."""
+    client = await _get_redis()
+    return list(
+        await client.zrangebyscore(EXPIRY_INDEX, "-inf", until, start=0, num=limit, withscores=True)
+    )
+
+
+async def schedule_refresh(user_id: str, platform: str, at: Optional[float]) -> None:
+    """Move ``user_id``/``platform`` in the expiry index, or drop it if ``at`` is None."""
+    client = await _get_redis()
+    member = index_member(user_id, platform)
+    if at is None:
+        await client.zrem(EXPIRY_INDEX, member)
+    else:
+        await client.zadd(EXPIRY_INDEX, {member: float(at)})
+
+
+def _glob_escape(text: str) -> str:
+    return re.sub(r"([*?\[\]\\])", r"\\\1", text)
+
+
+async def migrate_legacy_keys(platforms: Optional[Iterable[str]] = None) -> int:
+    """Move every legacy ``user_id:platform`` key into per-user hashes.
+
+    Only keys ending in ``:<platform>`` for a known platform (the platform
+    profiles unless ``platforms`` is given) are considered, only plain
+    string keys are read, and a key is only moved and deleted once its value
+    decrypts to a token. Everything else sharing the Redis is left alone.
+
+    Returns the number of migrated tokens. Safe to run while the service is
+    serving traffic and to run more than once.
+    """
+    client = await _get_redis()
+    migrated = 0
+    for platform in await list_platforms() if platforms is None else platforms:
+        suffix = f":{platform}"
+        async for key in client.scan_iter(match=f"*{_glob_escape(suffix)}", count=1000):
+            user_id = key[: -len(suffix)]
+            if not user_id or key.startswith(KEY_NAMESPACE) or await client.type(key) != "string":
+                continue
+            if await _migrate_legacy(client, user_id, platform) is not None:
+                migrated += 1
+    return migrated
 
 
 async def list_platforms() -> List[str]: